@@ -1,30 +1,56 @@
 # app.py
 # Main application file for the Form Management System
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-import json
+from flask import (Flask, Response, before_render_template, g, render_template, request, redirect, url_for, session,
+                   flash, jsonify, template_rendered)
+from flask.json.provider import DefaultJSONProvider
+import hmac
 import os
+import time
 import uuid
 from datetime import datetime
 
+from function import json_codec
+from function.column_cache import get_column_cache
+from function.config import (BULK_MAX_RECORDS, DATA_DIR, FORMS_FILE, INGEST_TOKEN, JSON_PRETTY, METRICS_TOKEN,
+                             SLOW_REQUEST_SECONDS, SUBMISSIONS_FILE, SUBMISSIONS_LOG, USERS_FILE)
+from function.export import EXPORT_FORMATS, stream_csv, stream_ndjson
+from function.field_aggregates import get_aggregate_store
+from function.form_schema import get_form_schemas
+from function.metrics import (REQUEST_SECONDS, REQUESTS, TEMPLATE_SECONDS, add_to_breakdown, begin_request, end_request,
+                              get_registry)
+from function.pagination import decode_cursor, stream_json_array
+from function.read_api import (is_not_modified, next_page_headers, resource_validators, submission_page, viewer_key,
+                               visible_form, visible_forms, visible_submissions)
+from function.repository import get_repository
+
+# jsonify() and request.get_json() through function/json_codec.py (orjson when installed)
+class CodecJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps(obj, pretty=kwargs.get('indent') is not None,
+                                sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                                default=kwargs.get('default', self.default))
+    
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 app.secret_key = 'matchit_secret_key'  # Secret key for session management
 
-# Data file paths
-USERS_FILE = os.path.join('data', 'users.json')
-FORMS_FILE = os.path.join('data', 'forms.json')
-SUBMISSIONS_FILE = os.path.join('data', 'submissions.json')
+# Storage backend for users, forms and submissions (see MATCHIT_STORAGE)
+repository = get_repository()
 
 # Ensure data directory and files exist
 def ensure_data_files():
     # Create data directory if it doesn't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
     
     # Create users file if it doesn't exist
     if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'w') as f:
-            json.dump({
+        with open(USERS_FILE, 'wb') as f:
+            f.write(json_codec.dumpb({
                 'admin': {
                     'password': 'admin123',
                     'role': 'admin',
@@ -35,36 +61,49 @@ def ensure_data_files():
                     'role': 'user',
                     'name': 'Test User'
                 }
-            }, f, indent=4)
+            }, pretty=JSON_PRETTY))
     
     # Create forms file if it doesn't exist
     if not os.path.exists(FORMS_FILE):
-        with open(FORMS_FILE, 'w') as f:
-            json.dump([], f, indent=4)
+        with open(FORMS_FILE, 'wb') as f:
+            f.write(json_codec.dumpb([], pretty=JSON_PRETTY))
     
-    # Create submissions file if it doesn't exist
-    if not os.path.exists(SUBMISSIONS_FILE):
-        with open(SUBMISSIONS_FILE, 'w') as f:
-            json.dump([], f, indent=4)
+    # Create the submission log if there is no submissions data yet
+    if not os.path.exists(SUBMISSIONS_FILE) and not os.path.exists(SUBMISSIONS_LOG):
+        open(SUBMISSIONS_LOG, 'a').close()
 
-# Load data from JSON file
-def load_data(file_path):
-    try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading data from {file_path}: {e}")
-        return None
-
-# Save data to JSON file
-def save_data(file_path, data):
-    try:
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error saving data to {file_path}: {e}")
-        return False
+# Request metrics
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.endpoint or 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    
+    # Log slow requests with the time spent in data access, analytics and templates
+    breakdown = end_request()
+    if 0 < SLOW_REQUEST_SECONDS <= elapsed:
+        parts = sorted(breakdown.items(), key=lambda item: item[1], reverse=True)
+        details = ', '.join(f'{part} {seconds * 1000:.0f} ms' for part, seconds in parts) or 'no instrumented work'
+        print(f"Slow request {request.method} {request.path} ({endpoint}, {response.status_code}) "
+              f"took {elapsed * 1000:.0f} ms: {details}")
+    return response
+
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+def record_template_metrics(sender, template, context, **extra):
+    elapsed = time.perf_counter() - g.pop('template_started', time.perf_counter())
+    TEMPLATE_SECONDS.observe(elapsed, template=template.name)
+    add_to_breakdown(f'render {template.name}', elapsed)
+
+before_render_template.connect(start_template_timer, app)
+template_rendered.connect(record_template_metrics, app)
 
 # Routes
 @app.route('/')
@@ -82,13 +121,13 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        users = load_data(USERS_FILE)
-        if users and username in users and users[username]['password'] == password:
+        user = repository.get_user(username)
+        if user and user['password'] == password:
             session['username'] = username
-            session['role'] = users[username]['role']
-            session['name'] = users[username]['name']
+            session['role'] = user['role']
+            session['name'] = user['name']
             
-            if users[username]['role'] == 'admin':
+            if user['role'] == 'admin':
                 return redirect(url_for('admin_dashboard'))
             else:
                 return redirect(url_for('user_dashboard'))
@@ -110,7 +149,7 @@ def admin_dashboard():
     if 'username' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
     
-    forms = load_data(FORMS_FILE)
+    forms = repository.list_forms()
     return render_template('admin_dashboard.html', forms=forms)
 
 @app.route('/admin/form/new', methods=['GET', 'POST'])
@@ -147,9 +186,8 @@ def new_form():
         }
         
         # Save the new form
-        forms = load_data(FORMS_FILE)
-        forms.append(new_form)
-        save_data(FORMS_FILE, forms)
+        repository.add_form(new_form)
+        get_form_schemas().invalidate()
         
         flash('Form created successfully')
         return redirect(url_for('admin_dashboard'))
@@ -161,8 +199,7 @@ def edit_form(form_id):
     if 'username' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
     
-    forms = load_data(FORMS_FILE)
-    form = next((f for f in forms if f['id'] == form_id), None)
+    form = repository.get_form(form_id)
     
     if not form:
         flash('Form not found')
@@ -186,13 +223,20 @@ def edit_form(form_id):
             i += 1
         
         # Update form
-        form['title'] = form_data['form_title']
-        form['description'] = form_data['form_description']
-        form['fields'] = form_fields
-        form['updated_at'] = datetime.now().isoformat()
+        changes = {
+            'title': form_data['form_title'],
+            'description': form_data['form_description'],
+            'fields': form_fields,
+            'updated_at': datetime.now().isoformat()
+        }
+        
+        # Save the updated form on top of the latest stored version
+        repository.update_form(form_id, lambda f: f.update(changes))
         
-        # Save the updated form
-        save_data(FORMS_FILE, forms)
+        # Field types may have changed, so re-check the form's schema, aggregates and columns
+        get_form_schemas().invalidate()
+        get_aggregate_store().invalidate_form(form_id)
+        get_column_cache().invalidate_form(form_id)
         
         flash('Form updated successfully')
         return redirect(url_for('admin_dashboard'))
@@ -204,12 +248,10 @@ def toggle_form(form_id):
     if 'username' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
     
-    forms = load_data(FORMS_FILE)
-    form = next((f for f in forms if f['id'] == form_id), None)
+    form = repository.update_form(form_id, lambda f: f.update(active=not f['active']))
+    get_form_schemas().invalidate()
     
     if form:
-        form['active'] = not form['active']
-        save_data(FORMS_FILE, forms)
         status = 'activated' if form['active'] else 'deactivated'
         flash(f'Form {status} successfully')
     else:
@@ -222,8 +264,8 @@ def view_all_submissions():
     if 'username' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
     
-    submissions = load_data(SUBMISSIONS_FILE)
-    forms = load_data(FORMS_FILE)
+    submissions = repository.list_submissions()
+    forms = repository.list_forms()
     
     # Create a lookup dictionary for form titles
     form_titles = {form['id']: form['title'] for form in forms}
@@ -235,31 +277,54 @@ def view_form_submissions(form_id):
     if 'username' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
     
-    submissions = load_data(SUBMISSIONS_FILE)
-    forms = load_data(FORMS_FILE)
-    
-    form = next((f for f in forms if f['id'] == form_id), None)
-    if not form:
+    schema = get_form_schemas().get(form_id)
+    if not schema:
         flash('Form not found')
         return redirect(url_for('admin_dashboard'))
+    form = schema.form
     
-    # Filter submissions for this form
-    form_submissions = [s for s in submissions if s['form_id'] == form_id]
+    # Look up submissions for this form
+    form_submissions = repository.submissions_for_form(form_id)
     
     return render_template('form_submissions.html', submissions=form_submissions, form=form)
 
+@app.route('/admin/form/<form_id>/export')
+def export_form_submissions(form_id):
+    if 'username' not in session or session.get('role') != 'admin':
+        return redirect(url_for('login'))
+    
+    schema = get_form_schemas().get(form_id)
+    if not schema:
+        flash('Form not found')
+        return redirect(url_for('admin_dashboard'))
+    form = schema.form
+    
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        flash(f'Unsupported export format: {export_format}')
+        return redirect(url_for('view_form_submissions', form_id=form_id))
+    
+    # Rows are generated as the response is sent, so memory use does not grow with the form
+    submissions = repository.iter_submissions_for_form(form_id)
+    if export_format == 'csv':
+        body = stream_csv(form, submissions)
+    else:
+        body = stream_ndjson(form, submissions)
+    
+    headers = {'Content-Disposition': f'attachment; filename=submissions-{form_id}.{export_format}'}
+    return Response(body, mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
 # User routes
 @app.route('/user/dashboard')
 def user_dashboard():
     if 'username' not in session:
         return redirect(url_for('login'))
     
-    forms = load_data(FORMS_FILE)
+    forms = repository.list_forms()
     active_forms = [f for f in forms if f['active']]
     
     # Get user's submissions
-    submissions = load_data(SUBMISSIONS_FILE)
-    user_submissions = [s for s in submissions if s['submitted_by'] == session['username']]
+    user_submissions = repository.submissions_for_user(session['username'])
     
     # Create a lookup dictionary for form titles
     form_titles = {form['id']: form['title'] for form in forms}
@@ -274,18 +339,19 @@ def fill_form(form_id):
     if 'username' not in session:
         return redirect(url_for('login'))
     
-    forms = load_data(FORMS_FILE)
-    form = next((f for f in forms if f['id'] == form_id and f['active']), None)
+    schema = get_form_schemas().get(form_id)
+    if schema and not schema.active:
+        schema = None
     
-    if not form:
+    if not schema:
         flash('Form not found or inactive')
         return redirect(url_for('user_dashboard'))
+    form = schema.form
     
     if request.method == 'POST':
         submission_data = {}
-        for field in form['fields']:
-            field_name = field['name']
-            if field['type'] == 'checkbox':
+        for field_name in schema.fields:
+            if field_name in schema.checkbox_fields:
                 submission_data[field_name] = request.form.getlist(field_name)
             else:
                 submission_data[field_name] = request.form.get(field_name, '')
@@ -299,10 +365,9 @@ def fill_form(form_id):
             'data': submission_data
         }
         
-        # Save the submission
-        submissions = load_data(SUBMISSIONS_FILE)
-        submissions.append(submission)
-        save_data(SUBMISSIONS_FILE, submissions)
+        # Save the submission and fold it into the field aggregates
+        repository.add_submission(submission)
+        get_aggregate_store().refresh()
         
         flash('Form submitted successfully')
         return redirect(url_for('user_dashboard'))
@@ -314,60 +379,184 @@ def view_submission(submission_id):
     if 'username' not in session:
         return redirect(url_for('login'))
     
-    submissions = load_data(SUBMISSIONS_FILE)
-    submission = next((s for s in submissions if s['id'] == submission_id), None)
+    submission = repository.get_submission(submission_id)
     
     if not submission or (session.get('role') != 'admin' and submission['submitted_by'] != session['username']):
         flash('Submission not found or access denied')
         return redirect(url_for('user_dashboard'))
     
-    forms = load_data(FORMS_FILE)
-    form = next((f for f in forms if f['id'] == submission['form_id']), None)
+    schema = get_form_schemas().get(submission['form_id'])
     
-    if not form:
+    if not schema:
         flash('Associated form not found')
         return redirect(url_for('user_dashboard'))
     
-    return render_template('view_submission.html', submission=submission, form=form)
+    return render_template('view_submission.html', submission=submission, form=schema.form)
+
+# Authorization: Bearer <token> for machine clients; never matches when the token is unset
+def bearer_token_matches(token):
+    if token is None:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+# Conditional GET for the read APIs: the validators come from the storage data
+# versions, so an unchanged resource is answered with 304 before anything is loaded
+def conditional_validators(*collections):
+    viewer = viewer_key(session.get('role'), session['username'])
+    return resource_validators(collections, request.endpoint, request.view_args or {},
+                               request.args.items(multi=True), viewer)
+
+def not_modified(etag, last_modified):
+    return is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since)
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Per-user data: caches must revalidate and may not share it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
 
-# API routes for AJAX operations
+def not_modified_response(etag, last_modified):
+    return with_validators(Response(status=304), etag, last_modified)
+
+# API routes for AJAX operations (also served natively by asgi.py, which shares function/read_api.py)
 @app.route('/api/forms', methods=['GET'])
 def api_get_forms():
     if 'username' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    forms = load_data(FORMS_FILE)
-    if session.get('role') != 'admin':
-        forms = [f for f in forms if f['active']]
+    etag, last_modified = conditional_validators('forms')
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
     
-    return jsonify(forms)
+    return with_validators(jsonify(visible_forms(session.get('role'))), etag, last_modified)
 
 @app.route('/api/form/<form_id>', methods=['GET'])
 def api_get_form(form_id):
     if 'username' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    forms = load_data(FORMS_FILE)
-    form = next((f for f in forms if f['id'] == form_id), None)
+    etag, last_modified = conditional_validators('forms')
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    form = visible_form(form_id, session.get('role'))
     
-    if not form or (session.get('role') != 'admin' and not form['active']):
+    if not form:
         return jsonify({'error': 'Form not found or inactive'}), 404
     
-    return jsonify(form)
+    return with_validators(jsonify(form), etag, last_modified)
 
 @app.route('/api/submissions/<form_id>', methods=['GET'])
 def api_get_submissions(form_id):
     if 'username' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    submissions = load_data(SUBMISSIONS_FILE)
+    etag, last_modified = conditional_validators('submissions')
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
     
-    if session.get('role') == 'admin':
-        form_submissions = [s for s in submissions if s['form_id'] == form_id]
+    if limit is None and cursor is None and not stream:
+        form_submissions = visible_submissions(form_id, session.get('role'), session['username'])
+        return with_validators(jsonify(form_submissions), etag, last_modified)
+    
+    # Keyset pagination ordered by (submitted_at, id)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    form_submissions, next_cursor = submission_page(form_id, session.get('role'), session['username'], after, limit)
+    
+    headers = {}
+    if next_cursor is not None:
+        headers = next_page_headers(url_for('api_get_submissions', form_id=form_id), limit, next_cursor,
+                                    request.args.get('stream'))
+    
+    if stream:
+        response = Response(stream_json_array(form_submissions), mimetype='application/json', headers=headers)
     else:
-        form_submissions = [s for s in submissions if s['form_id'] == form_id and s['submitted_by'] == session['username']]
+        response = jsonify(list(form_submissions))
+        response.headers.extend(headers)
+    return with_validators(response, etag, last_modified)
+
+@app.route('/api/form/<form_id>/submissions:bulk', methods=['POST'])
+def api_bulk_submissions(form_id):
+    # Admins import with their session, upstream systems with the ingest token
+    is_admin = 'username' in session and session.get('role') == 'admin'
+    if not is_admin and not bearer_token_matches(INGEST_TOKEN):
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    from function.bulk_import import BulkImportError, TooManyRecords, parse_records, prepare_import
+    
+    schema = get_form_schemas().get(form_id)
+    if not schema:
+        return jsonify({'error': 'Form not found'}), 404
+    
+    # Records without submitted_by are attributed to the importing admin
+    default_submitted_by = session['username'] if is_admin else 'api'
+    try:
+        records = parse_records(request.get_data(cache=False), request.content_type)
+        submissions, errors, received = prepare_import(schema, records, default_submitted_by, BULK_MAX_RECORDS)
+    except TooManyRecords as e:
+        return jsonify({'error': str(e)}), 413
+    except BulkImportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = {'received': received, 'accepted': 0, 'rejected': len(errors), 'errors': errors}
+    
+    # With ?atomic=1 a single invalid record rejects the whole import
+    atomic = request.args.get('atomic', '').lower() in ('1', 'true', 'yes')
+    if not submissions or (errors and atomic):
+        result['rejected'] = received
+        return jsonify(result), 400
+    
+    # Save the batch in one write and fold it into the field aggregates
+    if not repository.add_submissions(submissions):
+        return jsonify({'error': 'Failed to save submissions'}), 500
+    get_aggregate_store().refresh()
+    
+    result['accepted'] = len(submissions)
+    return jsonify(result)
+
+@app.route('/api/stats/<form_id>', methods=['GET'])
+def api_get_stats(form_id):
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    # Import the calculate_statistics module
+    from function.calculate_statistics import calculate_form_statistics
+    
+    if not get_form_schemas().get(form_id):
+        return jsonify({'error': 'Form not found'}), 404
+    
+    # Optional comma-separated list of fields, default is every numeric field
+    fields = request.args.get('fields')
+    field_names = [name for name in fields.split(',') if name] if fields else None
+    
+    # Calculate all statistics for the requested fields in one pass
+    return jsonify({
+        'form_id': form_id,
+        'fields': calculate_form_statistics(form_id, field_names)
+    })
+
+@app.route('/api/stats/rebuild', methods=['POST'])
+def api_rebuild_stats():
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
     
-    return jsonify(form_submissions)
+    # Re-aggregate every submission from scratch
+    store = get_aggregate_store()
+    store.rebuild()
+    store.save()
+    return jsonify({'success': True})
 
 @app.route('/api/calculate_average/<form_id>/<field_name>', methods=['GET'])
 def api_calculate_average(form_id, field_name):
@@ -423,6 +612,56 @@ def api_calculate_minimum(form_id, field_name):
         'non_numeric_count': non_numeric_count
     })
 
+@app.route('/api/calculate_percentile/<form_id>/<field_name>', methods=['GET'])
+def api_calculate_percentile(form_id, field_name):
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    # Import the calculate_percentile module
+    from function.calculate_percentile import calculate_percentiles_for_field
+    
+    # Optional comma-separated percentiles between 0 and 100, e.g. ?p=50,90,99
+    percentiles = None
+    if request.args.get('p'):
+        try:
+            percentiles = [float(p) for p in request.args['p'].split(',') if p]
+        except ValueError:
+            return jsonify({'error': 'p must be a comma-separated list of numbers'}), 400
+        if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+            return jsonify({'error': 'Percentiles must be between 0 and 100'}), 400
+    
+    # Read the percentiles from the field's quantile sketch
+    values, numeric_count, non_numeric_count = calculate_percentiles_for_field(form_id, field_name, percentiles)
+    
+    # Return the results as JSON
+    return jsonify({
+        'percentiles': values,
+        'numeric_count': numeric_count,
+        'non_numeric_count': non_numeric_count
+    })
+
+@app.route('/api/calculate_histogram/<form_id>/<field_name>', methods=['GET'])
+def api_calculate_histogram(form_id, field_name):
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    # Import the calculate_percentile module
+    from function.calculate_percentile import DEFAULT_HISTOGRAM_BINS, calculate_histogram_for_field
+    
+    bins = request.args.get('bins', DEFAULT_HISTOGRAM_BINS, type=int)
+    if not bins or bins < 1 or bins > 1000:
+        return jsonify({'error': 'bins must be an integer between 1 and 1000'}), 400
+    
+    # Read the histogram from the field's quantile sketch
+    histogram, numeric_count, non_numeric_count = calculate_histogram_for_field(form_id, field_name, bins)
+    
+    # Return the results as JSON
+    return jsonify({
+        'bins': histogram,
+        'numeric_count': numeric_count,
+        'non_numeric_count': non_numeric_count
+    })
+
 @app.route('/api/calculate_clustering/<form_id>/<field_name>', methods=['POST'])
 def api_calculate_clustering(form_id, field_name):
     if 'username' not in session or session.get('role') != 'admin':
@@ -432,16 +671,113 @@ def api_calculate_clustering(form_id, field_name):
     data = request.json
     num_clusters = data.get('num_clusters')
     members_per_cluster = data.get('members_per_cluster')
+    method = data.get('method') or request.args.get('method')
+    seed = data.get('seed')
     
     # Import the calculate_clustering module
     from function.calculate_clustering import cluster_submissions
     
     # Perform clustering on the specified field
-    clustering_results = cluster_submissions(form_id, field_name, num_clusters, members_per_cluster)
+    clustering_results = cluster_submissions(form_id, field_name, num_clusters, members_per_cluster, method, seed)
     
     # Return the results as JSON
     return jsonify(clustering_results)
 
-if __name__ == '__main__':
+@app.route('/api/clustering_cache', methods=['GET', 'DELETE'])
+def api_clustering_cache():
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    from function.calculate_clustering import get_result_cache
+    
+    cache = get_result_cache()
+    if request.method == 'DELETE':
+        cache.clear()
+    return jsonify(cache.stats())
+
+@app.route('/api/calculate_clustering/<form_id>', methods=['POST'])
+def api_calculate_multi_field_clustering(form_id):
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    # Get clustering parameters from request
+    data = request.json or {}
+    field_names = data.get('fields')
+    if not isinstance(field_names, list) or not all(isinstance(name, str) for name in field_names):
+        return jsonify({'error': 'fields must be a list of field names'}), 400
+    
+    from function.calculate_multi_field_clustering import DEFAULT_BATCH_SIZE, cluster_submissions_multi
+    
+    # Perform clustering on the specified fields
+    clustering_results = cluster_submissions_multi(
+        form_id,
+        field_names,
+        data.get('num_clusters'),
+        data.get('members_per_cluster'),
+        data.get('method'),
+        data.get('batch_size') or DEFAULT_BATCH_SIZE
+    )
+    
+    return jsonify(clustering_results)
+
+@app.route('/api/jobs', methods=['GET', 'POST'])
+def api_submit_job():
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    from function.jobs import JobQueueFull, get_job_manager
+    
+    # GET reports how many jobs (of all workers) are in each state
+    if request.method == 'GET':
+        return jsonify(get_job_manager().stats())
+    
+    data = request.json or {}
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    
+    # Queue the job; the client polls /api/jobs/<job_id> for the result
+    try:
+        job_id = get_job_manager().submit(data.get('type'), params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    
+    status_url = url_for('api_get_job', job_id=job_id)
+    return jsonify({'job_id': job_id, 'status_url': status_url}), 202, {'Location': status_url}
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def api_get_job(job_id):
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    from function.jobs import get_job_manager
+    
+    manager = get_job_manager()
+    if request.method == 'DELETE':
+        manager.cancel(job_id)
+    
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    # Admins can look at the metrics in a browser; scrapers send the metrics token
+    if not bearer_token_matches(METRICS_TOKEN) and ('username' not in session or session.get('role') != 'admin'):
+        return jsonify({'error': 'Not authorized'}), 403
+    
+    return Response(get_registry().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Application factory used by the production servers (gunicorn.conf.py, asgi.py)
+def create_app():
     ensure_data_files()
-    app.run(debug=True)
\ No newline at end of file
+    # Load the saved aggregates and catch up with submissions added since
+    get_aggregate_store()
+    return app
+
+if __name__ == '__main__':
+    # Development server; run gunicorn (see gunicorn.conf.py) in production
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,316 @@
+# asgi.py
+# ASGI entry point: the read-heavy JSON APIs are served by async handlers whose
+# storage calls run in a small thread pool; every other route runs the Flask app
+
+import asyncio
+import io
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote
+
+from itsdangerous import BadSignature
+from werkzeug.http import http_date, parse_cookie, parse_date, parse_etags
+
+from app import app as flask_app, create_app
+from function.config import ASGI_STORAGE_THREADS, ASGI_WSGI_THREADS
+from function.metrics import REQUEST_SECONDS, REQUESTS
+from function.pagination import decode_cursor
+from function.read_api import (is_not_modified, next_page_headers, resource_validators, submission_page, viewer_key,
+                               visible_form, visible_forms, visible_submissions)
+
+# GET routes with native async handlers: (endpoint, path pattern)
+NATIVE_ROUTES = [
+    ('api_get_forms', re.compile(r'^/api/forms$')),
+    ('api_get_form', re.compile(r'^/api/form/(?P<form_id>[^/]+)$')),
+    ('api_get_submissions', re.compile(r'^/api/submissions/(?P<form_id>[^/]+)$')),
+]
+
+
+class ApiRequest:
+    """
+    The parts of an HTTP request the native handlers look at
+    """
+    
+    def __init__(self, scope: Dict, endpoint: str, view_args: Dict[str, str], session: Dict):
+        self.method = scope['method']
+        self.root_path = scope.get('root_path', '')
+        self.endpoint = endpoint
+        self.view_args = view_args
+        self.args: List[Tuple[str, str]] = parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.session = session
+    
+    def arg(self, name: str) -> Optional[str]:
+        return next((value for key, value in self.args if key == name), None)
+
+
+class AsgiApp:
+    """
+    ASGI application wrapping the Flask app
+    
+    GET /api/forms, /api/form/<form_id> and /api/submissions/<form_id> are
+    answered on the event loop; only their storage reads and JSON encoding run
+    in the storage thread pool, and concurrent identical requests (same ETag)
+    share one load. Thousands of clients can wait on these endpoints with a
+    handful of OS threads. Everything else, including streamed responses and all
+    writes, is handed to the Flask app in the WSGI thread pool, so the sync
+    routes behave exactly as under a WSGI server.
+    """
+    
+    def __init__(self, wsgi_app, storage_threads: int = ASGI_STORAGE_THREADS, wsgi_threads: int = ASGI_WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.storage_pool = ThreadPoolExecutor(max_workers=max(storage_threads, 1), thread_name_prefix='matchit-storage')
+        self.wsgi_pool = ThreadPoolExecutor(max_workers=max(wsgi_threads, 1), thread_name_prefix='matchit-wsgi')
+        # ETag -> pending (status, body) shared by concurrent identical requests
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['method'] == 'GET':
+                for endpoint, pattern in NATIVE_ROUTES:
+                    match = pattern.match(scope['path'])
+                    if match and not (endpoint == 'api_get_submissions' and self._streamed(scope)):
+                        await self._native(scope, send, endpoint, match.groupdict())
+                        return
+            await self._wsgi(scope, receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+    
+    @staticmethod
+    def _streamed(scope: Dict) -> bool:
+        # ?stream=1 responses are generated while being sent, which the Flask route does
+        query = parse_qsl(scope['query_string'].decode('latin-1'))
+        return next((value for key, value in query if key == 'stream'), '').lower() in ('1', 'true', 'yes')
+    
+    # Startup and shutdown
+    
+    def _startup(self):
+        create_app()
+    
+    async def _lifespan(self, receive: Callable, send: Callable):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await loop.run_in_executor(self.storage_pool, self._startup)
+                except Exception as e:
+                    print(f"Error starting up: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.storage_pool.shutdown(wait=False)
+                self.wsgi_pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    # Native handlers
+    
+    def _session(self, headers: List[Tuple[bytes, bytes]]) -> Dict:
+        # Same signed cookie as Flask's session interface
+        cookie_header = next((value.decode('latin-1') for name, value in headers if name.lower() == b'cookie'), '')
+        value = parse_cookie(cookie_header).get(self.wsgi_app.config['SESSION_COOKIE_NAME'])
+        serializer = self.wsgi_app.session_interface.get_signing_serializer(self.wsgi_app)
+        if not value or serializer is None:
+            return {}
+        try:
+            return serializer.loads(value, max_age=int(self.wsgi_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return {}
+    
+    def _encode(self, payload: Any) -> bytes:
+        # Byte-for-byte what jsonify() returns
+        return self.wsgi_app.json.response(payload).get_data()
+    
+    async def _storage(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.storage_pool, func, *args)
+    
+    async def _shared(self, key: str, func: Callable, *args) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._storage(func, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A client that goes away must not cancel the load for the others
+        return await asyncio.shield(future)
+    
+    async def _native(self, scope: Dict, send: Callable, endpoint: str, view_args: Dict[str, str]):
+        started = time.perf_counter()
+        request = ApiRequest(scope, endpoint, view_args, self._session(scope['headers']))
+        try:
+            status, headers, body = await self._handle(request)
+        except Exception as e:
+            print(f"Error handling {request.method} {scope['path']}: {e}")
+            status, headers, body = 500, [], self._encode({'error': 'Internal server error'})
+        
+        if body:
+            headers.append(('Content-Type', 'application/json'))
+        headers.append(('Content-Length', str(len(body))))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    
+    async def _handle(self, request: ApiRequest) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        session = request.session
+        if 'username' not in session:
+            return 401, [], self._encode({'error': 'Not authenticated'})
+        role = session.get('role')
+        username = session['username']
+        
+        collections = ('submissions',) if request.endpoint == 'api_get_submissions' else ('forms',)
+        etag, last_modified = await self._storage(resource_validators, collections, request.endpoint,
+                                                  request.view_args, request.args, viewer_key(role, username))
+        headers = [('ETag', f'W/"{etag}"'), ('Cache-Control', 'private, no-cache'), ('Vary', 'Cookie')]
+        if last_modified is not None:
+            headers.append(('Last-Modified', http_date(last_modified)))
+        
+        if_modified_since = parse_date(request.headers.get('if-modified-since'))
+        if is_not_modified(etag, last_modified, parse_etags(request.headers.get('if-none-match')), if_modified_since):
+            return 304, headers, b''
+        
+        if request.endpoint == 'api_get_forms':
+            body = await self._shared(etag, lambda: self._encode(visible_forms(role)))
+            return 200, headers, body
+        
+        form_id = request.view_args['form_id']
+        if request.endpoint == 'api_get_form':
+            def load_form() -> Optional[bytes]:
+                form = visible_form(form_id, role)
+                return self._encode(form) if form else None
+            
+            form = await self._shared(etag, load_form)
+            if form is None:
+                return 404, [], self._encode({'error': 'Form not found or inactive'})
+            return 200, headers, form
+        
+        limit = request.arg('limit')
+        cursor = request.arg('cursor')
+        if limit is None and cursor is None:
+            body = await self._shared(etag, lambda: self._encode(visible_submissions(form_id, role, username)))
+            return 200, headers, body
+        
+        # Keyset pagination ordered by (submitted_at, id)
+        try:
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            limit = None
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return 400, [], self._encode({'error': 'Invalid cursor'})
+        
+        def load_page() -> Tuple[bytes, Optional[str]]:
+            page, next_cursor = submission_page(form_id, role, username, after, limit)
+            return self._encode(list(page)), next_cursor
+        
+        body, next_cursor = await self._shared(etag, load_page)
+        if next_cursor is not None:
+            path = f"{request.root_path}/api/submissions/{quote(form_id, safe='')}"
+            headers.extend(next_page_headers(path, limit, next_cursor, request.arg('stream')).items())
+        return 200, headers, body
+    
+    # Everything else: the Flask app in a worker thread
+    
+    def _environ(self, scope: Dict, body: bytes) -> Dict[str, Any]:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ[name] = value
+            elif name in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                # The body has been read already, chunked or not
+                continue
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+    
+    async def _wsgi(self, scope: Dict, receive: Callable, send: Callable):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        environ = self._environ(scope, b''.join(chunks))
+        
+        loop = asyncio.get_running_loop()
+        response_start = {}
+        
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            response_start['type'] = 'http.response.start'
+            response_start['status'] = int(status.split(' ', 1)[0])
+            response_start['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                         for name, value in headers]
+        
+        def send_from_thread(message: Dict):
+            # Waits until the server has taken the message, so slow clients hold back the response
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+        
+        def run_wsgi():
+            # The whole response is produced in one thread: streamed responses
+            # (exports, ?stream=1) read from storage cursors bound to it
+            result = self.wsgi_app(environ, start_response)
+            try:
+                started = False
+                for chunk in result:
+                    if not started:
+                        send_from_thread(response_start)
+                        started = True
+                    if chunk:
+                        send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if not started:
+                    send_from_thread(response_start)
+                send_from_thread({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        
+        await loop.run_in_executor(self.wsgi_pool, run_wsgi)
+
+app = AsgiApp(flask_app)
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        # WSGI fallback: the same app without the async handlers
+        print("Error: uvicorn is not installed (pip install uvicorn), serving the WSGI app instead")
+        create_app().run()
+    else:
+        uvicorn.run(app, host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -0,0 +1,2 @@
+# benchmarks
+# Synthetic datasets and timed benchmarks for comparing versions of MatchIt
\ No newline at end of file
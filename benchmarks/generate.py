@@ -0,0 +1,212 @@
+# generate.py
+# Synthetic users, forms and submissions for the benchmarks
+
+import argparse
+import json
+import os
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Named dataset sizes (number of submissions)
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+# Fields of every generated form: (name, type, options)
+FORM_FIELDS = [
+    ('age', 'number', []),
+    ('rating', 'radio', ['1', '2', '3', '4', '5']),
+    ('level', 'select', [str(level) for level in range(1, 11)]),
+    ('interests', 'checkbox', ['1', '2', '3', '4', '5']),
+    ('nickname', 'text', []),
+    ('email', 'email', []),
+    ('joined', 'date', []),
+    ('comments', 'textarea', []),
+]
+
+# Numeric-capable fields of the generated forms
+NUMERIC_FIELDS = ['age', 'rating', 'level', 'interests']
+
+# Written next to the data files so a dataset can be reused
+MANIFEST_FILE = 'manifest.json'
+
+# Scratch copy of every submission as a JSON array, written by the save/load benchmarks
+SUBMISSIONS_SNAPSHOT = 'bench_submissions.json'
+
+_COMMENTS = ['', 'Looking forward to it', 'Prefers weekends', 'First time joining', 'Please contact me by email']
+
+# Files derived from the generated data, removed when a dataset is reset
+_DERIVED_FILES = ('matchit.db', 'matchit.db-wal', 'matchit.db-shm', 'aggregates.json', SUBMISSIONS_SNAPSHOT)
+
+
+def _remove_files(data_dir: str, names: Tuple[str, ...]):
+    for name in names:
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _field_value(rng: random.Random, field_type: str, options: List[str], index: int) -> Any:
+    if field_type == 'number':
+        # A few blank answers, as fill_form stores '' for empty inputs
+        return '' if rng.random() < 0.02 else str(round(rng.gauss(35, 12), 1))
+    if field_type in ('radio', 'select'):
+        return rng.choice(options)
+    if field_type == 'checkbox':
+        return rng.sample(options, rng.randint(0, 3))
+    if field_type == 'email':
+        return f'user{index}@example.com'
+    if field_type == 'date':
+        return (date(2024, 1, 1) + timedelta(days=rng.randrange(365))).isoformat()
+    if field_type == 'textarea':
+        return rng.choice(_COMMENTS)
+    return f'user {index}'
+
+
+def generate_dataset(data_dir: str, submissions: int, forms: int = 4, users: int = 100,
+                     seed: int = 0) -> Dict[str, Any]:
+    """
+    Write users.json, forms.json and submissions.jsonl for a synthetic dataset
+    
+    Existing data files in data_dir are replaced. The same arguments always
+    produce the same data, so runs on different versions can be compared.
+    
+    Args:
+        data_dir: Directory to write (used as MATCHIT_DATA_DIR)
+        submissions: Number of submissions, spread evenly over the forms
+        forms: Number of forms, each with every type in FORM_FIELDS
+        users: Number of regular users besides 'admin' and 'user'
+        seed: Random seed
+        
+    Returns:
+        The manifest written to MANIFEST_FILE: the arguments, the size of the
+        log, the form ids and the login of one admin and one regular user
+    """
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    _remove_files(data_dir, ('submissions.json', 'submissions.jsonl', MANIFEST_FILE) + _DERIVED_FILES)
+    
+    user_records = {
+        'admin': {'password': 'admin123', 'role': 'admin', 'name': 'Administrator'},
+        'user': {'password': 'user123', 'role': 'user', 'name': 'Regular User'}
+    }
+    for i in range(users):
+        user_records[f'user{i}'] = {'password': 'password', 'role': 'user', 'name': f'User {i}'}
+    usernames = list(user_records)
+    
+    created_at = datetime(2024, 1, 1)
+    form_records = []
+    for i in range(forms):
+        form_records.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'title': f'Benchmark form {i + 1}',
+            'description': 'Synthetic form for benchmarks',
+            'created_by': 'admin',
+            'created_at': created_at.isoformat(),
+            'fields': [{'name': name, 'type': field_type, 'required': False, 'options': options}
+                       for name, field_type, options in FORM_FIELDS],
+            'active': True
+        })
+    
+    with open(os.path.join(data_dir, 'users.json'), 'w') as f:
+        json.dump(user_records, f, indent=4)
+    with open(os.path.join(data_dir, 'forms.json'), 'w') as f:
+        json.dump(form_records, f, indent=4)
+    
+    # Same one-record-per-line layout as the submission log
+    log_path = os.path.join(data_dir, 'submissions.jsonl')
+    with open(log_path, 'w') as f:
+        for i in range(submissions):
+            form = form_records[i % forms]
+            submission = {
+                'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'form_id': form['id'],
+                'submitted_by': rng.choice(usernames),
+                'submitted_at': (created_at + timedelta(seconds=i)).isoformat(),
+                'data': {name: _field_value(rng, field_type, options, i) for name, field_type, options in FORM_FIELDS}
+            }
+            f.write(json.dumps(submission, separators=(',', ':')) + '\n')
+    
+    manifest = {
+        'submissions': submissions,
+        'forms': forms,
+        'users': users,
+        'seed': seed,
+        'log_size': os.path.getsize(log_path),
+        'form_ids': [form['id'] for form in form_records],
+        'admin': ['admin', 'admin123'],
+        'user': ['user', 'user123']
+    }
+    with open(os.path.join(data_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def load_manifest(data_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the manifest of a previously generated dataset
+    
+    Args:
+        data_dir: Directory the dataset was written to
+        
+    Returns:
+        The manifest, or None if there is no readable one
+    """
+    try:
+        with open(os.path.join(data_dir, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def reset_dataset(data_dir: str, manifest: Dict[str, Any]):
+    """
+    Undo changes made by earlier benchmark runs so a dataset can be reused
+    
+    Submissions appended to the log after generation are cut off and the
+    SQLite database and saved aggregates are removed.
+    
+    Args:
+        data_dir: Directory the dataset was written to
+        manifest: The dataset's manifest
+    """
+    with open(os.path.join(data_dir, 'submissions.jsonl'), 'r+b') as f:
+        f.truncate(manifest['log_size'])
+    _remove_files(data_dir, _DERIVED_FILES)
+
+
+def migrate_to_sqlite(data_dir: str):
+    """
+    Copy a generated dataset into DATA_DIR/matchit.db for the SQLite backend
+    
+    MATCHIT_DATA_DIR must point at data_dir before anything from function/ is
+    imported, since the paths are read from the environment at import time.
+    
+    Args:
+        data_dir: Directory the dataset was written to
+    """
+    from function.config import DATA_DIR, SQLITE_PATH
+    from function.sqlite_repository import migrate_json_to_sqlite
+    
+    if os.path.abspath(DATA_DIR) != os.path.abspath(data_dir):
+        raise RuntimeError(f"MATCHIT_DATA_DIR is {DATA_DIR}, expected {data_dir}")
+    migrate_json_to_sqlite(SQLITE_PATH)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic MatchIt dataset for benchmarks')
+    parser.add_argument('--scale', choices=list(SCALES), default='1k', help='number of submissions')
+    parser.add_argument('--submissions', type=int, help='exact number of submissions (overrides --scale)')
+    parser.add_argument('--forms', type=int, default=4, help='number of forms')
+    parser.add_argument('--users', type=int, default=100, help='number of regular users')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--sqlite', action='store_true', help='also migrate the data into matchit.db')
+    parser.add_argument('data_dir', help='directory to write (use it as MATCHIT_DATA_DIR)')
+    args = parser.parse_args()
+    
+    count = args.submissions if args.submissions is not None else SCALES[args.scale]
+    generate_dataset(args.data_dir, count, args.forms, args.users, args.seed)
+    if args.sqlite:
+        os.environ['MATCHIT_DATA_DIR'] = args.data_dir
+        migrate_to_sqlite(args.data_dir)
+    print(f"Wrote {count} submissions for {args.forms} forms to {args.data_dir}")
\ No newline at end of file
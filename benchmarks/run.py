@@ -0,0 +1,320 @@
+# run.py
+# Timed benchmarks of the routes and analytics functions on a generated dataset
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.generate import (NUMERIC_FIELDS, SCALES, SUBMISSIONS_SNAPSHOT, generate_dataset, load_manifest,
+                                 migrate_to_sqlite, reset_dataset)
+
+# Version of the results layout, bumped when it changes
+RESULTS_FORMAT = 1
+
+# A benchmark: (name, function to time, optional setup run untimed before each call)
+Benchmark = Tuple[str, Callable[[], Any], Optional[Callable[[], Any]]]
+
+
+def time_call(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None,
+              warmup: int = 1) -> Dict[str, float]:
+    """
+    Time a function over several calls
+    
+    Args:
+        func: Function to call with no arguments
+        repeat: Number of timed calls
+        setup: Function called before every call, outside the timing
+        warmup: Number of untimed calls made first
+        
+    Returns:
+        Dictionary with repeat and the min, median, mean and max duration in seconds
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+    
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    
+    return {
+        'repeat': repeat,
+        'min': min(durations),
+        'median': statistics.median(durations),
+        'mean': statistics.mean(durations),
+        'max': max(durations)
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _prepare_dataset(data_dir: str, submissions: int, seed: int, regenerate: bool) -> Tuple[Dict, float]:
+    manifest = load_manifest(data_dir)
+    if (not regenerate and manifest is not None and manifest['submissions'] == submissions
+            and manifest['seed'] == seed):
+        reset_dataset(data_dir, manifest)
+        return manifest, 0.0
+    
+    start = time.perf_counter()
+    manifest = generate_dataset(data_dir, submissions, seed=seed)
+    return manifest, time.perf_counter() - start
+
+
+def _route_benchmarks(app, manifest: Dict) -> List[Benchmark]:
+    form_id = manifest['form_ids'][0]
+    
+    admin = app.test_client()
+    admin.post('/login', data={'username': manifest['admin'][0], 'password': manifest['admin'][1]})
+    user = app.test_client()
+    user.post('/login', data={'username': manifest['user'][0], 'password': manifest['user'][1]})
+    
+    def request(client, method: str, url: str, **kwargs) -> Callable[[], Any]:
+        def call():
+            response = client.open(url, method=method, **kwargs)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url} returned {response.status_code}")
+            response.get_data()
+        return call
+    
+    def clear_clustering_cache():
+        from function.calculate_clustering import get_result_cache
+        get_result_cache().clear()
+    
+    fill_form_data = {
+        'age': '42',
+        'rating': '3',
+        'level': '7',
+        'interests': ['1', '4'],
+        'nickname': 'benchmark',
+        'email': 'benchmark@example.com',
+        'joined': '2024-06-01',
+        'comments': ''
+    }
+    # A bulk import of 1000 records, one NDJSON line each
+    bulk_body = '\n'.join(json.dumps({'data': dict(fill_form_data, age=str(i))}) for i in range(1000))
+    
+    return [
+        ('route.fill_form', request(user, 'POST', f'/user/form/{form_id}', data=fill_form_data), None),
+        ('route.bulk_submissions.1000', request(admin, 'POST', f'/api/form/{form_id}/submissions:bulk', data=bulk_body,
+                                                content_type='application/x-ndjson'), None),
+        ('route.view_form_submissions', request(admin, 'GET', f'/admin/form/{form_id}/submissions'), None),
+        ('route.api_submissions', request(admin, 'GET', f'/api/submissions/{form_id}'), None),
+        ('route.api_submissions.page', request(admin, 'GET', f'/api/submissions/{form_id}?limit=100'), None),
+        ('route.api_stats', request(admin, 'GET', f'/api/stats/{form_id}'), None),
+        ('route.calculate_average', request(admin, 'GET', f'/api/calculate_average/{form_id}/age'), None),
+        ('route.calculate_maximum', request(admin, 'GET', f'/api/calculate_maximum/{form_id}/age'), None),
+        ('route.calculate_minimum', request(admin, 'GET', f'/api/calculate_minimum/{form_id}/age'), None),
+        ('route.calculate_percentile', request(admin, 'GET', f'/api/calculate_percentile/{form_id}/age'), None),
+        ('route.calculate_histogram', request(admin, 'GET', f'/api/calculate_histogram/{form_id}/age'), None),
+        ('route.calculate_clustering', request(admin, 'POST', f'/api/calculate_clustering/{form_id}/age',
+                                               json={'num_clusters': 5, 'method': 'kmeans', 'seed': 1}),
+         clear_clustering_cache),
+        ('route.calculate_clustering.cached', request(admin, 'POST', f'/api/calculate_clustering/{form_id}/age',
+                                                      json={'num_clusters': 5, 'method': 'kmeans', 'seed': 1}),
+         None),
+        ('route.calculate_multi_field_clustering', request(admin, 'POST', f'/api/calculate_clustering/{form_id}',
+                                                           json={'fields': NUMERIC_FIELDS, 'num_clusters': 5}),
+         None),
+    ]
+
+
+def _function_benchmarks(manifest: Dict, storage: str) -> List[Benchmark]:
+    from function import data_store
+    from function.calculate_clustering import (balanced_grouping, extract_numeric_values, kmeans_clustering,
+                                               optimal_clustering)
+    from function.calculate_statistics import scan_form_statistics
+    from function.column_cache import get_column_cache
+    from function.config import DATA_DIR, FORMS_FILE
+    from function.repository import get_repository
+    
+    form_id = manifest['form_ids'][0]
+    _, values, _ = extract_numeric_values(form_id, 'age')
+    
+    # Every submission as one JSON array, the format of the legacy submissions.json
+    submissions_file = os.path.join(DATA_DIR, SUBMISSIONS_SNAPSHOT)
+    
+    def save_submissions():
+        data_store.save_data(submissions_file, data_store.load_submissions())
+    
+    def before_load_submissions():
+        if not os.path.exists(submissions_file):
+            save_submissions()
+        data_store.invalidate(submissions_file)
+    
+    benchmarks = []
+    if storage == 'json':
+        benchmarks += [
+            ('data_store.load_data.forms', lambda: data_store.load_data(FORMS_FILE),
+             lambda: data_store.invalidate(FORMS_FILE)),
+            ('data_store.load_submissions.cold', data_store.load_submissions, lambda: data_store.invalidate()),
+            ('data_store.save_data.submissions', save_submissions, None),
+            ('data_store.load_data.submissions', lambda: data_store.load_data(submissions_file),
+             before_load_submissions),
+        ]
+    benchmarks += [
+        ('repository.submissions_for_form', lambda: get_repository().submissions_for_form(form_id), None),
+        ('calculate_statistics.scan_form_statistics', lambda: scan_form_statistics(form_id), None),
+        ('calculate_clustering.extract_numeric_values.cold', lambda: extract_numeric_values(form_id, 'age'),
+         get_column_cache().clear),
+        ('calculate_clustering.extract_numeric_values', lambda: extract_numeric_values(form_id, 'age'), None),
+        ('calculate_clustering.kmeans_clustering', lambda: kmeans_clustering(values, 5, rng=random.Random(1)), None),
+        ('calculate_clustering.optimal_clustering', lambda: optimal_clustering(values, 5), None),
+        ('calculate_clustering.balanced_grouping', lambda: balanced_grouping(values, 5), None),
+    ]
+    return benchmarks
+
+
+def run_benchmarks(data_dir: str, submissions: int, storage: str = 'json', repeat: int = 5, seed: int = 0,
+                   only: Optional[List[str]] = None, regenerate: bool = False) -> Dict[str, Any]:
+    """
+    Generate (or reuse) a dataset and time the routes and function modules on it
+    
+    Must run in a fresh process: MATCHIT_DATA_DIR and MATCHIT_STORAGE are set
+    here and the app reads them when it is first imported.
+    
+    Args:
+        data_dir: Directory for the dataset, reused if it already holds one
+            generated with the same size and seed
+        submissions: Number of submissions
+        storage: 'json' or 'sqlite'
+        repeat: Number of timed calls per benchmark
+        seed: Random seed of the dataset
+        only: Substrings; only benchmarks whose name contains one are run
+        regenerate: Generate the dataset even if a matching one exists
+        
+    Returns:
+        JSON-serializable results with the run's metadata, setup timings and
+        per-benchmark timings in seconds
+    """
+    if 'function.config' in sys.modules:
+        raise RuntimeError('run_benchmarks() must be called before the app is imported')
+    
+    manifest, generate_seconds = _prepare_dataset(data_dir, submissions, seed, regenerate)
+    os.environ['MATCHIT_DATA_DIR'] = data_dir
+    os.environ['MATCHIT_STORAGE'] = storage
+    
+    setup = {'generate': generate_seconds}
+    if storage == 'sqlite':
+        start = time.perf_counter()
+        migrate_to_sqlite(data_dir)
+        setup['migrate_sqlite'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    import app as app_module
+    from function.field_aggregates import get_aggregate_store
+    from function.json_codec import BACKEND as json_backend
+    setup['import_app'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    get_aggregate_store()
+    setup['aggregate_store'] = time.perf_counter() - start
+    
+    app_module.app.testing = True
+    benchmarks = _route_benchmarks(app_module.app, manifest) + _function_benchmarks(manifest, storage)
+    
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    
+    results = {}
+    for name, func, before in benchmarks:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = time_call(func, repeat, before)
+        print(f"{name}: median {results[name]['median'] * 1000:.1f} ms", file=sys.stderr)
+    
+    return {
+        'format': RESULTS_FORMAT,
+        'meta': {
+            'submissions': submissions,
+            'forms': manifest['forms'],
+            'seed': seed,
+            'storage': storage,
+            'repeat': repeat,
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': numpy_version,
+            'json': json_backend,
+            'platform': platform.platform(),
+            'started_at': datetime.now().isoformat()
+        },
+        'setup': setup,
+        'results': results
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """
+    Compare the median timings of two runs
+    
+    Args:
+        baseline: Results of the earlier run
+        current: Results of the later run
+        
+    Returns:
+        One line per benchmark present in both runs, with both medians and the
+        ratio current / baseline
+    """
+    lines = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        lines.append(f"{name:<50} {before['median'] * 1000:>10.1f} ms {result['median'] * 1000:>10.1f} ms {ratio:>7.2f}x")
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the MatchIt benchmarks and print the results as JSON')
+    parser.add_argument('--scale', choices=list(SCALES), default='1k', help='number of submissions')
+    parser.add_argument('--submissions', type=int, help='exact number of submissions (overrides --scale)')
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json', help='storage backend')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the dataset')
+    parser.add_argument('--data-dir', help='dataset directory (default: a directory under the system temp dir)')
+    parser.add_argument('--regenerate', action='store_true', help='generate the dataset even if it exists')
+    parser.add_argument('--only', action='append', help='run only benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    args = parser.parse_args()
+    
+    count = args.submissions if args.submissions is not None else SCALES[args.scale]
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), f'matchit-bench-{count}-{args.seed}')
+    
+    results = run_benchmarks(data_dir, count, args.storage, args.repeat, args.seed, args.only, args.regenerate)
+    
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print('\n'.join(compare_results(baseline, results)), file=sys.stderr)
\ No newline at end of file
@@ -0,0 +1,252 @@
+# bulk_import.py
+# Parsing and validation of submissions imported in bulk (NDJSON or a JSON array)
+
+import math
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from function import json_codec
+from function.form_schema import FormSchema
+
+# Keys allowed at the top level of an imported record
+RECORD_KEYS = {'data', 'submitted_by', 'submitted_at'}
+
+
+class BulkImportError(ValueError):
+    """
+    The request body as a whole cannot be read
+    """
+
+
+class TooManyRecords(BulkImportError):
+    """
+    The import holds more records than one request may carry
+    """
+
+
+def parse_records(body: bytes, content_type: Optional[str] = None) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """
+    Split a request body into records
+    
+    NDJSON is used when the content type says so (application/x-ndjson,
+    application/jsonl, ...) or when the body does not start with '['; a line
+    that is not valid JSON is reported for that record only. A JSON array must
+    parse as a whole.
+    
+    Args:
+        body: Raw request body
+        content_type: Content-Type of the request
+        
+    Returns:
+        Iterator over (record index, parsed record or None, error message or None)
+        
+    Raises:
+        BulkImportError: If the body is not valid UTF-8 or not a valid JSON array
+    """
+    try:
+        text = body.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise BulkImportError(f"Body is not valid UTF-8: {e}")
+    
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    ndjson = 'ndjson' in mimetype or 'jsonl' in mimetype or 'json-seq' in mimetype
+    if not ndjson and text.lstrip().startswith('['):
+        try:
+            records = json_codec.loads(text)
+        except ValueError as e:
+            raise BulkImportError(f"Body is not a valid JSON array: {e}")
+        for index, record in enumerate(records):
+            yield index, record, None
+        return
+    
+    lines = [line for line in text.splitlines() if line.strip()]
+    try:
+        # One parse for the whole body is much faster than one per line; a line
+        # holding several values (or none) shows up as a count mismatch
+        records = json_codec.loads('[' + ','.join(lines) + ']')
+        if len(records) == len(lines):
+            for index, record in enumerate(records):
+                yield index, record, None
+            return
+    except ValueError:
+        pass
+    
+    # Some line is not a single JSON value: parse line by line to find which
+    for index, line in enumerate(lines):
+        try:
+            yield index, json_codec.loads(line), None
+        except ValueError as e:
+            yield index, None, f"Invalid JSON: {e}"
+
+
+def _text_value(value: Any) -> Optional[str]:
+    # Form posts store every value as a string; numbers are accepted and converted
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def validate_value(schema: FormSchema, field_name: str, value: Any) -> Tuple[Any, Optional[str]]:
+    """
+    Check one submitted value against its field definition
+    
+    Values are normalized to what fill_form stores: strings, and lists of
+    strings for checkbox fields.
+    
+    Args:
+        schema: Compiled schema of the form
+        field_name: Name of the field
+        value: The submitted value
+        
+    Returns:
+        Tuple containing (normalized value, error message or None)
+    """
+    field = schema.fields[field_name]
+    field_type = field['type']
+    options = schema.options[field_name]
+    
+    if field_type == 'checkbox':
+        items = value if isinstance(value, list) else [value]
+        normalized = [_text_value(item) for item in items]
+        if None in normalized:
+            return None, 'must be a list of strings or numbers'
+        if options and not options.issuperset(normalized):
+            return None, f"unknown option(s): {', '.join(item for item in normalized if item not in options)}"
+        if field.get('required') and not normalized:
+            return None, 'is required'
+        return normalized, None
+    
+    normalized = _text_value(value)
+    if normalized is None:
+        return None, 'must be a string or a number'
+    if normalized == '':
+        return normalized, 'is required' if field.get('required') else None
+    
+    if field_type == 'number':
+        try:
+            number = float(normalized)
+        except ValueError:
+            return None, 'must be a number'
+        if not math.isfinite(number):
+            return None, 'must be a finite number'
+    elif field_type in ('radio', 'select'):
+        if options and normalized not in options:
+            return None, f"unknown option: {normalized}"
+    elif field_type == 'email':
+        if '@' not in normalized:
+            return None, 'must be an email address'
+    elif field_type == 'date':
+        try:
+            date.fromisoformat(normalized)
+        except ValueError:
+            return None, 'must be a date (YYYY-MM-DD)'
+    return normalized, None
+
+
+def build_submission(schema: FormSchema, record: Any, default_submitted_by: str,
+                     default_submitted_at: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Validate an imported record and turn it into a submission
+    
+    A record is an object with the field values under 'data' and optionally
+    'submitted_by' and 'submitted_at' (ISO 8601). Fields missing from 'data'
+    are stored empty, as fill_form does; unknown fields are rejected.
+    
+    Args:
+        schema: Compiled schema of the target form
+        record: The parsed record
+        default_submitted_by: submitted_by used when the record has none
+        default_submitted_at: submitted_at used when the record has none
+            (default: the current time)
+            
+    Returns:
+        Tuple containing (the submission, or None if the record is invalid,
+                         error message or None)
+    """
+    if not isinstance(record, dict):
+        return None, 'Record must be an object'
+    extra = set(record) - RECORD_KEYS
+    if extra:
+        return None, f"Unknown keys: {', '.join(sorted(extra))}"
+    values = record.get('data')
+    if not isinstance(values, dict):
+        return None, "'data' must be an object of field values"
+    
+    unknown = [name for name in values if name not in schema.fields]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}"
+    
+    data = {}
+    errors = []
+    for field_name in schema.fields:
+        if field_name in values:
+            value, error = validate_value(schema, field_name, values[field_name])
+        else:
+            value, error = validate_value(schema, field_name, [] if field_name in schema.checkbox_fields else '')
+        if error:
+            errors.append(f"{field_name} {error}")
+        data[field_name] = value
+    if errors:
+        return None, '; '.join(errors)
+    
+    submitted_by = record.get('submitted_by', default_submitted_by)
+    if not isinstance(submitted_by, str) or not submitted_by:
+        return None, "'submitted_by' must be a non-empty string"
+    
+    submitted_at = record.get('submitted_at')
+    if submitted_at is None:
+        submitted_at = default_submitted_at or datetime.now().isoformat()
+    else:
+        try:
+            # Normalized so submissions sort by time as strings
+            submitted_at = datetime.fromisoformat(submitted_at).isoformat()
+        except (TypeError, ValueError):
+            return None, "'submitted_at' must be an ISO 8601 date and time"
+    
+    return {
+        'id': str(uuid.uuid4()),
+        'form_id': schema.id,
+        'submitted_by': submitted_by,
+        'submitted_at': submitted_at,
+        'data': data
+    }, None
+
+
+def prepare_import(schema: FormSchema, records: Iterator[Tuple[int, Any, Optional[str]]], default_submitted_by: str,
+                   max_records: int) -> Tuple[List[Dict], List[Dict[str, Any]], int]:
+    """
+    Validate every record of a bulk import
+    
+    Args:
+        schema: Compiled schema of the target form
+        records: Records from parse_records()
+        default_submitted_by: submitted_by used for records without one
+        max_records: Largest number of records accepted in one import
+        
+    Returns:
+        Tuple containing (submissions built from the valid records,
+                         list of {'index', 'error'} for the invalid ones,
+                         number of records received)
+                         
+    Raises:
+        TooManyRecords: If there are more than max_records records
+    """
+    # Records without a time all get the time the import arrived
+    submitted_at = datetime.now().isoformat()
+    submissions = []
+    errors = []
+    received = 0
+    for index, record, error in records:
+        received += 1
+        if received > max_records:
+            raise TooManyRecords(f"Too many records, at most {max_records} are accepted per request")
+        if error is None:
+            submission, error = build_submission(schema, record, default_submitted_by, submitted_at)
+        if error is None:
+            submissions.append(submission)
+        else:
+            errors.append({'index': index, 'error': error})
+    return submissions, errors, received
\ No newline at end of file
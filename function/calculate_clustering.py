@@ -1,124 +1,84 @@
 # calculate_clustering.py
 # Module for clustering form submissions based on numeric field values
 
-import json
-import os
+import math
 import random
+from itertools import compress
 from typing import Dict, List, Union, Tuple, Optional
 
-# Data file paths
-SUBMISSIONS_FILE = os.path.join('data', 'submissions.json')
-FORMS_FILE = os.path.join('data', 'forms.json')
+from function.column_cache import get_column_cache
+from function.config import CLUSTER_CACHE_SIZE
+from function.form_schema import get_form_schemas
+from function.jobs import report_progress
+from function.metrics import timed
+from function.repository import get_repository
+from function.result_cache import ResultCache
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the pure-Python implementation is used without it
+    np = None
 
-def load_data(file_path: str) -> List[Dict]:
-    """
-    Load data from a JSON file
-    
-    Args:
-        file_path: Path to the JSON file
-        
-    Returns:
-        List of dictionaries containing the data
-    """
-    try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading data from {file_path}: {e}")
-        return []
+# Rows per block when computing point-to-centroid distances with NumPy, which
+# bounds the temporary distance matrix to NUMPY_BLOCK_SIZE x k values
+NUMPY_BLOCK_SIZE = 65536
 
+# Values accepted for the clustering "method" parameter
+CLUSTERING_METHODS = ['kmeans', 'optimal', 'balanced']
 
-def is_numeric(value: str) -> bool:
-    """
-    Check if a value can be converted to a number
-    
-    Args:
-        value: The value to check
-        
-    Returns:
-        True if the value can be converted to a number, False otherwise
-    """
-    try:
-        float(value)
-        return True
-    except (ValueError, TypeError):
-        return False
+_result_cache = ResultCache(CLUSTER_CACHE_SIZE)
 
 
-def get_form_field_type(form_id: str, field_name: str) -> Optional[str]:
+def check_cluster_counts(num_clusters, members_per_cluster) -> Optional[str]:
     """
-    Get the type of a field in a form
+    Check the num_clusters and members_per_cluster parameters of a clustering request
     
     Args:
-        form_id: ID of the form
-        field_name: Name of the field
+        num_clusters: Requested number of clusters, or None
+        members_per_cluster: Requested members per cluster, or None
         
     Returns:
-        Type of the field or None if not found
-    """
-    forms = load_data(FORMS_FILE)
-    for form in forms:
-        if form['id'] == form_id:
-            for field in form['fields']:
-                if field['name'] == field_name:
-                    return field['type']
+        Error message, or None if both are None or a positive integer
+    """
+    for name, value in (('num_clusters', num_clusters), ('members_per_cluster', members_per_cluster)):
+        if value is None:
+            continue
+        # JSON true/false arrive as bools, which are ints in Python
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            return f"{name} must be a positive integer"
     return None
 
 
-def extract_numeric_values(form_id: str, field_name: str) -> Tuple[List[Dict], List[float], int]:
+@timed()
+def extract_numeric_values(form_id: str, field_name: str) -> Tuple[List[Tuple[str, str, str]], List[float], int]:
     """
     Extract numeric values for a specific field from form submissions
     
+    Values come from the column cache, so each submission is only parsed once
+    however often the form is clustered. For checkbox fields the first numeric
+    item is used.
+    
     Args:
         form_id: ID of the form
         field_name: Name of the field to extract values from
         
     Returns:
-        Tuple containing (list of submissions with numeric values,
+        Tuple containing (list of (id, submitted_by, submitted_at) for the
+                         submissions with numeric values,
                          list of numeric values,
                          count of non-numeric values skipped)
     """
-    submissions = load_data(SUBMISSIONS_FILE)
-    
-    # Filter submissions for the specified form
-    form_submissions = [s for s in submissions if s['form_id'] == form_id]
-    
-    if not form_submissions:
-        return [], [], 0
-    
     # Check if the field is numeric type
-    field_type = get_form_field_type(form_id, field_name)
-    if field_type not in ['number', 'radio', 'select', 'checkbox']:
+    schema = get_form_schemas().get(form_id)
+    if not schema or not schema.is_numeric(field_name):
         return [], [], 0
     
-    valid_submissions = []
-    numeric_values = []
-    non_numeric_count = 0
+    rows, (column,) = get_column_cache().form_columns(form_id, [field_name])
     
-    for submission in form_submissions:
-        if field_name in submission['data']:
-            value = submission['data'][field_name]
-            
-            # Handle different types of values
-            if isinstance(value, list):  # For checkbox fields
-                # For clustering, we'll use the first numeric value in the list
-                numeric_found = False
-                for item in value:
-                    if is_numeric(item):
-                        numeric_values.append(float(item))
-                        valid_submissions.append(submission)
-                        numeric_found = True
-                        break
-                if not numeric_found:
-                    non_numeric_count += 1
-            elif is_numeric(value):
-                numeric_values.append(float(value))
-                valid_submissions.append(submission)
-            else:
-                non_numeric_count += 1
-    
-    return valid_submissions, numeric_values, non_numeric_count
+    valid_submissions = list(compress(rows, column.valid))
+    numeric_values = list(compress(column.values, column.valid))
+    
+    return valid_submissions, numeric_values, column.non_numeric_count
 
 
 def calculate_distance(point1: float, point2: float) -> float:
@@ -163,7 +123,7 @@ def assign_to_clusters(data_points: List[float], centroids: List[float]) -> List
     return assignments
 
 
-def update_centroids(data_points: List[float], assignments: List[int], k: int) -> List[float]:
+def update_centroids(data_points: List[float], assignments: List[int], k: int, rng: random.Random = None) -> List[float]:
     """
     Update centroid values based on the mean of assigned points
     
@@ -171,6 +131,7 @@ def update_centroids(data_points: List[float], assignments: List[int], k: int) -
         data_points: List of data points
         assignments: List of cluster assignments
         k: Number of clusters
+        rng: Random number generator for reseeding empty clusters (default: the random module)
         
     Returns:
         List of updated centroid values
@@ -190,35 +151,33 @@ def update_centroids(data_points: List[float], assignments: List[int], k: int) -
         else:
             # If a cluster is empty, keep the old centroid or assign a random point
             if data_points:
-                new_centroids[i] = random.choice(data_points)
+                new_centroids[i] = (rng or random).choice(data_points)
     
     return new_centroids
 
 
-def kmeans_clustering(data_points: List[float], k: int, max_iterations: int = 100) -> Tuple[List[int], List[float]]:
+def _kmeans_python(data_points: List[float], k: int, max_iterations: int, rng) -> Tuple[List[int], List[float]]:
     """
-    Perform K-means clustering on the data points
+    Pure-Python K-means loop used when NumPy is not available
     
     Args:
         data_points: List of data points
         k: Number of clusters
         max_iterations: Maximum number of iterations
+        rng: Random number generator
         
     Returns:
         Tuple containing (list of cluster assignments, list of centroid values)
     """
-    if not data_points or k <= 0 or k > len(data_points):
-        return [], []
-    
     # Initialize centroids randomly
-    centroids = random.sample(data_points, k)
+    centroids = rng.sample(data_points, k)
     
     for _ in range(max_iterations):
         # Assign points to clusters
         assignments = assign_to_clusters(data_points, centroids)
         
         # Update centroids
-        new_centroids = update_centroids(data_points, assignments, k)
+        new_centroids = update_centroids(data_points, assignments, k, rng)
         
         # Check for convergence
         if all(abs(new - old) < 0.001 for new, old in zip(new_centroids, centroids)):
@@ -229,20 +188,466 @@ def kmeans_clustering(data_points: List[float], k: int, max_iterations: int = 10
     return assign_to_clusters(data_points, centroids), centroids
 
 
-def cluster_submissions(form_id: str, field_name: str, num_clusters: int = None, members_per_cluster: int = None) -> Dict:
+def _assign_to_clusters_numpy(points: 'np.ndarray', centroids: 'np.ndarray') -> 'np.ndarray':
+    """
+    Vectorized version of assign_to_clusters
+    
+    Distances are broadcast block by block; ties go to the lowest centroid index
+    as in the pure-Python version.
+    
+    Args:
+        points: 1-D array of data points
+        centroids: 1-D array of centroid values
+        
+    Returns:
+        Array of cluster assignments
+    """
+    assignments = np.empty(len(points), dtype=np.intp)
+    for start in range(0, len(points), NUMPY_BLOCK_SIZE):
+        block = points[start:start + NUMPY_BLOCK_SIZE]
+        distances = np.abs(block[:, None] - centroids[None, :])
+        assignments[start:start + NUMPY_BLOCK_SIZE] = distances.argmin(axis=1)
+    return assignments
+
+
+def _update_centroids_numpy(data_points: List[float], points: 'np.ndarray', assignments: 'np.ndarray', k: int,
+                            rng) -> 'np.ndarray':
+    """
+    Vectorized version of update_centroids using bincount sums
+    
+    Args:
+        data_points: Original list of data points (used to reseed empty clusters)
+        points: 1-D array of the same data points
+        assignments: Array of cluster assignments
+        k: Number of clusters
+        rng: Random number generator for reseeding empty clusters
+        
+    Returns:
+        Array of updated centroid values
+    """
+    counts = np.bincount(assignments, minlength=k)
+    sums = np.bincount(assignments, weights=points, minlength=k)
+    new_centroids = sums / np.maximum(counts, 1)
+    
+    # Reseed empty clusters the same way (and in the same order) as update_centroids
+    for i in np.flatnonzero(counts == 0):
+        new_centroids[i] = rng.choice(data_points)
+    
+    return new_centroids
+
+
+def _kmeans_numpy(data_points: List[float], k: int, max_iterations: int, rng) -> Tuple[List[int], List[float]]:
+    """
+    NumPy K-means loop with the same initialization, reseeding and convergence
+    rule as _kmeans_python, so both give the same result for the same random state
+    
+    Args:
+        data_points: List of data points
+        k: Number of clusters
+        max_iterations: Maximum number of iterations
+        rng: Random number generator
+        
+    Returns:
+        Tuple containing (list of cluster assignments, list of centroid values)
+    """
+    points = np.asarray(data_points, dtype=float)
+    
+    # Initialize centroids randomly
+    centroids = np.asarray(rng.sample(data_points, k), dtype=float)
+    
+    for _ in range(max_iterations):
+        assignments = _assign_to_clusters_numpy(points, centroids)
+        new_centroids = _update_centroids_numpy(data_points, points, assignments, k, rng)
+        
+        # Check for convergence
+        if np.all(np.abs(new_centroids - centroids) < 0.001):
+            break
+        
+        centroids = new_centroids
+    
+    return _assign_to_clusters_numpy(points, centroids).tolist(), centroids.tolist()
+
+
+@timed()
+def kmeans_clustering(data_points: List[float], k: int, max_iterations: int = 100,
+                      rng: random.Random = None) -> Tuple[List[int], List[float]]:
+    """
+    Perform K-means clustering on the data points
+    
+    Uses the vectorized NumPy implementation when NumPy is installed and the
+    pure-Python one otherwise.
+    
+    Args:
+        data_points: List of data points
+        k: Number of clusters
+        max_iterations: Maximum number of iterations
+        rng: Random number generator (default: the random module)
+        
+    Returns:
+        Tuple containing (list of cluster assignments, list of centroid values)
+    """
+    if not data_points or k <= 0 or k > len(data_points):
+        return [], []
+    
+    rng = rng or random
+    if np is not None:
+        return _kmeans_numpy(data_points, k, max_iterations, rng)
+    return _kmeans_python(data_points, k, max_iterations, rng)
+
+
+def _sorted_prefix_sums(sorted_points: List[float]) -> Tuple[List[float], List[float]]:
+    """
+    Prefix sums of the sorted points and their squares
+    
+    Values are shifted by the median first so the sum-of-squares formula does
+    not lose precision on large values with a small spread, then divided by
+    their largest distance from it so the squares cannot overflow on huge
+    values. Every cluster cost shrinks by the same factor, so the best split
+    is unchanged.
+    
+    Args:
+        sorted_points: Data points in ascending order
+        
+    Returns:
+        Tuple containing (prefix sums, prefix sums of squares), each of length n + 1
+    """
+    shift = sorted_points[len(sorted_points) // 2]
+    scale = max(shift - sorted_points[0], sorted_points[-1] - shift)
+    if math.isinf(scale):
+        # The spread itself overflows; halved values cannot
+        sorted_points = [point / 2 for point in sorted_points]
+        shift /= 2
+        scale = max(shift - sorted_points[0], sorted_points[-1] - shift)
+    if scale == 0:
+        scale = 1.0
+    
+    sums = [0.0]
+    squares = [0.0]
+    for point in sorted_points:
+        value = (point - shift) / scale
+        sums.append(sums[-1] + value)
+        squares.append(squares[-1] + value * value)
+    return sums, squares
+
+
+def _optimal_layers_python(sums: List[float], squares: List[float], k: int) -> List[List[int]]:
+    """
+    Dynamic program over the sorted points, one layer per cluster count
+    
+    cost[m][i] is the smallest within-cluster sum of squares of the first i + 1
+    points split into m + 1 clusters. The best start of the last cluster never
+    decreases as i grows, so each layer is filled by divide and conquer in
+    O(N log N) instead of O(N^2).
+    
+    Args:
+        sums: Prefix sums from _sorted_prefix_sums
+        squares: Prefix sums of squares from _sorted_prefix_sums
+        k: Number of clusters
+        
+    Returns:
+        List of k lists; entry [m][i] is the index of the first point of the
+        last cluster in the best split of points 0..i into m + 1 clusters
+    """
+    n = len(sums) - 1
+    
+    def sse(j: int, i: int) -> float:
+        total = sums[i + 1] - sums[j]
+        return max(0.0, squares[i + 1] - squares[j] - total * total / (i - j + 1))
+    
+    cost = [sse(0, i) for i in range(n)]
+    starts = [[0] * n]
+    
+    for m in range(1, k):
+        previous = cost
+        cost = [0.0] * n
+        start = [0] * n
+        
+        # Each entry: (first i, last i, smallest possible start, largest possible start)
+        stack = [(m, n - 1, m, n - 1)]
+        while stack:
+            lo, hi, opt_lo, opt_hi = stack.pop()
+            mid = (lo + hi) // 2
+            best_cost = float('inf')
+            best_start = opt_lo
+            for j in range(opt_lo, min(mid, opt_hi) + 1):
+                candidate = previous[j - 1] + sse(j, mid)
+                if candidate < best_cost:
+                    best_cost = candidate
+                    best_start = j
+            cost[mid] = best_cost
+            start[mid] = best_start
+            if lo < mid:
+                stack.append((lo, mid - 1, opt_lo, best_start))
+            if mid < hi:
+                stack.append((mid + 1, hi, best_start, opt_hi))
+        
+        starts.append(start)
+    
+    return starts
+
+
+def _optimal_layers_numpy(sums: List[float], squares: List[float], k: int) -> List['np.ndarray']:
+    """
+    Vectorized version of _optimal_layers_python
+    
+    All subproblems at the same depth of the divide and conquer are evaluated
+    together, so each layer takes O(log N) array passes of O(N) elements.
+    Candidates are compared in the same order, so the result is identical.
+    
+    Args:
+        sums: Prefix sums from _sorted_prefix_sums
+        squares: Prefix sums of squares from _sorted_prefix_sums
+        k: Number of clusters
+        
+    Returns:
+        List of k arrays, as returned by _optimal_layers_python
+    """
+    sums = np.asarray(sums)
+    squares = np.asarray(squares)
+    n = len(sums) - 1
+    
+    def sse(j: 'np.ndarray', i: 'np.ndarray') -> 'np.ndarray':
+        total = sums[i + 1] - sums[j]
+        return np.maximum(0.0, squares[i + 1] - squares[j] - total * total / (i - j + 1))
+    
+    every = np.arange(n)
+    cost = sse(np.zeros(n, dtype=np.intp), every)
+    starts = [np.zeros(n, dtype=np.intp)]
+    
+    for m in range(1, k):
+        previous = cost
+        cost = np.zeros(n)
+        start = np.zeros(n, dtype=np.intp)
+        
+        lo = np.array([m])
+        hi = np.array([n - 1])
+        opt_lo = np.array([m])
+        opt_hi = np.array([n - 1])
+        while len(lo):
+            mid = (lo + hi) // 2
+            counts = np.minimum(mid, opt_hi) - opt_lo + 1
+            offsets = np.cumsum(counts) - counts
+            segment = np.repeat(np.arange(len(mid)), counts)
+            j = opt_lo[segment] + (np.arange(counts.sum()) - offsets[segment])
+            candidates = previous[j - 1] + sse(j, mid[segment])
+            
+            # First position of each segment's minimum, matching the strict < in the Python loop
+            best_cost = np.minimum.reduceat(candidates, offsets)
+            hits = np.flatnonzero(candidates == best_cost[segment])
+            first = hits[np.r_[True, segment[hits][1:] != segment[hits][:-1]]]
+            best_start = j[first]
+            
+            cost[mid] = best_cost
+            start[mid] = best_start
+            
+            left = lo < mid
+            right = mid < hi
+            lo, hi, opt_lo, opt_hi = (
+                np.concatenate((lo[left], mid[right] + 1)),
+                np.concatenate((mid[left] - 1, hi[right])),
+                np.concatenate((opt_lo[left], best_start[right])),
+                np.concatenate((best_start[left], opt_hi[right])),
+            )
+        
+        starts.append(start)
+    
+    return starts
+
+
+@timed()
+def optimal_clustering(data_points: List[float], k: int) -> Tuple[List[int], List[float]]:
+    """
+    Split the data points into k clusters with the smallest possible
+    within-cluster sum of squares
+    
+    In one dimension the optimal clusters are contiguous runs of the sorted
+    values, so they can be found exactly with a dynamic program (as in
+    Ckmeans.1d.dp) in O(k * N log N) time. Unlike kmeans_clustering the result
+    does not depend on random initialization: the same data always gives the
+    same clusters, numbered in ascending order of their centroids.
+    
+    Args:
+        data_points: List of data points
+        k: Number of clusters
+        
+    Returns:
+        Tuple containing (list of cluster assignments, list of centroid values)
+    """
+    if not data_points or k <= 0 or k > len(data_points):
+        return [], []
+    
+    order = sorted(range(len(data_points)), key=data_points.__getitem__)
+    sorted_points = [data_points[i] for i in order]
+    sums, squares = _sorted_prefix_sums(sorted_points)
+    
+    if np is not None:
+        starts = _optimal_layers_numpy(sums, squares, k)
+    else:
+        starts = _optimal_layers_python(sums, squares, k)
+    
+    # Walk back from the last point to recover where each cluster starts
+    bounds = []
+    end = len(sorted_points) - 1
+    for m in range(k - 1, -1, -1):
+        begin = int(starts[m][end])
+        bounds.append((begin, end))
+        end = begin - 1
+    bounds.reverse()
+    
+    assignments = [0] * len(data_points)
+    centroids = []
+    for cluster, (begin, end) in enumerate(bounds):
+        for position in range(begin, end + 1):
+            assignments[order[position]] = cluster
+        centroids.append(sum(sorted_points[begin:end + 1]) / (end - begin + 1))
+    
+    return assignments, centroids
+
+
+@timed()
+def balanced_grouping(data_points: List[float], k: int) -> Tuple[List[int], List[float]]:
+    """
+    Split the data points into k groups of near-equal size with the smallest
+    possible within-group sum of squares
+    
+    Every group gets N // k or N // k + 1 members. The best groups are
+    contiguous runs of the sorted values, so only the positions of the larger
+    groups remain to be chosen; a dynamic program over (groups placed, larger
+    groups used) does that in O(k * r) steps, where r = N mod k. When k comes
+    from members_per_cluster, r is smaller than members_per_cluster, so after
+    the O(N log N) sort the grouping itself is linear. Ties go to placing the
+    larger groups last, so the result is deterministic.
+    
+    Args:
+        data_points: List of data points
+        k: Number of groups
+        
+    Returns:
+        Tuple containing (list of group assignments, list of group means)
+    """
+    if not data_points or k <= 0 or k > len(data_points):
+        return [], []
+    
+    n = len(data_points)
+    order = sorted(range(n), key=data_points.__getitem__)
+    sorted_points = [data_points[i] for i in order]
+    sums, squares = _sorted_prefix_sums(sorted_points)
+    size, extra = divmod(n, k)
+    
+    def sse(start: int, count: int) -> float:
+        total = sums[start + count] - sums[start]
+        return max(0.0, squares[start + count] - squares[start] - total * total / count)
+    
+    # cost[b]: best spread of the groups placed so far when b of them are larger;
+    # larger[g][b] records whether group g is a larger one in that solution
+    cost = [0.0] + [float('inf')] * extra
+    larger = []
+    for g in range(k):
+        new_cost = [float('inf')] * (extra + 1)
+        choice = bytearray(extra + 1)
+        # b larger groups among the first g + 1, leaving room for the rest
+        for b in range(max(0, extra - (k - g - 1)), min(g + 1, extra) + 1):
+            if cost[b] < float('inf'):
+                new_cost[b] = cost[b] + sse(g * size + b, size)
+            if b > 0 and cost[b - 1] < float('inf'):
+                candidate = cost[b - 1] + sse(g * size + b - 1, size + 1)
+                if candidate < new_cost[b]:
+                    new_cost[b] = candidate
+                    choice[b] = 1
+        cost = new_cost
+        larger.append(choice)
+    
+    # Walk back from the last group to recover the group sizes
+    counts = []
+    b = extra
+    for g in range(k - 1, -1, -1):
+        big = larger[g][b]
+        counts.append(size + big)
+        b -= big
+    counts.reverse()
+    
+    assignments = [0] * n
+    centroids = []
+    start = 0
+    for group, count in enumerate(counts):
+        for position in range(start, start + count):
+            assignments[order[position]] = group
+        centroids.append(sum(sorted_points[start:start + count]) / count)
+        start += count
+    
+    return assignments, centroids
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the process-wide cache of cluster_submissions results
+    
+    Returns:
+        The shared ResultCache
+    """
+    return _result_cache
+
+
+@timed()
+def cluster_submissions(form_id: str, field_name: str, num_clusters: int = None, members_per_cluster: int = None,
+                        method: Optional[str] = None, seed: Optional[int] = None) -> Dict:
     """
     Cluster form submissions based on a numeric field value
     
+    Successful results are cached per form, keyed by the field, its type, the
+    parameters and the seed, and are reused until a submission is added to the
+    form. Without a seed the cached K-means result is one random outcome that
+    is reused for the same parameters.
+    
     Args:
         form_id: ID of the form
         field_name: Name of the field to cluster by
         num_clusters: Number of clusters to create (if None, will use members_per_cluster)
         members_per_cluster: Target number of members per cluster (if None, will use num_clusters)
+        method: 'kmeans' (randomly initialized K-means), 'optimal' (exact,
+            deterministic 1-D clustering) or 'balanced' (groups of near-equal
+            size); default is 'balanced' when only members_per_cluster is
+            given and 'kmeans' otherwise
+        seed: Seed for K-means initialization, for reproducible results
         
     Returns:
-        Dictionary containing clustering results
+        Dictionary containing clustering results, with 'cached' set when the
+        result came from the cache
     """
+    if method is None:
+        method = 'balanced' if num_clusters is None and members_per_cluster is not None else 'kmeans'
+    
+    if method not in CLUSTERING_METHODS:
+        return {
+            'success': False,
+            'message': f"Unknown clustering method '{method}'"
+        }
+    
+    error = check_cluster_counts(num_clusters, members_per_cluster)
+    if error:
+        return {
+            'success': False,
+            'message': error
+        }
+    
+    cache = get_result_cache()
+    version = get_repository().form_data_version(form_id)
+    key = (field_name, get_form_schemas().field_type(form_id, field_name), num_clusters, members_per_cluster, method, seed)
+    
+    result = cache.get(form_id, version, key)
+    if result is not None:
+        return dict(result, cached=True)
+    
+    result = _cluster_submissions(form_id, field_name, num_clusters, members_per_cluster, method, seed)
+    if result['success']:
+        cache.put(form_id, version, key, result)
+    return dict(result, cached=False)
+
+
+def _cluster_submissions(form_id: str, field_name: str, num_clusters: Optional[int], members_per_cluster: Optional[int],
+                         method: str, seed: Optional[int]) -> Dict:
     submissions, numeric_values, non_numeric_count = extract_numeric_values(form_id, field_name)
+    report_progress(0.5)
     
     if not submissions or not numeric_values:
         return {
@@ -262,21 +667,28 @@ def cluster_submissions(form_id: str, field_name: str, num_clusters: int = None,
     # Ensure we don't have more clusters than data points
     num_clusters = min(num_clusters, len(numeric_values))
     
-    # Perform K-means clustering
-    assignments, centroids = kmeans_clustering(numeric_values, num_clusters)
+    # Perform the clustering
+    if method == 'optimal':
+        assignments, centroids = optimal_clustering(numeric_values, num_clusters)
+    elif method == 'balanced':
+        assignments, centroids = balanced_grouping(numeric_values, num_clusters)
+    else:
+        rng = random.Random(seed) if seed is not None else None
+        assignments, centroids = kmeans_clustering(numeric_values, num_clusters, rng=rng)
     
     # Group submissions by cluster
     clusters = [[] for _ in range(num_clusters)]
     for i, assignment in enumerate(assignments):
+        submission_id, submitted_by, submitted_at = submissions[i]
         clusters[assignment].append({
-            'submission_id': submissions[i]['id'],
-            'submitted_by': submissions[i]['submitted_by'],
-            'submitted_at': submissions[i]['submitted_at'],
+            'submission_id': submission_id,
+            'submitted_by': submitted_by,
+            'submitted_at': submitted_at,
             'value': numeric_values[i]
         })
     
     # Sort clusters by centroid value
-    sorted_clusters = sorted(zip(centroids, clusters))
+    sorted_clusters = sorted(zip(centroids, clusters), key=lambda pair: pair[0])
     
     # Format the results
     result_clusters = []
@@ -291,6 +703,7 @@ def cluster_submissions(form_id: str, field_name: str, num_clusters: int = None,
     return {
         'success': True,
         'field_name': field_name,
+        'method': method,
         'num_clusters': num_clusters,
         'total_submissions': len(numeric_values),
         'non_numeric_count': non_numeric_count,
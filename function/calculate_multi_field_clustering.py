@@ -0,0 +1,424 @@
+# calculate_multi_field_clustering.py
+# Module for clustering form submissions on several numeric fields at once
+
+import bisect
+import itertools
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+
+from function.calculate_clustering import NUMPY_BLOCK_SIZE, check_cluster_counts, np
+from function.column_cache import get_column_cache
+from function.form_schema import get_form_schemas
+from function.jobs import report_progress
+from function.metrics import timed
+
+# Values accepted for the multi-field clustering "method" parameter
+MULTI_FIELD_METHODS = ['kmeans', 'minibatch']
+
+# Above this many submissions the mini-batch method is used unless one is requested
+MINIBATCH_THRESHOLD = 50000
+
+# Number of points sampled per mini-batch iteration
+DEFAULT_BATCH_SIZE = 1024
+
+# Centroid movement (in standardized units) below which iterations stop
+CONVERGENCE_TOLERANCE = 1e-4
+
+
+@timed()
+def extract_numeric_vectors(form_id: str, field_names: List[str]) -> Tuple[List[Dict], List[List[float]], int]:
+    """
+    Extract one vector of numeric values per submission for several fields
+    
+    Values come from the column cache, with checkbox lists reduced to the mean
+    of their numeric items. Only the submission metadata needed for the
+    results is kept, so memory use is a few values per submission rather than
+    the full records.
+    
+    Args:
+        form_id: ID of the form
+        field_names: Names of the fields that make up each vector
+        
+    Returns:
+        Tuple containing (list of submission summaries with a complete vector,
+                         vectors in field_names order (a 2-D array when NumPy
+                         is available),
+                         count of submissions skipped for a missing or non-numeric value)
+    """
+    rows, columns = get_column_cache().form_columns(form_id, field_names, 'mean')
+    if not columns:
+        return [], [], 0
+    
+    if np is not None:
+        complete = np.logical_and.reduce([np.frombuffer(column.valid, dtype=bool) for column in columns])
+        vectors = np.column_stack([np.frombuffer(column.values)[complete] for column in columns])
+        complete = complete.tolist()
+    else:
+        complete = bytearray(map(min, zip(*(column.valid for column in columns))))
+        vectors = [list(vector) for vector in zip(*(itertools.compress(column.values, complete) for column in columns))]
+    
+    summaries = [
+        {'submission_id': submission_id, 'submitted_by': submitted_by, 'submitted_at': submitted_at}
+        for submission_id, submitted_by, submitted_at in itertools.compress(rows, complete)
+    ]
+    
+    return summaries, vectors, len(rows) - len(summaries)
+
+
+def standardize(vectors: List[List[float]]) -> Tuple[List[List[float]], List[float], List[float]]:
+    """
+    Scale every field to zero mean and unit standard deviation
+    
+    Fields with no spread are only centered.
+    
+    Args:
+        vectors: List of vectors
+        
+    Returns:
+        Tuple containing (standardized vectors, per-field means, per-field scales);
+        the vectors are a 2-D array when NumPy is available
+    """
+    if np is not None:
+        matrix = np.asarray(vectors, dtype=float)
+        means = matrix.mean(axis=0)
+        scales = matrix.std(axis=0)
+        scales[scales == 0] = 1.0
+        return (matrix - means) / scales, means.tolist(), scales.tolist()
+    
+    count = len(vectors)
+    dims = len(vectors[0])
+    means = [sum(vector[d] for vector in vectors) / count for d in range(dims)]
+    scales = []
+    for d in range(dims):
+        variance = sum((vector[d] - means[d]) ** 2 for vector in vectors) / count
+        scales.append(math.sqrt(variance) or 1.0)
+    
+    scaled = [[(vector[d] - means[d]) / scales[d] for d in range(dims)] for vector in vectors]
+    return scaled, means, scales
+
+
+def _take(points, indices: List[int]):
+    if np is not None:
+        return np.asarray(points)[indices]
+    return [points[i] for i in indices]
+
+
+def _nearest_centroids(points, centroids) -> Tuple[List[int], List[float]]:
+    """
+    Find the nearest centroid of every point
+    
+    Args:
+        points: Points as a list of lists, or a 2-D array when NumPy is available
+        centroids: Centroids in the same representation
+        
+    Returns:
+        Tuple containing (nearest centroid indices, squared distances to them);
+        arrays when NumPy is available
+    """
+    if np is not None:
+        points = np.asarray(points, dtype=float)
+        centroids = np.asarray(centroids, dtype=float)
+        assignments = np.empty(len(points), dtype=np.intp)
+        distances = np.empty(len(points))
+        for start in range(0, len(points), NUMPY_BLOCK_SIZE):
+            block = points[start:start + NUMPY_BLOCK_SIZE]
+            squared = ((block[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+            nearest = squared.argmin(axis=1)
+            assignments[start:start + NUMPY_BLOCK_SIZE] = nearest
+            distances[start:start + NUMPY_BLOCK_SIZE] = squared[np.arange(len(block)), nearest]
+        return assignments, distances
+    
+    assignments = []
+    distances = []
+    for point in points:
+        min_distance = float('inf')
+        nearest = 0
+        for i, centroid in enumerate(centroids):
+            distance = sum((p - c) ** 2 for p, c in zip(point, centroid))
+            if distance < min_distance:
+                min_distance = distance
+                nearest = i
+        assignments.append(nearest)
+        distances.append(min_distance)
+    return assignments, distances
+
+
+def _cluster_sums(points, assignments, k: int) -> Tuple[List[List[float]], List[int]]:
+    """
+    Per-cluster sums of the assigned points and cluster sizes
+    
+    Args:
+        points: Points as a list of lists, or a 2-D array when NumPy is available
+        assignments: Cluster index of every point
+        k: Number of clusters
+        
+    Returns:
+        Tuple containing (list of k sum vectors, list of k counts)
+    """
+    if np is not None:
+        points = np.asarray(points, dtype=float)
+        assignments = np.asarray(assignments, dtype=np.intp)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.stack([np.bincount(assignments, weights=points[:, d], minlength=k)
+                         for d in range(points.shape[1])], axis=1)
+        return sums.tolist(), counts.tolist()
+    
+    dims = len(points[0])
+    sums = [[0.0] * dims for _ in range(k)]
+    counts = [0] * k
+    for point, assignment in zip(points, assignments):
+        total = sums[assignment]
+        for d in range(dims):
+            total[d] += point[d]
+        counts[assignment] += 1
+    return sums, counts
+
+
+def kmeans_plus_plus(points: List[List[float]], k: int) -> List[List[float]]:
+    """
+    Choose k initial centroids with k-means++ seeding
+    
+    The first centroid is a random point; each following one is a point drawn
+    with probability proportional to its squared distance to the nearest
+    centroid chosen so far.
+    
+    Args:
+        points: List of points
+        k: Number of centroids
+        
+    Returns:
+        List of k centroids
+    """
+    centroids = [[float(c) for c in points[random.randrange(len(points))]]]
+    _, closest = _nearest_centroids(points, centroids)
+    
+    while len(centroids) < k:
+        if np is not None:
+            cumulative = np.cumsum(closest)
+        else:
+            cumulative = list(itertools.accumulate(closest))
+        if cumulative[-1] <= 0:
+            # Every point already coincides with a centroid
+            index = random.randrange(len(points))
+        else:
+            target = random.random() * cumulative[-1]
+            if np is not None:
+                index = int(np.searchsorted(cumulative, target, side='right'))
+            else:
+                index = bisect.bisect_right(cumulative, target)
+            index = min(index, len(points) - 1)
+        centroids.append([float(c) for c in points[index]])
+        
+        _, distances = _nearest_centroids(points, [centroids[-1]])
+        if np is not None:
+            closest = np.minimum(closest, distances)
+        else:
+            closest = [min(a, b) for a, b in zip(closest, distances)]
+    
+    return centroids
+
+
+def _max_shift(old: List[List[float]], new: List[List[float]]) -> float:
+    return max(math.sqrt(sum((a - b) ** 2 for a, b in zip(o, n))) for o, n in zip(old, new))
+
+
+def kmeans_vectors(points: List[List[float]], k: int, max_iterations: int = 100) -> Tuple[List[int], List[List[float]]]:
+    """
+    K-means (Lloyd's algorithm) on vectors, seeded with k-means++
+    
+    A cluster that loses all its points keeps its previous centroid.
+    
+    Args:
+        points: List of points
+        k: Number of clusters
+        max_iterations: Maximum number of iterations
+        
+    Returns:
+        Tuple containing (list of cluster assignments, list of centroids)
+    """
+    if len(points) == 0 or k <= 0 or k > len(points):
+        return [], []
+    
+    centroids = kmeans_plus_plus(points, k)
+    
+    for _ in range(max_iterations):
+        assignments, _ = _nearest_centroids(points, centroids)
+        sums, counts = _cluster_sums(points, assignments, k)
+        new_centroids = [[s / counts[i] for s in sums[i]] if counts[i] else centroids[i] for i in range(k)]
+        
+        shift = _max_shift(centroids, new_centroids)
+        centroids = new_centroids
+        if shift < CONVERGENCE_TOLERANCE:
+            break
+    
+    assignments, _ = _nearest_centroids(points, centroids)
+    return list(map(int, assignments)), centroids
+
+
+def minibatch_kmeans(points: List[List[float]], k: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                     max_iterations: int = 100) -> Tuple[List[int], List[List[float]]]:
+    """
+    Mini-batch K-means (Sculley, 2010) on vectors
+    
+    Seeding runs on a random sample of 3 * batch_size points and each iteration
+    only looks at batch_size random points, moving every centroid towards the
+    mean of its batch members with a step that shrinks as the centroid absorbs
+    more points. The cost per iteration therefore does not depend on the number
+    of submissions; only the final assignment makes one pass over all points.
+    
+    Args:
+        points: List of points
+        k: Number of clusters
+        batch_size: Number of points sampled per iteration
+        max_iterations: Maximum number of iterations
+        
+    Returns:
+        Tuple containing (list of cluster assignments, list of centroids)
+    """
+    if len(points) == 0 or k <= 0 or k > len(points):
+        return [], []
+    
+    n = len(points)
+    batch_size = max(1, min(batch_size, n))
+    sample_size = max(k, min(n, 3 * batch_size))
+    
+    sample = _take(points, random.sample(range(n), sample_size))
+    centroids = kmeans_plus_plus(sample, k)
+    totals = [0] * k
+    
+    for _ in range(max_iterations):
+        batch = _take(points, random.sample(range(n), batch_size))
+        assignments, _ = _nearest_centroids(batch, centroids)
+        sums, counts = _cluster_sums(batch, assignments, k)
+        
+        new_centroids = []
+        for i in range(k):
+            if counts[i] == 0:
+                new_centroids.append(centroids[i])
+                continue
+            totals[i] += counts[i]
+            rate = 1.0 / totals[i]
+            new_centroids.append([c + rate * (s - counts[i] * c) for c, s in zip(centroids[i], sums[i])])
+        
+        shift = _max_shift(centroids, new_centroids)
+        centroids = new_centroids
+        if shift < CONVERGENCE_TOLERANCE:
+            break
+    
+    assignments, _ = _nearest_centroids(points, centroids)
+    return list(map(int, assignments)), centroids
+
+
+@timed()
+def cluster_submissions_multi(form_id: str, field_names: List[str], num_clusters: int = None,
+                              members_per_cluster: int = None, method: str = None,
+                              batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Cluster form submissions on a vector of several numeric fields
+    
+    Each field is standardized first so that fields with large values do not
+    dominate the distances. Centroids are reported in the original units.
+    
+    Args:
+        form_id: ID of the form
+        field_names: Names of the fields to cluster by
+        num_clusters: Number of clusters to create (if None, will use members_per_cluster)
+        members_per_cluster: Target number of members per cluster (if None, will use num_clusters)
+        method: 'kmeans', 'minibatch', or None to use mini-batch only for large forms
+        batch_size: Number of points sampled per mini-batch iteration
+        
+    Returns:
+        Dictionary containing clustering results
+    """
+    if method is not None and method not in MULTI_FIELD_METHODS:
+        return {
+            'success': False,
+            'message': f"Unknown clustering method '{method}'"
+        }
+    
+    error = check_cluster_counts(num_clusters, members_per_cluster)
+    if error:
+        return {
+            'success': False,
+            'message': error
+        }
+    
+    schema = get_form_schemas().get(form_id)
+    if not schema:
+        return {
+            'success': False,
+            'message': 'Form not found'
+        }
+    
+    if not field_names:
+        return {
+            'success': False,
+            'message': 'No fields selected for clustering'
+        }
+    
+    invalid = [name for name in field_names if not schema.is_numeric(name)]
+    if invalid:
+        return {
+            'success': False,
+            'message': f"Fields are missing or not numeric: {', '.join(invalid)}"
+        }
+    
+    submissions, vectors, skipped_count = extract_numeric_vectors(form_id, field_names)
+    report_progress(0.5)
+    
+    if len(vectors) == 0:
+        return {
+            'success': False,
+            'message': 'No submissions have numeric values for all selected fields',
+            'non_numeric_count': skipped_count
+        }
+    
+    # Determine the number of clusters
+    if num_clusters is None and members_per_cluster is None:
+        num_clusters = 3
+    elif num_clusters is None:
+        num_clusters = max(1, len(vectors) // members_per_cluster)
+    num_clusters = min(num_clusters, len(vectors))
+    
+    if method is None:
+        method = 'minibatch' if len(vectors) > MINIBATCH_THRESHOLD else 'kmeans'
+    
+    scaled, means, scales = standardize(vectors)
+    
+    if method == 'minibatch':
+        assignments, centroids = minibatch_kmeans(scaled, num_clusters, batch_size)
+    else:
+        assignments, centroids = kmeans_vectors(scaled, num_clusters)
+    
+    # Convert the centroids back to the original units
+    centroids = [[float(c) * scales[d] + means[d] for d, c in enumerate(centroid)] for centroid in centroids]
+    
+    # Group submissions by cluster
+    clusters = [[] for _ in range(num_clusters)]
+    for i, assignment in enumerate(assignments):
+        member = dict(submissions[i])
+        member['values'] = dict(zip(field_names, map(float, vectors[i])))
+        clusters[assignment].append(member)
+    
+    # Sort clusters by centroid, comparing fields in the order they were given
+    sorted_clusters = sorted(zip(centroids, clusters), key=lambda pair: pair[0])
+    
+    result_clusters = []
+    for i, (centroid, cluster) in enumerate(sorted_clusters):
+        result_clusters.append({
+            'cluster_id': i + 1,
+            'centroid': dict(zip(field_names, centroid)),
+            'size': len(cluster),
+            'submissions': cluster
+        })
+    
+    return {
+        'success': True,
+        'fields': field_names,
+        'method': method,
+        'num_clusters': num_clusters,
+        'total_submissions': len(vectors),
+        'non_numeric_count': skipped_count,
+        'clusters': result_clusters
+    }
\ No newline at end of file
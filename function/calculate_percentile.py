@@ -0,0 +1,73 @@
+# calculate_percentile.py
+# Module for calculating percentiles and histograms from form submissions
+
+from typing import Dict, List, Optional, Tuple
+
+from function.metrics import timed
+
+# Percentiles returned when none are requested
+DEFAULT_PERCENTILES = [50, 90, 99]
+
+# Number of histogram bins used when none is requested
+DEFAULT_HISTOGRAM_BINS = 10
+
+
+@timed()
+def calculate_percentiles_for_field(form_id: str, field_name: str, percentiles: List[float] = None) -> Tuple[Dict[str, Optional[float]], int, int]:
+    """
+    Calculate percentiles for a specific field in a form's submissions
+    
+    Values come from the field's quantile sketch, which is exact for fields with
+    few distinct values and a t-digest estimate otherwise.
+    
+    Args:
+        form_id: ID of the form
+        field_name: Name of the field to calculate percentiles for
+        percentiles: Percentiles between 0 and 100 (default: 50, 90 and 99)
+        
+    Returns:
+        Tuple containing (dictionary of percentile to value, values are None if
+                         no numeric values were found,
+                         count of numeric values used,
+                         count of non-numeric values skipped)
+    """
+    from function.field_aggregates import get_aggregate_store
+    
+    if percentiles is None:
+        percentiles = DEFAULT_PERCENTILES
+    
+    result = get_aggregate_store().field_quantiles(form_id, field_name, [p / 100 for p in percentiles])
+    
+    # Missing or non-numeric field
+    if result is None:
+        return {f'{p:g}': None for p in percentiles}, 0, 0
+    
+    values, numeric_count, non_numeric_count = result
+    return {f'{p:g}': value for p, value in zip(percentiles, values)}, numeric_count, non_numeric_count
+
+
+@timed()
+def calculate_histogram_for_field(form_id: str, field_name: str, bins: int = DEFAULT_HISTOGRAM_BINS) -> Tuple[List[Dict[str, float]], int, int]:
+    """
+    Calculate an equal-width histogram for a specific field in a form's submissions
+    
+    Args:
+        form_id: ID of the form
+        field_name: Name of the field
+        bins: Number of bins between the smallest and largest value
+        
+    Returns:
+        Tuple containing (list of {'lower', 'upper', 'count'} bins, empty if no
+                         numeric values were found,
+                         count of numeric values used,
+                         count of non-numeric values skipped)
+    """
+    from function.field_aggregates import get_aggregate_store
+    
+    result = get_aggregate_store().field_histogram(form_id, field_name, bins)
+    
+    # Missing or non-numeric field
+    if result is None:
+        return [], 0, 0
+    
+    return result
\ No newline at end of file
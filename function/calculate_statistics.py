@@ -0,0 +1,215 @@
+# calculate_statistics.py
+# Single-pass aggregation of numeric statistics over a form's submissions
+
+import math
+from typing import Any, Dict, List, Optional, Union
+
+from function.form_schema import NUMERIC_FIELD_TYPES, get_form_schemas
+from function.metrics import timed
+from function.quantile_sketch import QuantileSketch
+from function.repository import get_repository
+
+
+class FieldStatistics:
+    """
+    Running statistics for one field, updated one value at a time
+    
+    Mean and variance use Welford's method so they stay accurate over long
+    streams. The variance is the population variance. With track_quantiles the
+    values are also fed to a QuantileSketch for medians, percentiles and
+    histograms.
+    """
+    
+    def __init__(self, track_quantiles: bool = False):
+        self.sketch: Optional[QuantileSketch] = QuantileSketch() if track_quantiles else None
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.non_numeric_count = 0
+    
+    def add(self, value):
+        """
+        Add a raw submitted value; checkbox lists contribute each item
+        
+        Values such as 'inf' and 'nan' that parse to a non-finite float count
+        as non-numeric.
+        
+        Args:
+            value: The submitted value
+        """
+        if isinstance(value, list):
+            for item in value:
+                self.add(item)
+            return
+        
+        try:
+            number = float(value)
+        except (ValueError, TypeError):
+            self.non_numeric_count += 1
+            return
+        if not math.isfinite(number):
+            self.non_numeric_count += 1
+            return
+        
+        self.count += 1
+        self.total += number
+        delta = number - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (number - self.mean)
+        if self.minimum is None or number < self.minimum:
+            self.minimum = number
+        if self.maximum is None or number > self.maximum:
+            self.maximum = number
+        if self.sketch is not None:
+            self.sketch.add(number)
+    
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Export the running state for persistence
+        
+        Returns:
+            JSON-serializable dictionary accepted by from_state()
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': self.minimum,
+            'max': self.maximum,
+            'non_numeric_count': self.non_numeric_count,
+            'sketch': self.sketch.to_state() if self.sketch is not None else None
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'FieldStatistics':
+        """
+        Rebuild statistics exported with to_state()
+        
+        Args:
+            state: The exported dictionary
+            
+        Returns:
+            The restored FieldStatistics
+        """
+        stats = cls()
+        stats.count = state['count']
+        stats.total = state['total']
+        stats.mean = state['mean']
+        stats.m2 = state['m2']
+        stats.minimum = state['min']
+        stats.maximum = state['max']
+        stats.non_numeric_count = state['non_numeric_count']
+        if state.get('sketch') is not None:
+            stats.sketch = QuantileSketch.from_state(state['sketch'])
+        return stats
+    
+    def to_dict(self) -> Dict[str, Union[float, int, None]]:
+        """
+        Export the statistics
+        
+        Returns:
+            Dictionary with count, sum, mean, min, max, variance, stddev and
+            non_numeric_count; value statistics are None when count is 0
+        """
+        if self.count == 0:
+            return {
+                'count': 0,
+                'sum': None,
+                'mean': None,
+                'min': None,
+                'max': None,
+                'variance': None,
+                'stddev': None,
+                'non_numeric_count': self.non_numeric_count
+            }
+        
+        variance = self.m2 / self.count
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.mean,
+            'min': self.minimum,
+            'max': self.maximum,
+            'variance': variance,
+            'stddev': math.sqrt(variance),
+            'non_numeric_count': self.non_numeric_count
+        }
+
+
+@timed()
+def scan_form_statistics(form_id: str, field_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Union[float, int, None]]]:
+    """
+    Calculate statistics for several numeric fields of a form in one pass over
+    its submissions, without using the materialized aggregates
+    
+    Args:
+        form_id: ID of the form
+        field_names: Fields to include (default: every numeric-capable field)
+        
+    Returns:
+        Dictionary with field names as keys and FieldStatistics.to_dict()
+        results as values; fields that are missing or not numeric-capable are
+        left out
+    """
+    schema = get_form_schemas().get(form_id)
+    if not schema:
+        return {}
+    
+    accumulators = {field_name: FieldStatistics() for field_name in schema.numeric_fields
+                    if field_names is None or field_name in field_names}
+    
+    repository = get_repository()
+    if accumulators:
+        for submission in repository.iter_submissions_for_form(form_id):
+            data = submission['data']
+            for field_name, accumulator in accumulators.items():
+                if field_name in data:
+                    accumulator.add(data[field_name])
+    
+    return {field_name: accumulator.to_dict() for field_name, accumulator in accumulators.items()}
+
+
+@timed()
+def calculate_form_statistics(form_id: str, field_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Union[float, int, None]]]:
+    """
+    Get statistics for the numeric fields of a form
+    
+    Served from the incrementally maintained aggregate store, so the cost does
+    not depend on the number of submissions.
+    
+    Args:
+        form_id: ID of the form
+        field_names: Fields to include (default: every numeric-capable field)
+        
+    Returns:
+        Dictionary with field names as keys and FieldStatistics.to_dict()
+        results as values; fields that are missing or not numeric-capable are
+        left out
+    """
+    from function.field_aggregates import get_aggregate_store
+    
+    statistics = get_aggregate_store().form_statistics(form_id)
+    if statistics is None:
+        return {}
+    if field_names is None:
+        return statistics
+    return {field_name: stats for field_name, stats in statistics.items() if field_name in field_names}
+
+
+def calculate_field_statistics(form_id: str, field_name: str) -> Optional[Dict[str, Union[float, int, None]]]:
+    """
+    Calculate statistics for a single field
+    
+    Args:
+        form_id: ID of the form
+        field_name: Name of the field
+        
+    Returns:
+        FieldStatistics.to_dict() result, or None if the field is missing or
+        not numeric-capable
+    """
+    return calculate_form_statistics(form_id, [field_name]).get(field_name)
\ No newline at end of file
@@ -0,0 +1,302 @@
+# column_cache.py
+# Per-form columnar cache of numeric field values, kept up to date as submissions arrive
+
+import math
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from function.config import COLUMN_CACHE_FORMS
+from function.data_stamp import get_data_stamp
+from function.form_schema import get_form_schemas
+from function.repository import get_repository
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def to_number(value) -> Optional[float]:
+    """
+    Convert a single submitted value to a number
+    
+    Args:
+        value: The value to convert
+        
+    Returns:
+        The number, or None if the value is not numeric or not finite
+        ('inf', 'nan')
+    """
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _first_number(items: List) -> Optional[float]:
+    for item in items:
+        number = to_number(item)
+        if number is not None:
+            return number
+    return None
+
+
+def _mean_number(items: List) -> Optional[float]:
+    numbers = [number for number in map(to_number, items) if number is not None]
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+# How a checkbox list is reduced to one number per submission
+REDUCTIONS: Dict[str, Callable[[List], Optional[float]]] = {
+    'first': _first_number,
+    'mean': _mean_number,
+}
+
+
+class FieldColumn:
+    """
+    One field's values for every row of a form, converted once
+    
+    values holds one float per row (NaN where the row has no numeric value)
+    and valid is a byte mask with 1 for rows that have one. non_numeric_count
+    counts rows where the field was submitted but is not numeric; rows that
+    lack the field are neither valid nor counted.
+    """
+    
+    def __init__(self, field_type: Optional[str], reduction: str, rows: int = 0):
+        self.field_type = field_type
+        self.reduction = reduction
+        self.values = array('d', [math.nan]) * rows
+        self.valid = bytearray(rows)
+        self.non_numeric_count = 0
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def _convert(self, data: Dict, field_name: str) -> Optional[float]:
+        if field_name not in data:
+            return None
+        value = data[field_name]
+        number = REDUCTIONS[self.reduction](value) if isinstance(value, list) else to_number(value)
+        if number is None:
+            self.non_numeric_count += 1
+        return number
+    
+    def append(self, data: Dict, field_name: str):
+        """
+        Add a row for a submission's data
+        
+        Args:
+            data: The submission's data
+            field_name: Name of the field this column holds
+        """
+        number = self._convert(data, field_name)
+        self.values.append(math.nan if number is None else number)
+        self.valid.append(number is not None)
+    
+    def set(self, row: int, data: Dict, field_name: str):
+        """
+        Fill in an existing row from a submission's data
+        
+        Args:
+            row: Row index
+            data: The submission's data
+            field_name: Name of the field this column holds
+        """
+        number = self._convert(data, field_name)
+        if number is not None:
+            self.values[row] = number
+            self.valid[row] = 1
+    
+    def copy(self) -> 'FieldColumn':
+        """
+        Copy the column so it can be read without holding the cache lock
+        
+        Returns:
+            A new FieldColumn with the same contents
+        """
+        column = FieldColumn(self.field_type, self.reduction)
+        column.values = array('d', self.values)
+        column.valid = bytearray(self.valid)
+        column.non_numeric_count = self.non_numeric_count
+        return column
+
+
+class FormColumns:
+    """
+    Row map and field columns for one form
+    
+    rows holds (id, submitted_by, submitted_at) for every submission in
+    submission order and row_of maps a submission id to its row, so a
+    submission seen both in a full read and in the change feed is only added
+    once. Columns are built on first use for each (field, reduction).
+    """
+    
+    def __init__(self):
+        self.rows: List[Tuple[str, str, str]] = []
+        self.row_of: Dict[str, int] = {}
+        self.columns: Dict[Tuple[str, str], FieldColumn] = {}
+    
+    def append(self, submission: Dict):
+        """
+        Add a submission as a new row of every column
+        
+        Args:
+            submission: The submission record
+        """
+        if submission['id'] in self.row_of:
+            return
+        self.row_of[submission['id']] = len(self.rows)
+        self.rows.append((submission['id'], submission['submitted_by'], submission['submitted_at']))
+        data = submission['data']
+        for (field_name, _), column in self.columns.items():
+            column.append(data, field_name)
+    
+    def add_column(self, form_id: str, field_name: str, field_type: Optional[str], reduction: str) -> FieldColumn:
+        """
+        Build a column by reading the form's submissions once
+        
+        Submissions that are not in the row map yet are added as new rows.
+        
+        Args:
+            form_id: ID of the form
+            field_name: Name of the field
+            field_type: The field's current type
+            reduction: Key of REDUCTIONS used for checkbox lists
+            
+        Returns:
+            The new column
+        """
+        column = FieldColumn(field_type, reduction, len(self.rows))
+        self.columns[(field_name, reduction)] = column
+        for submission in get_repository().submissions_for_form(form_id):
+            row = self.row_of.get(submission['id'])
+            if row is None:
+                self.append(submission)
+            else:
+                column.set(row, submission['data'], field_name)
+        return column
+
+
+class ColumnCache:
+    """
+    Columnar copies of the numeric fields of recently used forms
+    
+    Each value is parsed and converted to a float once, when its submission is
+    first seen, instead of on every analytics request. The cache follows the
+    repository's submission change feed, so new submissions (including those
+    written by other worker processes) are appended to the cached forms; the
+    feed is only read when the shared submissions data stamp has moved. A
+    column is rebuilt when its field's type has changed, and a form's columns
+    are dropped when the form is edited. At most max_forms forms are kept,
+    least recently used first out.
+    """
+    
+    def __init__(self, max_forms: int = COLUMN_CACHE_FORMS):
+        self.max_forms = max_forms
+        self._lock = threading.RLock()
+        self._token = None
+        self._stamp = None
+        self._forms: 'OrderedDict[str, FormColumns]' = OrderedDict()
+    
+    def _refresh(self):
+        stamp = get_data_stamp().token('submissions')
+        if stamp is not None and stamp == self._stamp:
+            return
+        if self._token is None:
+            # Nothing is cached yet, so only later submissions matter; forms
+            # read their existing ones when first used
+            self._token = get_repository().submission_feed_token()
+            self._stamp = stamp
+            return
+        token, submissions, reset = get_repository().submission_changes(self._token)
+        if reset:
+            self._forms.clear()
+        self._token = token
+        self._stamp = stamp
+        for submission in submissions:
+            form_columns = self._forms.get(submission['form_id'])
+            if form_columns is not None:
+                form_columns.append(submission)
+    
+    def invalidate_form(self, form_id: str):
+        """
+        Drop a form's columns, for example after it was edited
+        
+        Args:
+            form_id: ID of the form
+        """
+        with self._lock:
+            self._forms.pop(form_id, None)
+    
+    def clear(self):
+        """
+        Drop every cached form
+        """
+        with self._lock:
+            self._forms.clear()
+    
+    def form_columns(self, form_id: str, field_names: List[str],
+                     reduction: str = 'first') -> Tuple[List[Tuple[str, str, str]], List[FieldColumn]]:
+        """
+        Get a form's rows and the columns of some of its fields
+        
+        The returned lists are copies, so they can be used while submissions
+        keep arriving.
+        
+        Args:
+            form_id: ID of the form
+            field_names: Names of the fields to get columns for
+            reduction: How checkbox lists become one number ('first' numeric
+                item or 'mean' of the numeric items)
+                
+        Returns:
+            Tuple containing (list of (id, submitted_by, submitted_at) rows in
+                             submission order,
+                             one FieldColumn per field name, aligned with the rows);
+            both are empty if the form does not exist
+        """
+        schema = get_form_schemas().get(form_id)
+        if not schema:
+            return [], []
+        field_types = schema.field_types
+        
+        with self._lock:
+            self._refresh()
+            form_columns = self._forms.get(form_id)
+            if form_columns is None:
+                # Build all the requested columns in a single read
+                form_columns = self._forms[form_id] = FormColumns()
+                for field_name in field_names:
+                    form_columns.columns[(field_name, reduction)] = FieldColumn(field_types.get(field_name), reduction)
+                for submission in get_repository().submissions_for_form(form_id):
+                    form_columns.append(submission)
+            self._forms.move_to_end(form_id)
+            while len(self._forms) > max(self.max_forms, 1):
+                self._forms.popitem(last=False)
+            
+            columns = []
+            for field_name in field_names:
+                field_type = field_types.get(field_name)
+                column = form_columns.columns.get((field_name, reduction))
+                if column is None or column.field_type != field_type:
+                    column = form_columns.add_column(form_id, field_name, field_type, reduction)
+                columns.append(column)
+            
+            return list(form_columns.rows), [column.copy() for column in columns]
+
+
+def get_column_cache() -> ColumnCache:
+    """
+    Get the process-wide column cache
+    
+    Returns:
+        The shared ColumnCache
+    """
+    global _cache
+    
+    with _cache_lock:
+        if _cache is None:
+            _cache = ColumnCache()
+        return _cache
\ No newline at end of file
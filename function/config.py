@@ -0,0 +1,80 @@
+# config.py
+# Shared settings for the data layer, read from environment variables
+
+import os
+
+# Directory holding the data files
+DATA_DIR = os.environ.get('MATCHIT_DATA_DIR', 'data')
+
+# Data file paths
+USERS_FILE = os.path.join(DATA_DIR, 'users.json')
+FORMS_FILE = os.path.join(DATA_DIR, 'forms.json')
+SUBMISSIONS_FILE = os.path.join(DATA_DIR, 'submissions.json')
+SUBMISSIONS_LOG = os.path.join(DATA_DIR, 'submissions.jsonl')
+
+# fsync policy for submission log appends: 'always' syncs every record, 'interval'
+# syncs at most once per FSYNC_INTERVAL seconds, 'never' leaves flushing to the OS
+FSYNC_POLICIES = ('always', 'interval', 'never')
+FSYNC_POLICY = os.environ.get('MATCHIT_LOG_FSYNC', 'interval')
+FSYNC_INTERVAL = float(os.environ.get('MATCHIT_LOG_FSYNC_INTERVAL', '1.0'))
+
+# Extra time (seconds) a group commit leader waits to collect concurrent appends;
+# 0 still batches everything that queued up while the previous write was running
+GROUP_COMMIT_WINDOW = float(os.environ.get('MATCHIT_GROUP_COMMIT_WINDOW', '0'))
+
+# Storage backend: 'json' (flat files in DATA_DIR) or 'sqlite'
+STORAGE_BACKEND = os.environ.get('MATCHIT_STORAGE', 'json')
+SQLITE_PATH = os.environ.get('MATCHIT_SQLITE_PATH', os.path.join(DATA_DIR, 'matchit.db'))
+
+# Persisted per-field aggregates and quantile sketches, and the minimum number of
+# seconds between saves while submissions are arriving
+AGGREGATES_FILE = os.path.join(DATA_DIR, 'aggregates.json')
+AGGREGATES_SAVE_INTERVAL = float(os.environ.get('MATCHIT_AGGREGATES_SAVE_INTERVAL', '5'))
+
+# Number of clustering results kept in each worker's LRU result cache (0 disables it)
+CLUSTER_CACHE_SIZE = int(os.environ.get('MATCHIT_CLUSTER_CACHE_SIZE', '32'))
+
+# Number of forms whose numeric columns are kept in each worker's column cache
+COLUMN_CACHE_FORMS = int(os.environ.get('MATCHIT_COLUMN_CACHE_FORMS', '16'))
+
+# Background jobs: worker processes, queued-or-running jobs accepted at once, and
+# how long (seconds) a finished job's result is kept
+JOB_WORKERS = int(os.environ.get('MATCHIT_JOB_WORKERS', '2'))
+JOB_MAX_ACTIVE = int(os.environ.get('MATCHIT_JOB_MAX_ACTIVE', '8'))
+JOB_RESULT_TTL = float(os.environ.get('MATCHIT_JOB_RESULT_TTL', '600'))
+# Database holding the state of every worker's jobs, so any worker can report on them
+JOBS_DB = os.environ.get('MATCHIT_JOBS_DB', os.path.join(DATA_DIR, 'jobs.db'))
+
+# Requests slower than this many seconds are logged with a time breakdown (0 disables it)
+SLOW_REQUEST_SECONDS = float(os.environ.get('MATCHIT_SLOW_REQUEST_SECONDS', '1.0'))
+
+# Bearer token that lets a scraper read /admin/metrics without an admin session
+# (unset: admin session only)
+METRICS_TOKEN = os.environ.get('MATCHIT_METRICS_TOKEN')
+
+# Bearer token accepted by the bulk submission import API besides an admin session
+# (unset: admin session only), and the most records one import may carry
+INGEST_TOKEN = os.environ.get('MATCHIT_INGEST_TOKEN')
+BULK_MAX_RECORDS = int(os.environ.get('MATCHIT_BULK_MAX_RECORDS', '100000'))
+
+# ASGI mode (asgi.py): threads running storage calls for the native async API
+# handlers, and threads running the Flask app for every other route
+ASGI_STORAGE_THREADS = int(os.environ.get('MATCHIT_ASGI_STORAGE_THREADS', '4'))
+ASGI_WSGI_THREADS = int(os.environ.get('MATCHIT_ASGI_WSGI_THREADS', '8'))
+
+# Shared write counters (see data_stamp.py) that let each worker skip storage checks
+# while nothing was written, and the longest time (seconds) a cache trusts them
+# before checking storage anyway, to notice writes made outside the application
+# (0 checks storage on every access)
+DATA_STAMP_FILE = os.environ.get('MATCHIT_DATA_STAMP_FILE', os.path.join(DATA_DIR, 'data.stamp'))
+DATA_RECHECK_SECONDS = float(os.environ.get('MATCHIT_DATA_RECHECK_SECONDS', '1.0'))
+
+# Production server (gunicorn.conf.py): listen address, worker processes and
+# threads per worker
+SERVER_BIND = os.environ.get('MATCHIT_BIND', '127.0.0.1:8000')
+SERVER_WORKERS = int(os.environ.get('MATCHIT_WORKERS', str((os.cpu_count() or 1) * 2 + 1)))
+SERVER_THREADS = int(os.environ.get('MATCHIT_THREADS', '4'))
+
+# Write the JSON data files (users, forms, aggregates) indented for reading
+# instead of compact
+JSON_PRETTY = os.environ.get('MATCHIT_JSON_PRETTY', '').lower() in ('1', 'true', 'yes')
\ No newline at end of file
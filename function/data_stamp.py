@@ -0,0 +1,116 @@
+# data_stamp.py
+# Write counters shared by every worker process, used to tell cheaply whether cached data may be stale
+
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+from function.config import DATA_RECHECK_SECONDS, DATA_STAMP_FILE
+from function.file_lock import file_lock
+
+# One unsigned 64-bit counter per collection, in this order
+COLLECTIONS = ('users', 'forms', 'submissions')
+_COUNTER = struct.Struct('<Q')
+
+_stamp = None
+_stamp_lock = threading.Lock()
+
+
+class DataStamp:
+    """
+    Per-collection write counters in a small memory-mapped file
+    
+    Every write through the storage backends bumps the counter of the
+    collection it changed. The file is mapped shared, so reading a counter is a
+    memory access that sees the bumps made by every worker process; caches
+    compare token() with the value they saw when they last checked storage and
+    skip the check while it is unchanged.
+    
+    Writes that bypass the application (editing the data files by hand,
+    restoring a backup) do not bump a counter, so token() also changes every
+    recheck_seconds and caches go back to storage at least that often.
+    """
+    
+    def __init__(self, path: str = DATA_STAMP_FILE, recheck_seconds: float = DATA_RECHECK_SECONDS):
+        self.path = path
+        self.recheck_seconds = recheck_seconds
+        self._map: Optional[mmap.mmap] = None
+        self._failed = False
+        self._lock = threading.Lock()
+    
+    def _mapping(self) -> Optional[mmap.mmap]:
+        if self._map is not None:
+            return self._map
+        with self._lock:
+            if self._map is None:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    with file_lock(self.path):
+                        with open(self.path, 'a+b') as f:
+                            size = _COUNTER.size * len(COLLECTIONS)
+                            if os.fstat(f.fileno()).st_size < size:
+                                f.truncate(size)
+                            self._map = mmap.mmap(f.fileno(), size)
+                except (OSError, ValueError) as e:
+                    if not self._failed:
+                        print(f"Error opening data stamp file {self.path}: {e}")
+                        self._failed = True
+                    return None
+            return self._map
+    
+    def token(self, collection: str) -> Optional[Tuple[int, int]]:
+        """
+        Get a value that changes whenever a collection may have changed
+        
+        Args:
+            collection: 'users', 'forms' or 'submissions'
+            
+        Returns:
+            Tuple of (write counter, recheck period number), or None if the
+            stamp is disabled or unavailable and storage must always be checked
+        """
+        if self.recheck_seconds <= 0:
+            return None
+        mapping = self._mapping()
+        if mapping is None:
+            return None
+        counter = _COUNTER.unpack_from(mapping, COLLECTIONS.index(collection) * _COUNTER.size)[0]
+        return counter, int(time.monotonic() / self.recheck_seconds)
+    
+    def bump(self, *collections: str):
+        """
+        Record that collections were written
+        
+        Must be called after the write is visible to other processes.
+        
+        Args:
+            *collections: Names of the changed collections
+        """
+        mapping = self._mapping()
+        if mapping is None:
+            return
+        try:
+            with file_lock(self.path):
+                for collection in collections:
+                    offset = COLLECTIONS.index(collection) * _COUNTER.size
+                    _COUNTER.pack_into(mapping, offset, (_COUNTER.unpack_from(mapping, offset)[0] + 1) % 2 ** 64)
+        except OSError as e:
+            print(f"Error updating data stamp file {self.path}: {e}")
+
+
+def get_data_stamp() -> DataStamp:
+    """
+    Get the process-wide data stamp
+    
+    Returns:
+        The shared DataStamp
+    """
+    global _stamp
+    
+    with _stamp_lock:
+        if _stamp is None:
+            _stamp = DataStamp()
+        return _stamp
\ No newline at end of file
@@ -0,0 +1,587 @@
+# data_store.py
+# Shared data access for users, forms and submissions with an in-process cache
+
+import bisect
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from function import json_codec
+from function.config import FORMS_FILE, JSON_PRETTY, SUBMISSIONS_FILE, SUBMISSIONS_LOG, USERS_FILE
+from function.data_stamp import get_data_stamp
+from function.file_lock import atomic_write, file_lock
+from function.metrics import (DATA_PARSE_SECONDS, DATA_READ_BYTES, DATA_WRITE_SECONDS, DATA_WRITTEN_BYTES,
+                              timer)
+from function.submission_log import append_submissions as _append_to_log
+
+# Parsed JSON files keyed by path: path -> ((inode, mtime_ns, size), data, data stamp token)
+_cache: Dict[str, Tuple[Tuple[int, int, int], Any, Optional[Tuple[int, int]]]] = {}
+_lock = threading.RLock()
+
+# Data stamp collection of each data file
+_COLLECTIONS = {USERS_FILE: 'users', FORMS_FILE: 'forms',
+                SUBMISSIONS_FILE: 'submissions', SUBMISSIONS_LOG: 'submissions'}
+
+
+class _LogState:
+    """
+    Incremental view of the submission log
+    
+    The log only ever grows, so instead of re-parsing it on every read we remember
+    how many bytes have been consumed and parse only what was appended since.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.inode = None
+        self.offset = 0
+        self.records: List[Dict] = []
+
+
+_log_state = _LogState()
+
+
+def order_key(submission: Dict) -> Tuple[str, str]:
+    """
+    Key that orders submissions for keyset pagination
+    
+    Args:
+        submission: A submission record
+        
+    Returns:
+        Tuple of (submitted_at, id)
+    """
+    return submission.get('submitted_at', ''), submission.get('id', '')
+
+
+class _SubmissionIndex:
+    """
+    Hash indexes over the loaded submissions
+    
+    Kept in step with the combined submissions list: rebuilt when that list is
+    rebuilt and extended with each batch of newly read records. Per-form views
+    sorted by order_key() are built on first use and extended while records keep
+    arriving in order.
+    """
+    
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        self.by_form: Dict[str, List[Dict]] = {}
+        self.by_user: Dict[str, List[Dict]] = {}
+        self.by_id: Dict[str, Dict] = {}
+        self.sorted_by_form: Dict[str, Tuple[List[Tuple[str, str]], List[Dict]]] = {}
+    
+    def add(self, records: List[Dict]):
+        for record in records:
+            form_id = record.get('form_id')
+            self.by_form.setdefault(form_id, []).append(record)
+            self.by_user.setdefault(record.get('submitted_by'), []).append(record)
+            self.by_id.setdefault(record.get('id'), record)
+            
+            view = self.sorted_by_form.get(form_id)
+            if view is not None:
+                key = order_key(record)
+                if not view[0] or key >= view[0][-1]:
+                    view[0].append(key)
+                    view[1].append(record)
+                else:
+                    # Out-of-order record, re-sort on next use
+                    del self.sorted_by_form[form_id]
+    
+    def sorted_for_form(self, form_id: str) -> Tuple[List[Tuple[str, str]], List[Dict]]:
+        view = self.sorted_by_form.get(form_id)
+        if view is None:
+            records = sorted(self.by_form.get(form_id, []), key=order_key)
+            view = ([order_key(r) for r in records], records)
+            self.sorted_by_form[form_id] = view
+        return view
+    
+    def rebuild(self, records: List[Dict]):
+        self.clear()
+        self.add(records)
+
+
+_index = _SubmissionIndex()
+
+# Combined legacy + log view handed to readers, rebuilt when the legacy file changes;
+# the key identifies the underlying files, the generation counts rebuilds
+_submissions: List[Dict] = []
+_submissions_key: Optional[Tuple] = None
+_generation = 0
+# Data stamp token seen when the files were last checked
+_submissions_stamp: Optional[Tuple[int, int]] = None
+
+
+def _stat_key(file_path: str) -> Tuple[int, int, int]:
+    # Writes replace the file, so the inode tells apart two same-sized
+    # versions written within one mtime tick
+    st = os.stat(file_path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _stamp_token(file_path: str) -> Optional[Tuple[int, int]]:
+    collection = _COLLECTIONS.get(file_path)
+    return get_data_stamp().token(collection) if collection else None
+
+
+def _bump_stamp(file_path: str):
+    collection = _COLLECTIONS.get(file_path)
+    if collection:
+        get_data_stamp().bump(collection)
+
+
+def load_data(file_path: str, default: Any = None) -> Any:
+    """
+    Load data from a JSON file, re-parsing it only when it has changed
+    
+    The file is not even stat'ed while its data stamp counter is unchanged.
+    The returned object is shared between callers and must be treated as
+    read-only; use load_data_for_update() when the data will be modified.
+    
+    Args:
+        file_path: Path to the JSON file
+        default: Value returned when the file cannot be read
+        
+    Returns:
+        The parsed JSON data, or default on error
+    """
+    return _load_data(file_path, default, use_stamp=True)
+
+
+def _load_data(file_path: str, default: Any, use_stamp: bool) -> Any:
+    # Read before the file, so a write landing in between is seen next time
+    stamp = _stamp_token(file_path)
+    if use_stamp:
+        with _lock:
+            entry = _cache.get(file_path)
+            if entry is not None and stamp is not None and entry[2] == stamp:
+                return entry[1]
+    
+    try:
+        key = _stat_key(file_path)
+    except OSError as e:
+        print(f"Error loading data from {file_path}: {e}")
+        return default
+    
+    with _lock:
+        entry = _cache.get(file_path)
+        if entry is not None and entry[0] == key:
+            _cache[file_path] = (key, entry[1], stamp)
+            return entry[1]
+    
+    name = os.path.basename(file_path)
+    try:
+        with timer(DATA_PARSE_SECONDS, f'parse {name}', file=name):
+            data = json_codec.load_file(file_path)
+    except Exception as e:
+        print(f"Error loading data from {file_path}: {e}")
+        return default
+    DATA_READ_BYTES.inc(key[2], file=name)
+    
+    with _lock:
+        _cache[file_path] = (key, data, stamp)
+    return data
+
+
+def load_data_for_update(file_path: str, default: Any = None) -> Any:
+    """
+    Load a private copy of a JSON file that the caller may modify and save
+    
+    Args:
+        file_path: Path to the JSON file
+        default: Value returned when the file cannot be read
+        
+    Returns:
+        A deep copy of the parsed JSON data, or default on error
+    """
+    return _copy_for_update(load_data(file_path), default)
+
+
+def _copy_for_update(data: Any, default: Any) -> Any:
+    if data is None:
+        return default
+    return copy.deepcopy(data)
+
+
+def _write_json(file_path: str, data: Any):
+    # Serialize and atomically replace the file, recording size and time
+    name = os.path.basename(file_path)
+    with timer(DATA_WRITE_SECONDS, f'write {name}', file=name):
+        encoded = json_codec.dumpb(data, pretty=JSON_PRETTY)
+        atomic_write(file_path, encoded)
+    DATA_WRITTEN_BYTES.inc(len(encoded), file=name)
+
+
+def _store_written(file_path: str, data: Any):
+    # Called while still holding the file lock, so the next writer to take it
+    # sees both the new data stamp counter and this version in the cache
+    key = _stat_key(file_path)
+    _bump_stamp(file_path)
+    with _lock:
+        _cache[file_path] = (key, data, None)
+
+
+def save_data(file_path: str, data: Any) -> bool:
+    """
+    Atomically save data to a JSON file and refresh the cached copy
+    
+    The file is replaced via a temporary file and rename while holding the
+    file's inter-process lock, so concurrent workers never see a truncated file.
+    
+    Args:
+        file_path: Path to the JSON file
+        data: The data to write
+        
+    Returns:
+        True if the data was written, False otherwise
+    """
+    try:
+        with file_lock(file_path):
+            _write_json(file_path, data)
+            _store_written(file_path, data)
+    except Exception as e:
+        print(f"Error saving data to {file_path}: {e}")
+        invalidate(file_path)
+        return False
+    return True
+
+
+def update_data(file_path: str, update: Callable[[Any], bool], default: Any = None) -> bool:
+    """
+    Read-modify-write a JSON file under its inter-process lock
+    
+    The file is re-read (if it changed) after the lock is taken, so updates made
+    by other workers in the meantime are not lost.
+    
+    Args:
+        file_path: Path to the JSON file
+        update: Function that modifies the data in place and returns True if it
+                should be saved
+        default: Starting value when the file cannot be read
+        
+    Returns:
+        True if the data was changed and saved, False otherwise
+    """
+    try:
+        with file_lock(file_path):
+            # Another worker's write may not have reached our data stamp
+            # token yet, so the file itself is checked
+            data = _copy_for_update(_load_data(file_path, None, use_stamp=False), default)
+            if not update(data):
+                return False
+            _write_json(file_path, data)
+            _store_written(file_path, data)
+    except Exception as e:
+        print(f"Error saving data to {file_path}: {e}")
+        invalidate(file_path)
+        return False
+    return True
+
+
+def invalidate(file_path: Optional[str] = None):
+    """
+    Drop cached data so the next read goes back to disk
+    
+    Args:
+        file_path: Path to forget, or None to clear everything
+    """
+    global _submissions_key, _submissions_stamp
+    
+    with _lock:
+        if file_path is None:
+            _cache.clear()
+        else:
+            _cache.pop(file_path, None)
+        if file_path in (None, SUBMISSIONS_LOG):
+            _log_state.reset()
+        _submissions_key = None
+        _submissions_stamp = None
+
+
+def _read_log_updates(log_path: str) -> Tuple[Optional[int], int, bool]:
+    """
+    Parse records appended to the log since the last call
+    
+    Only complete lines are consumed; a partially written final line is left for
+    the next read. Must be called with _lock held.
+    
+    Args:
+        log_path: Path to the JSON Lines log
+        
+    Returns:
+        Tuple containing (inode of the log or None if missing,
+                         current size of the log,
+                         True if the log was truncated or replaced)
+    """
+    try:
+        st = os.stat(log_path)
+    except FileNotFoundError:
+        replaced = _log_state.offset > 0
+        _log_state.reset()
+        return None, 0, replaced
+    
+    replaced = False
+    if _log_state.inode != st.st_ino or st.st_size < _log_state.offset:
+        replaced = _log_state.inode is not None
+        _log_state.reset()
+        _log_state.inode = st.st_ino
+    
+    if st.st_size > _log_state.offset:
+        name = os.path.basename(log_path)
+        with timer(DATA_PARSE_SECONDS, f'parse {name}', file=name):
+            with open(log_path, 'rb') as f:
+                f.seek(_log_state.offset)
+                chunk = f.read(st.st_size - _log_state.offset)
+            end = chunk.rfind(b'\n') + 1
+            try:
+                _log_state.records.extend(json_codec.loads_lines(chunk[:end]))
+            except ValueError:
+                # Some line is damaged: parse line by line to skip just that one
+                for line in chunk[:end].splitlines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        _log_state.records.append(json_codec.loads(line))
+                    except ValueError as e:
+                        print(f"Skipping malformed line in {log_path}: {e}")
+        DATA_READ_BYTES.inc(end, file=name)
+        _log_state.offset += end
+    
+    return st.st_ino, st.st_size, replaced
+
+
+def load_submissions() -> List[Dict]:
+    """
+    Load all submissions (legacy submissions.json followed by the log)
+    
+    The legacy file is parsed only when it changes and the log is read
+    incrementally; neither is looked at while the submissions data stamp
+    counter is unchanged. The returned list is shared and must be treated as
+    read-only.
+    
+    Returns:
+        List of submission records
+    """
+    global _submissions, _submissions_key, _generation, _submissions_stamp
+    
+    stamp = get_data_stamp().token('submissions')
+    with _lock:
+        if stamp is not None and stamp == _submissions_stamp and _submissions_key is not None:
+            return _submissions
+        
+        legacy = load_data(SUBMISSIONS_FILE, default=[]) if os.path.exists(SUBMISSIONS_FILE) else []
+        legacy_key = _cache.get(SUBMISSIONS_FILE, (None,))[0] if legacy else None
+        
+        known = len(_log_state.records)
+        inode, _, replaced = _read_log_updates(SUBMISSIONS_LOG)
+        
+        key = (legacy_key, inode)
+        if replaced or key != _submissions_key:
+            _submissions = list(legacy) + _log_state.records
+            _submissions_key = key
+            _generation += 1
+            _index.rebuild(_submissions)
+        else:
+            new_records = _log_state.records[known:]
+            _submissions.extend(new_records)
+            _index.add(new_records)
+        _submissions_stamp = stamp
+        
+        return _submissions
+
+
+def append_submission(submission: Dict) -> bool:
+    """
+    Append a submission to the log and bring the cached view and indexes up to date
+    
+    Args:
+        submission: The submission record to append
+        
+    Returns:
+        True if the record was written, False otherwise
+    """
+    return append_submissions([submission])
+
+
+def append_submissions(submissions: List[Dict]) -> bool:
+    """
+    Append several submissions to the log in one write and update the indexes
+    
+    Args:
+        submissions: The submission records to append
+        
+    Returns:
+        True if the records were written, False otherwise
+    """
+    if not _append_to_log(submissions):
+        return False
+    get_data_stamp().bump('submissions')
+    load_submissions()
+    return True
+
+
+def get_submissions_for_form(form_id: str) -> List[Dict]:
+    """
+    Get all submissions for a form using the form_id index
+    
+    Args:
+        form_id: ID of the form
+        
+    Returns:
+        List of submissions in submission order (shared, treat as read-only)
+    """
+    with _lock:
+        load_submissions()
+        return _index.by_form.get(form_id, [])
+
+
+def get_submissions_for_user(username: str) -> List[Dict]:
+    """
+    Get all submissions made by a user using the submitted_by index
+    
+    Args:
+        username: Name of the submitting user
+        
+    Returns:
+        List of submissions in submission order (shared, treat as read-only)
+    """
+    with _lock:
+        load_submissions()
+        return _index.by_user.get(username, [])
+
+
+def get_submission(submission_id: str) -> Optional[Dict]:
+    """
+    Look up a single submission by id
+    
+    Args:
+        submission_id: ID of the submission
+        
+    Returns:
+        The submission, or None if it does not exist
+    """
+    with _lock:
+        load_submissions()
+        return _index.by_id.get(submission_id)
+
+
+def form_data_version(form_id: str) -> Tuple[int, int]:
+    """
+    Get a value that changes whenever a submission is added to a form
+    
+    Args:
+        form_id: ID of the form
+        
+    Returns:
+        Tuple of (view generation, number of submissions for the form)
+    """
+    with _lock:
+        load_submissions()
+        return _generation, len(_index.by_form.get(form_id, []))
+
+
+def iter_submissions_for_form(form_id: str, after: Optional[Tuple[str, str]] = None,
+                              submitted_by: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Iterate over a form's submissions in (submitted_at, id) order
+    
+    Args:
+        form_id: ID of the form
+        after: Only yield submissions whose order_key() is greater than this
+        submitted_by: Only yield submissions made by this user
+        
+    Returns:
+        Iterator over the matching submissions
+    """
+    with _lock:
+        load_submissions()
+        if submitted_by is None:
+            keys, records = _index.sorted_for_form(form_id)
+        else:
+            records = sorted((s for s in _index.by_user.get(submitted_by, []) if s.get('form_id') == form_id),
+                             key=order_key)
+            keys = [order_key(r) for r in records]
+        start = bisect.bisect_right(keys, tuple(after)) if after else 0
+        end = len(records)
+    
+    return (records[i] for i in range(start, end))
+
+
+def submission_changes(token: Optional[Tuple]) -> Tuple[Tuple, List[Dict], bool]:
+    """
+    Get the submissions added since a previous call
+    
+    The token is (file key, record count), where the file key identifies the
+    legacy file version and the log inode. It does not depend on this process,
+    so it stays valid across restarts and can be persisted.
+    
+    Args:
+        token: Token returned by the previous call, or None to start from scratch
+        
+    Returns:
+        Tuple containing (token for the next call,
+                         list of new submissions,
+                         True if the caller must discard what it has seen before
+                         and the list holds every submission)
+    """
+    with _lock:
+        submissions = load_submissions()
+        new_token = (_submissions_key, len(submissions))
+        if token is None or token[0] != _submissions_key or token[1] > len(submissions):
+            return new_token, list(submissions), True
+        return new_token, submissions[token[1]:], False
+
+
+def submission_feed_token() -> Tuple:
+    """
+    Get the submission_changes() token for the submissions stored now
+    
+    Returns:
+        Token that makes the next submission_changes() call return only
+        submissions added after this one
+    """
+    with _lock:
+        submissions = load_submissions()
+        return _submissions_key, len(submissions)
+
+
+def data_version(collection: str) -> Tuple[Tuple, float]:
+    """
+    Get a value that changes whenever forms or submissions are written
+    
+    Only the files are stat'ed, nothing is read, so this also notices writes
+    made by other worker processes without loading them.
+    
+    Args:
+        collection: 'forms' or 'submissions'
+        
+    Returns:
+        Tuple containing (inode, mtime and size of each underlying file, None
+                         for a missing one,
+                         latest modification time as a Unix timestamp, 0 if
+                         no file exists)
+    """
+    if collection == 'forms':
+        paths = (FORMS_FILE,)
+    elif collection == 'submissions':
+        paths = (SUBMISSIONS_FILE, SUBMISSIONS_LOG)
+    else:
+        raise ValueError(f"Unknown collection: {collection}")
+    
+    version = []
+    modified = 0.0
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+            continue
+        version.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        modified = max(modified, st.st_mtime)
+    return tuple(version), modified
\ No newline at end of file
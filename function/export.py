@@ -0,0 +1,125 @@
+# export.py
+# Streaming CSV and NDJSON export of a form's submissions
+
+import csv
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from function import json_codec
+
+# Supported values for the export ?format= parameter and their MIME types
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Columns describing the submission itself, written before the form's fields
+META_COLUMNS = ['submission_id', 'submitted_by', 'submitted_at']
+
+
+class _LineBuffer:
+    """
+    File-like object that hands back whatever csv.writer writes to it
+    """
+    
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_columns(form: Dict) -> List[Tuple[str, str, str]]:
+    """
+    Derive the flat export columns from a form's field definitions
+    
+    Checkbox fields with options get one column per option (header
+    "name[option]", value 1 or 0); every other field gets a single column.
+    
+    Args:
+        form: The form definition
+        
+    Returns:
+        List of (header, field name, option or '') tuples
+    """
+    columns = [(name, name, '') for name in META_COLUMNS]
+    for field in form['fields']:
+        options = [o for o in field.get('options', []) if o != '']
+        if field['type'] == 'checkbox' and options:
+            for option in options:
+                columns.append((f"{field['name']}[{option}]", field['name'], option))
+        else:
+            columns.append((field['name'], field['name'], ''))
+    return columns
+
+
+def _csv_row(submission: Dict, columns: List[Tuple[str, str, str]]) -> List:
+    data = submission.get('data', {})
+    row = [submission.get('id', ''), submission.get('submitted_by', ''), submission.get('submitted_at', '')]
+    for _, field_name, option in columns[len(META_COLUMNS):]:
+        value = data.get(field_name, '')
+        if option:
+            row.append(1 if isinstance(value, list) and option in value else 0)
+        elif isinstance(value, list):
+            row.append(';'.join(str(v) for v in value))
+        else:
+            row.append(value)
+    return row
+
+
+def stream_csv(form: Dict, submissions: Iterable[Dict], rows_per_chunk: int = 500) -> Iterator[str]:
+    """
+    Stream submissions as CSV, one chunk of rows at a time
+    
+    Args:
+        form: The form definition the columns are derived from
+        submissions: Iterable of the form's submissions
+        rows_per_chunk: Number of rows written per yielded chunk
+        
+    Returns:
+        Iterator over chunks of CSV text, starting with the header row
+    """
+    columns = export_columns(form)
+    writer = csv.writer(_LineBuffer())
+    
+    yield writer.writerow([header for header, _, _ in columns])
+    
+    chunk = []
+    for submission in submissions:
+        chunk.append(writer.writerow(_csv_row(submission, columns)))
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_ndjson(form: Dict, submissions: Iterable[Dict], rows_per_chunk: int = 500) -> Iterator[str]:
+    """
+    Stream submissions as newline-delimited JSON objects
+    
+    Each object holds the meta columns plus one key per form field; checkbox
+    values stay JSON lists.
+    
+    Args:
+        form: The form definition the keys are derived from
+        submissions: Iterable of the form's submissions
+        rows_per_chunk: Number of rows written per yielded chunk
+        
+    Returns:
+        Iterator over chunks of NDJSON text
+    """
+    field_names = [field['name'] for field in form['fields']]
+    
+    chunk = []
+    for submission in submissions:
+        data = submission.get('data', {})
+        row = {
+            'submission_id': submission.get('id', ''),
+            'submitted_by': submission.get('submitted_by', ''),
+            'submitted_at': submission.get('submitted_at', ''),
+        }
+        for name in field_names:
+            row[name] = data.get(name, '')
+        chunk.append(json_codec.dumps(row) + '\n')
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
\ No newline at end of file
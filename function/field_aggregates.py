@@ -0,0 +1,315 @@
+# field_aggregates.py
+# Materialized per-(form_id, field) aggregates kept up to date as submissions arrive
+
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from function import json_codec
+from function.calculate_statistics import FieldStatistics
+from function.config import (AGGREGATES_FILE, AGGREGATES_SAVE_INTERVAL, JSON_PRETTY, SQLITE_PATH,
+                             STORAGE_BACKEND)
+from function.data_stamp import get_data_stamp
+from function.file_lock import atomic_write
+from function.form_schema import FormSchema, get_form_schemas
+from function.repository import get_repository
+
+# Bumped when the layout of the aggregates file changes, or what it holds (2:
+# non-finite values are no longer aggregated as numbers)
+AGGREGATES_FORMAT = 2
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _as_tuple(value: Any) -> Any:
+    # JSON turns the tuples in change-feed tokens into lists
+    if isinstance(value, list):
+        return tuple(_as_tuple(item) for item in value)
+    return value
+
+
+def _data_source() -> str:
+    return f"sqlite:{os.path.abspath(SQLITE_PATH)}" if STORAGE_BACKEND == 'sqlite' else 'json'
+
+
+class AggregateStore:
+    """
+    Running statistics and quantile sketches for every numeric-capable field of
+    every form
+    
+    The store follows the repository's submission change feed, so each refresh
+    only folds in submissions added since the previous one (including those
+    written by other worker processes), and skips the feed while the shared
+    submissions data stamp is unchanged. Each form remembers the field list it
+    was aggregated with; if a form edit changes which fields are numeric, only
+    that form is aggregated again, from its own submissions.
+    
+    The state is saved to AGGREGATES_FILE together with the change-feed token,
+    so after a restart load() only has to read the submissions added since the
+    last save.
+    """
+    
+    def __init__(self, path: str = AGGREGATES_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._token = None
+        self._stamp = None
+        self._fields: Dict[str, Tuple[str, ...]] = {}
+        self._stats: Dict[str, Dict[str, FieldStatistics]] = {}
+        # form_id -> ids of the submissions read when the form was last rebuilt
+        # on its own; the change feed may still deliver some of them
+        self._rebuilt: Dict[str, Set[str]] = {}
+        self._dirty = False
+        self._saved_at = 0.0
+    
+    def rebuild(self):
+        """
+        Discard everything and aggregate all submissions from scratch
+        """
+        with self._lock:
+            self._token = None
+            self._stamp = None
+            self._fields.clear()
+            self._stats.clear()
+            self._rebuilt.clear()
+            self.refresh()
+    
+    def refresh(self):
+        """
+        Fold in submissions added since the last refresh
+        """
+        with self._lock:
+            stamp = get_data_stamp().token('submissions')
+            if stamp is None or stamp != self._stamp:
+                token, submissions, reset = get_repository().submission_changes(self._token)
+                if reset:
+                    self._fields.clear()
+                    self._stats.clear()
+                    self._rebuilt.clear()
+                for submission in submissions:
+                    self._add(submission)
+                # Everything a rebuild read has now come through the feed
+                self._rebuilt.clear()
+                if submissions or reset or token != self._token:
+                    self._dirty = True
+                self._token = token
+                self._stamp = stamp
+            
+            if self._dirty and time.time() - self._saved_at >= AGGREGATES_SAVE_INTERVAL:
+                self.save()
+    
+    def invalidate_form(self, form_id: str):
+        """
+        Bring a form's aggregates in line with its field definitions after an edit
+        
+        Only a change in which fields are numeric makes the form's submissions
+        be read again; other edits keep its aggregates.
+        
+        Args:
+            form_id: ID of the edited form
+        """
+        schema = get_form_schemas().get(form_id)
+        with self._lock:
+            if form_id not in self._fields:
+                return
+            if schema is None:
+                del self._fields[form_id]
+                self._stats.pop(form_id, None)
+                self._dirty = True
+            elif self._fields[form_id] != schema.numeric_fields:
+                self._rebuild_form(form_id, schema)
+    
+    def save(self):
+        """
+        Write the aggregates and the change-feed token to AGGREGATES_FILE
+        
+        Skipped while a form rebuilt on its own may hold submissions the token
+        does not cover yet; the next refresh makes them consistent again.
+        """
+        with self._lock:
+            if self._rebuilt:
+                return
+            state = {
+                'format': AGGREGATES_FORMAT,
+                'source': _data_source(),
+                'token': self._token,
+                'forms': {
+                    form_id: {
+                        'fields': self._fields.get(form_id),
+                        'stats': {name: accumulator.to_state() for name, accumulator in stats.items()}
+                    }
+                    for form_id, stats in self._stats.items()
+                }
+            }
+            try:
+                # Running sums of huge values can still overflow to infinity
+                atomic_write(self.path, json_codec.dumpb(state, pretty=JSON_PRETTY, keep_non_finite=True))
+                self._dirty = False
+                self._saved_at = time.time()
+            except OSError as e:
+                print(f"Error saving aggregates to {self.path}: {e}")
+    
+    def load(self):
+        """
+        Restore the aggregates saved by save() and catch up with new submissions
+        
+        Falls back to a full rebuild if the file is missing, unreadable or was
+        written for another storage backend.
+        """
+        with self._lock:
+            try:
+                state = json_codec.load_file(self.path, keep_non_finite=True)
+                if state.get('format') != AGGREGATES_FORMAT or state.get('source') != _data_source():
+                    raise ValueError('aggregates were saved for different data')
+                
+                fields = {}
+                stats = {}
+                for form_id, saved in state['forms'].items():
+                    fields[form_id] = tuple(saved['fields']) if saved['fields'] is not None else None
+                    stats[form_id] = {name: FieldStatistics.from_state(accumulator)
+                                      for name, accumulator in saved['stats'].items()}
+                token = _as_tuple(state['token'])
+            except FileNotFoundError:
+                self.rebuild()
+                return
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Error loading aggregates from {self.path}, rebuilding: {e}")
+                self.rebuild()
+                return
+            
+            self._fields = fields
+            self._stats = stats
+            self._token = token
+            self._stamp = None
+            self._saved_at = time.time()
+            self.refresh()
+    
+    def _form_stats(self, form_id: str, schema: Optional[FormSchema] = None) -> Dict[str, FieldStatistics]:
+        stats = self._stats.get(form_id)
+        if stats is None:
+            if schema is None:
+                schema = get_form_schemas().get(form_id)
+            fields = schema.numeric_fields if schema else ()
+            self._fields[form_id] = fields
+            stats = self._stats[form_id] = {name: FieldStatistics(track_quantiles=True) for name in fields}
+        return stats
+    
+    @staticmethod
+    def _add_data(stats: Dict[str, FieldStatistics], data: Dict):
+        for field_name, accumulator in stats.items():
+            if field_name in data:
+                accumulator.add(data[field_name])
+    
+    def _add(self, submission: Dict):
+        form_id = submission['form_id']
+        if submission['id'] in self._rebuilt.get(form_id, ()):
+            return
+        self._add_data(self._form_stats(form_id), submission['data'])
+    
+    def _rebuild_form(self, form_id: str, schema: FormSchema):
+        # Must be called with _lock held
+        stats = {name: FieldStatistics(track_quantiles=True) for name in schema.numeric_fields}
+        seen = set()
+        for submission in get_repository().iter_submissions_for_form(form_id):
+            seen.add(submission['id'])
+            self._add_data(stats, submission['data'])
+        self._fields[form_id] = schema.numeric_fields
+        self._stats[form_id] = stats
+        self._rebuilt[form_id] = seen
+        self._dirty = True
+    
+    def _current_form_stats(self, form_id: str) -> Optional[Dict[str, FieldStatistics]]:
+        # Must be called with _lock held
+        schema = get_form_schemas().get(form_id)
+        if not schema:
+            return None
+        
+        self.refresh()
+        known = self._fields.get(form_id)
+        if form_id in self._fields and known != schema.numeric_fields:
+            # Field types changed since this form was aggregated, maybe by another worker
+            self._rebuild_form(form_id, schema)
+        return self._form_stats(form_id, schema)
+    
+    def form_statistics(self, form_id: str) -> Optional[Dict[str, Dict[str, Union[float, int, None]]]]:
+        """
+        Get the statistics for every numeric-capable field of a form
+        
+        Args:
+            form_id: ID of the form
+            
+        Returns:
+            Dictionary of field name to FieldStatistics.to_dict(), or None if the
+            form does not exist
+        """
+        with self._lock:
+            stats = self._current_form_stats(form_id)
+            if stats is None:
+                return None
+            return {field_name: accumulator.to_dict() for field_name, accumulator in stats.items()}
+    
+    def field_quantiles(self, form_id: str, field_name: str, fractions: List[float]) -> Optional[Tuple[List[Optional[float]], int, int]]:
+        """
+        Get quantiles of a field from its sketch
+        
+        Args:
+            form_id: ID of the form
+            field_name: Name of the field
+            fractions: Quantiles to compute, each between 0 and 1
+            
+        Returns:
+            Tuple containing (list of quantile values, None where there are no
+            numeric values, count of numeric values, count of non-numeric
+            values), or None if the field is missing or not numeric-capable
+        """
+        with self._lock:
+            accumulator = (self._current_form_stats(form_id) or {}).get(field_name)
+            if accumulator is None:
+                return None
+            values = [accumulator.sketch.quantile(fraction) for fraction in fractions]
+            return values, accumulator.count, accumulator.non_numeric_count
+    
+    def field_histogram(self, form_id: str, field_name: str, bins: int) -> Optional[Tuple[List[Dict[str, float]], int, int]]:
+        """
+        Get an equal-width histogram of a field from its sketch
+        
+        Args:
+            form_id: ID of the form
+            field_name: Name of the field
+            bins: Number of bins
+            
+        Returns:
+            Tuple containing (list of {'lower', 'upper', 'count'} bins, count of
+            numeric values, count of non-numeric values), or None if the field
+            is missing or not numeric-capable
+        """
+        with self._lock:
+            accumulator = (self._current_form_stats(form_id) or {}).get(field_name)
+            if accumulator is None:
+                return None
+            return accumulator.sketch.histogram(bins), accumulator.count, accumulator.non_numeric_count
+
+
+def _save_on_exit():
+    if _store is not None and _store._dirty:
+        _store.save()
+
+
+def get_aggregate_store() -> AggregateStore:
+    """
+    Get the process-wide aggregate store, loading the saved state on first use
+    
+    Returns:
+        The shared AggregateStore
+    """
+    global _store
+    
+    with _store_lock:
+        if _store is None:
+            _store = AggregateStore()
+            _store.load()
+            atexit.register(_save_on_exit)
+        return _store
\ No newline at end of file
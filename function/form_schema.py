@@ -0,0 +1,153 @@
+# form_schema.py
+# Registry of compiled form schemas: every form keyed by id with its fields indexed by name
+
+import threading
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from function.data_stamp import get_data_stamp
+from function.repository import Repository, get_repository
+
+# Field types whose values may be numeric
+NUMERIC_FIELD_TYPES = ['number', 'radio', 'select', 'checkbox']
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+class FormSchema:
+    """
+    One form with lookups precomputed from its field list
+    
+    form is shared with other callers and must be treated as read-only. When
+    several fields have the same name the first one is used.
+    """
+    
+    __slots__ = ('form', 'id', 'active', 'fields', 'field_types', 'options', 'numeric_fields', 'checkbox_fields')
+    
+    def __init__(self, form: Dict):
+        self.form = form
+        self.id = form['id']
+        self.active = form['active']
+        self.fields: Dict[str, Dict] = {}
+        for field in form['fields']:
+            self.fields.setdefault(field['name'], field)
+        self.field_types: Dict[str, str] = {name: field['type'] for name, field in self.fields.items()}
+        # Allowed values per field, empty when any value is allowed
+        self.options: Dict[str, FrozenSet[str]] = {
+            name: frozenset(option for option in field.get('options') or [] if option != '')
+            for name, field in self.fields.items()}
+        # Numeric-capable field names in form order
+        self.numeric_fields: Tuple[str, ...] = tuple(
+            name for name, field_type in self.field_types.items() if field_type in NUMERIC_FIELD_TYPES)
+        self.checkbox_fields: FrozenSet[str] = frozenset(
+            name for name, field_type in self.field_types.items() if field_type == 'checkbox')
+    
+    def field_type(self, field_name: str) -> Optional[str]:
+        """
+        Get the type of a field
+        
+        Args:
+            field_name: Name of the field
+            
+        Returns:
+            Type of the field or None if the form has no such field
+        """
+        return self.field_types.get(field_name)
+    
+    def is_numeric(self, field_name: str) -> bool:
+        """
+        Check whether a field exists and may hold numeric values
+        
+        Args:
+            field_name: Name of the field
+            
+        Returns:
+            True for number, radio, select and checkbox fields
+        """
+        return self.field_types.get(field_name) in NUMERIC_FIELD_TYPES
+
+
+class FormSchemaRegistry:
+    """
+    Compiled schemas of every form, keyed by form id
+    
+    The schemas are rebuilt from list_forms() only when the repository's forms
+    data version changes, i.e. after a form is created, edited or toggled by
+    any worker process. While the shared forms data stamp is unchanged a lookup
+    is a dictionary access; otherwise it costs one data_version() call, instead
+    of a scan over every form either way.
+    """
+    
+    def __init__(self, repository: Optional[Repository] = None):
+        self._repository = repository
+        self._schemas: Dict[str, FormSchema] = {}
+        self._version = None
+        self._stamp = None
+        self._built = False
+        self._lock = threading.Lock()
+    
+    def _current(self) -> Dict[str, FormSchema]:
+        # The data stamp only tracks the configured repository
+        stamp = get_data_stamp().token('forms') if self._repository is None else None
+        if stamp is not None and stamp == self._stamp and self._built:
+            return self._schemas
+        
+        repository = self._repository or get_repository()
+        # Read the version first: forms written while rebuilding only cause another rebuild
+        version, _ = repository.data_version('forms')
+        with self._lock:
+            if not self._built or version != self._version:
+                self._schemas = {form['id']: FormSchema(form) for form in repository.list_forms()}
+                self._version = version
+                self._built = True
+            self._stamp = stamp
+            return self._schemas
+    
+    def get(self, form_id: str) -> Optional[FormSchema]:
+        """
+        Get the compiled schema of a form
+        
+        Args:
+            form_id: ID of the form
+            
+        Returns:
+            The FormSchema, or None if the form does not exist
+        """
+        return self._current().get(form_id)
+    
+    def field_type(self, form_id: str, field_name: str) -> Optional[str]:
+        """
+        Get the type of a field in a form
+        
+        Args:
+            form_id: ID of the form
+            field_name: Name of the field
+            
+        Returns:
+            Type of the field or None if the form or field does not exist
+        """
+        schema = self.get(form_id)
+        return schema.field_type(field_name) if schema else None
+    
+    def invalidate(self):
+        """
+        Rebuild the schemas on the next lookup even if the data version is unchanged
+        """
+        with self._lock:
+            self._built = False
+            self._stamp = None
+
+
+def get_form_schemas() -> FormSchemaRegistry:
+    """
+    Get the process-wide form schema registry
+    
+    Returns:
+        The shared FormSchemaRegistry
+    """
+    global _registry
+    
+    with _registry_lock:
+        if _registry is None:
+            _registry = FormSchemaRegistry()
+        return _registry
\ No newline at end of file
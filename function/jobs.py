@@ -0,0 +1,345 @@
+# jobs.py
+# Background jobs for heavy analytics, run in a pool of worker processes
+
+import importlib
+import inspect
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from function import json_codec
+from function.config import JOB_MAX_ACTIVE, JOB_RESULT_TTL, JOB_WORKERS, JOBS_DB
+
+# Job types that can be submitted: name -> (module, function); the function's
+# keyword arguments are the job parameters
+JOB_TYPES = {
+    'clustering': ('function.calculate_clustering', 'cluster_submissions'),
+    'multi_field_clustering': ('function.calculate_multi_field_clustering', 'cluster_submissions_multi'),
+    'statistics': ('function.calculate_statistics', 'scan_form_statistics'),
+}
+
+# Job states; the last three are final
+JOB_STATUSES = ['queued', 'running', 'done', 'failed', 'cancelled']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    owner INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+"""
+
+# Updates that only apply while a job is not final, so a cancellation made by
+# another worker is never overwritten by the job's late progress or result
+_ACTIVE = "status IN ('queued', 'running')"
+
+# Set in each pool process: where progress updates go, the job store and which
+# job is running
+_progress_queue = None
+_pool_store = None
+_current_job: Optional[str] = None
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+class JobStore:
+    """
+    Job state in a small SQLite database shared by every web worker
+    
+    Whichever worker accepted a job runs it and writes its progress and result
+    here, so any worker can answer a status poll. Results are stored as JSON.
+    """
+    
+    def __init__(self, db_path: str = JOBS_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+    
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, opening it on first use or after a fork
+        
+        Returns:
+            An open sqlite3 connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+    
+    def status(self, job_id: str) -> Optional[str]:
+        row = self.connection().execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+    
+    def update(self, job_id: str, **fields):
+        # Only jobs that are still queued or running are updated
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self.connection().execute(f'UPDATE jobs SET {assignments} WHERE id = ? AND {_ACTIVE}',
+                                  (*fields.values(), job_id))
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while JOB_MAX_ACTIVE jobs are queued or running
+    """
+
+
+def report_progress(fraction: float):
+    """
+    Report how far the current job has got
+    
+    Does nothing when called outside a job, so analytics code can call it
+    unconditionally.
+    
+    Args:
+        fraction: Completed fraction between 0 and 1
+    """
+    if _progress_queue is not None and _current_job is not None:
+        _progress_queue.put((_current_job, min(max(float(fraction), 0.0), 1.0)))
+
+
+def _job_function(job_type: str) -> Callable:
+    module_name, function_name = JOB_TYPES[job_type]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _init_worker(progress_queue, db_path: str):
+    global _progress_queue, _pool_store
+    _progress_queue = progress_queue
+    _pool_store = JobStore(db_path)
+
+
+def _run_job(job_id: str, job_type: str, params: Dict) -> Any:
+    global _current_job
+    
+    # Cancelled from another web worker while it was queued
+    if _pool_store is not None and _pool_store.status(job_id) == 'cancelled':
+        return None
+    
+    _current_job = job_id
+    try:
+        report_progress(0.0)
+        result = _job_function(job_type)(**params)
+        report_progress(1.0)
+        return result
+    finally:
+        _current_job = None
+
+
+class JobManager:
+    """
+    Runs submitted jobs in a ProcessPoolExecutor and keeps their state in a JobStore
+    
+    Each web worker runs the jobs it accepted, but their state is shared, so a
+    job can be polled or cancelled through any worker and JOB_MAX_ACTIVE
+    applies to all of them together. Jobs left active by a worker process that
+    exited are marked failed. Finished jobs are forgotten JOB_RESULT_TTL
+    seconds after they complete.
+    """
+    
+    def __init__(self, max_workers: int = JOB_WORKERS, max_active: int = JOB_MAX_ACTIVE,
+                 result_ttl: float = JOB_RESULT_TTL, store: Optional[JobStore] = None):
+        self.max_active = max_active
+        self.result_ttl = result_ttl
+        self.store = store or JobStore()
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        
+        # Spawned workers start from a clean interpreter instead of inheriting
+        # the web process's threads and locks
+        context = multiprocessing.get_context('spawn')
+        self._progress = context.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(self._progress, self.store.db_path))
+        
+        listener = threading.Thread(target=self._listen, name='job-progress', daemon=True)
+        listener.start()
+    
+    def _listen(self):
+        while True:
+            job_id, fraction = self._progress.get()
+            try:
+                self.store.update(job_id, status='running', progress=fraction)
+            except sqlite3.Error as e:
+                print(f"Error updating job {job_id}: {e}")
+    
+    def _expire(self, conn: sqlite3.Connection):
+        now = time.time()
+        conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (now - self.result_ttl,))
+        
+        # Jobs of a worker process that exited (restarted, killed) will never finish
+        owners = [row[0] for row in conn.execute(f'SELECT DISTINCT owner FROM jobs WHERE {_ACTIVE}')]
+        for owner in owners:
+            if not _process_alive(owner):
+                conn.execute(f"UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                             f"WHERE owner = ? AND {_ACTIVE}", ('Worker process exited', now, owner))
+        
+        with self._lock:
+            for job_id in [job_id for job_id, future in self._futures.items() if future.done()]:
+                del self._futures[job_id]
+    
+    def submit(self, job_type: str, params: Dict) -> str:
+        """
+        Queue a job
+        
+        Args:
+            job_type: One of JOB_TYPES
+            params: Keyword arguments for the job function
+            
+        Returns:
+            The new job's id
+            
+        Raises:
+            ValueError: If the job type is unknown or the parameters do not fit it
+            JobQueueFull: If too many jobs are already queued or running
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type '{job_type}'")
+        try:
+            inspect.signature(_job_function(job_type)).bind(**params)
+        except TypeError as e:
+            raise ValueError(f"Invalid parameters for {job_type}: {e}")
+        
+        job_id = str(uuid.uuid4())
+        conn = self.store.connection()
+        # The write lock makes the count and the insert one step across workers
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._expire(conn)
+            active = conn.execute(f'SELECT COUNT(*) FROM jobs WHERE {_ACTIVE}').fetchone()[0]
+            if active >= self.max_active:
+                raise JobQueueFull(f"{active} jobs are already queued or running")
+            conn.execute("INSERT INTO jobs (id, type, status, progress, created_at, owner) "
+                         "VALUES (?, ?, 'queued', 0.0, ?, ?)", (job_id, job_type, time.time(), os.getpid()))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        
+        with self._lock:
+            future = self._executor.submit(_run_job, job_id, job_type, params)
+            self._futures[job_id] = future
+        
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+    
+    def _finish(self, job_id: str, future: Future):
+        try:
+            try:
+                # Kept exactly (NaN and infinities included) until the API encodes it
+                result = json_codec.dumps(future.result(), keep_non_finite=True)
+                self.store.update(job_id, status='done', progress=1.0, result=result, finished_at=time.time())
+            except CancelledError:
+                self.store.update(job_id, status='cancelled', finished_at=time.time())
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Error running job {job_id}: {error}")
+                self.store.update(job_id, status='failed', error=error, finished_at=time.time())
+        except sqlite3.Error as e:
+            print(f"Error updating job {job_id}: {e}")
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Get a job's status, progress and (once done) result
+        
+        Args:
+            job_id: ID returned by submit()
+            
+        Returns:
+            Copy of the job's state, or None if it is unknown or expired
+        """
+        conn = self.store.connection()
+        self._expire(conn)
+        row = conn.execute('SELECT id, type, status, progress, result, error, created_at, finished_at '
+                           'FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('id', 'type', 'status', 'progress', 'result', 'error', 'created_at', 'finished_at'), row))
+        if job['result'] is not None:
+            job['result'] = json_codec.loads(job['result'], keep_non_finite=True)
+        return job
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job that has not started yet
+        
+        Jobs accepted by another worker are marked cancelled and skipped when
+        their turn comes.
+        
+        Args:
+            job_id: ID returned by submit()
+            
+        Returns:
+            True if the job was cancelled, False if it is unknown or already running
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            return future.cancel()
+        cursor = self.store.connection().execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id))
+        return cursor.rowcount > 0
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Count the known jobs of all workers by status
+        
+        Returns:
+            Dictionary of status to number of jobs
+        """
+        conn = self.store.connection()
+        self._expire(conn)
+        counts = {status: 0 for status in JOB_STATUSES}
+        for status, count in conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'):
+            counts[status] = count
+        return counts
+
+
+def _process_alive(pid: int) -> bool:
+    # os.kill() terminates the process on Windows instead of probing it
+    if pid == os.getpid() or os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to someone else, or cannot be checked here
+        return True
+    return True
+
+
+def get_job_manager() -> JobManager:
+    """
+    Get the process-wide job manager, starting its worker pool on first use
+    
+    Returns:
+        The shared JobManager
+    """
+    global _manager
+    
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
\ No newline at end of file
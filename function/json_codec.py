@@ -0,0 +1,153 @@
+# json_codec.py
+# JSON encoding and decoding for storage and API responses, using orjson when it is installed
+
+import gc
+import json
+from typing import Any, Callable, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library json module is used without it
+    orjson = None
+
+# Name of the JSON library in use, reported by the benchmarks
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+if orjson is not None:
+    # numpy scalars can reach API responses from the clustering code
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Documents at least this large are decoded with the cyclic garbage collector
+# paused: the collections triggered by allocating millions of containers
+# otherwise take longer than the parse itself, and can never free anything
+_GC_PAUSE_BYTES = 1 << 20
+
+# json.dumps() builds a new encoder on every call when given options
+_compact_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+_pretty_encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+
+
+def dumpb(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None,
+          keep_non_finite: bool = False) -> bytes:
+    """
+    Encode an object as UTF-8 JSON
+    
+    Output is compact unless pretty is set. With orjson, NaN and infinities
+    are written as null; the standard library writes NaN/Infinity literals.
+    
+    Args:
+        obj: The object to encode
+        pretty: Indent by two spaces, one item per line
+        sort_keys: Write object keys in sorted order
+        default: Called for objects that cannot be encoded natively; must
+            return an encodable object or raise TypeError. With orjson, date
+            and time objects are passed to it too, so they are formatted the
+            same way by both libraries
+        keep_non_finite: Always write NaN/Infinity literals, so the data reads
+            back unchanged with keep_non_finite=True in loads()
+            
+    Returns:
+        The encoded JSON
+    """
+    if orjson is not None and not keep_non_finite:
+        options = _OPTIONS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if default is not None:
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(obj, default=default, option=options)
+    return dumps(obj, pretty=pretty, sort_keys=sort_keys, default=default, keep_non_finite=True).encode('utf-8')
+
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None,
+          keep_non_finite: bool = False) -> str:
+    """
+    Encode an object as JSON text
+    
+    Args:
+        obj: The object to encode
+        pretty: Indent by two spaces, one item per line
+        sort_keys: Write object keys in sorted order
+        default: See dumpb()
+        keep_non_finite: See dumpb()
+        
+    Returns:
+        The encoded JSON
+    """
+    if orjson is not None and not keep_non_finite:
+        return dumpb(obj, pretty=pretty, sort_keys=sort_keys, default=default).decode('utf-8')
+    if not sort_keys and default is None:
+        return (_pretty_encoder if pretty else _compact_encoder).encode(obj)
+    return json.dumps(obj, indent=2 if pretty else None, separators=None if pretty else (',', ':'),
+                      ensure_ascii=False, sort_keys=sort_keys, default=default)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview], keep_non_finite: bool = False) -> Any:
+    """
+    Decode JSON
+    
+    Args:
+        data: JSON text, or UTF-8 encoded bytes
+        keep_non_finite: Accept the NaN/Infinity literals written with
+            keep_non_finite=True (orjson rejects them)
+            
+    Returns:
+        The decoded object
+        
+    Raises:
+        ValueError: If the data is not valid JSON
+    """
+    if isinstance(data, memoryview) and (orjson is None or keep_non_finite):
+        data = data.tobytes()
+    decode = orjson.loads if orjson is not None and not keep_non_finite else json.loads
+    if len(data) < _GC_PAUSE_BYTES or not gc.isenabled():
+        return decode(data)
+    gc.disable()
+    try:
+        return decode(data)
+    finally:
+        gc.enable()
+
+
+def loads_lines(data: bytes) -> List[Any]:
+    """
+    Decode JSON Lines in one pass
+    
+    Args:
+        data: UTF-8 encoded lines holding one JSON value each; blank lines
+            are skipped
+            
+    Returns:
+        The decoded values in order
+        
+    Raises:
+        ValueError: If some line is not exactly one valid JSON value
+    """
+    lines = [line for line in data.splitlines() if line.strip()]
+    # One parse for all the lines is much faster than one per line; a line
+    # holding several values (or none) shows up as a count mismatch
+    values = loads(b'[' + b','.join(lines) + b']')
+    if len(values) != len(lines):
+        raise ValueError(f"Expected {len(lines)} JSON values, found {len(values)}")
+    return values
+
+
+def load_file(file_path: str, keep_non_finite: bool = False) -> Any:
+    """
+    Read and decode a JSON file
+    
+    Args:
+        file_path: Path to the file
+        keep_non_finite: See loads()
+        
+    Returns:
+        The decoded object
+        
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If it does not hold valid JSON
+    """
+    with open(file_path, 'rb') as f:
+        return loads(f.read(), keep_non_finite=keep_non_finite)
\ No newline at end of file
@@ -0,0 +1,84 @@
+# json_repository.py
+# Repository backed by the JSON files in the data directory
+
+import copy
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from function.config import FORMS_FILE, USERS_FILE
+from function import data_store
+from function.repository import Repository
+
+
+class JsonRepository(Repository):
+    """
+    Storage on users.json, forms.json and the submission log via data_store
+    """
+    
+    def get_users(self) -> Dict[str, Dict]:
+        return data_store.load_data(USERS_FILE, default={})
+    
+    def get_user(self, username: str) -> Optional[Dict]:
+        return self.get_users().get(username)
+    
+    def list_forms(self) -> List[Dict]:
+        return data_store.load_data(FORMS_FILE, default=[])
+    
+    def get_form(self, form_id: str) -> Optional[Dict]:
+        form = next((f for f in self.list_forms() if f['id'] == form_id), None)
+        return copy.deepcopy(form) if form else None
+    
+    def add_form(self, form: Dict) -> bool:
+        def append(forms):
+            forms.append(form)
+            return True
+        
+        return data_store.update_data(FORMS_FILE, append, default=[])
+    
+    def update_form(self, form_id: str, update: Callable[[Dict], None]) -> Optional[Dict]:
+        updated = []
+        
+        def apply(forms):
+            form = next((f for f in forms if f['id'] == form_id), None)
+            if form is None:
+                return False
+            update(form)
+            updated.append(form)
+            return True
+        
+        if not data_store.update_data(FORMS_FILE, apply, default=[]):
+            return None
+        return copy.deepcopy(updated[0])
+    
+    def list_submissions(self) -> List[Dict]:
+        return data_store.load_submissions()
+    
+    def submissions_for_form(self, form_id: str) -> List[Dict]:
+        return data_store.get_submissions_for_form(form_id)
+    
+    def submissions_for_user(self, username: str) -> List[Dict]:
+        return data_store.get_submissions_for_user(username)
+    
+    def iter_submissions_for_form(self, form_id: str, after: Optional[Tuple[str, str]] = None,
+                                  submitted_by: Optional[str] = None) -> Iterator[Dict]:
+        return data_store.iter_submissions_for_form(form_id, after, submitted_by)
+    
+    def get_submission(self, submission_id: str) -> Optional[Dict]:
+        return data_store.get_submission(submission_id)
+    
+    def add_submission(self, submission: Dict) -> bool:
+        return data_store.append_submission(submission)
+    
+    def add_submissions(self, submissions: List[Dict]) -> bool:
+        return data_store.append_submissions(submissions)
+    
+    def form_data_version(self, form_id: str) -> Any:
+        return data_store.form_data_version(form_id)
+    
+    def submission_changes(self, token: Optional[Any]) -> Tuple[Any, List[Dict], bool]:
+        return data_store.submission_changes(token)
+    
+    def submission_feed_token(self) -> Any:
+        return data_store.submission_feed_token()
+    
+    def data_version(self, collection: str) -> Tuple[Any, float]:
+        return data_store.data_version(collection)
\ No newline at end of file
@@ -0,0 +1,318 @@
+# metrics.py
+# In-process counters and timing histograms, exported in the Prometheus text format
+
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the timing histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Time spent in each part of the request being handled by the current thread
+_request = threading.local()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonically increasing value per combination of label values
+    """
+    
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels: str):
+        """
+        Increase the counter
+        
+        Args:
+            amount: Non-negative amount to add
+            **labels: Value for every name in label_names
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        """
+        Get the counter's current value for some label values
+        
+        Args:
+            **labels: Value for every name in label_names
+            
+        Returns:
+            The value, 0 if it was never increased
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+    
+    def render(self) -> List[str]:
+        """
+        Export the counter
+        
+        Returns:
+            Lines in the Prometheus text format
+        """
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(list(zip(self.label_names, key)))} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """
+    Distribution of observed values (usually durations in seconds) in
+    cumulative buckets, per combination of label values
+    """
+    
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> count per bucket (the last one is +Inf) and sum of the values
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: str):
+        """
+        Record a value
+        
+        Args:
+            value: The observed value
+            **labels: Value for every name in label_names
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+    
+    def count(self, **labels: str) -> int:
+        """
+        Get the number of values recorded for some label values
+        
+        Args:
+            **labels: Value for every name in label_names
+            
+        Returns:
+            The number of observations
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return sum(self._counts.get(key, ()))
+    
+    def render(self) -> List[str]:
+        """
+        Export the histogram
+        
+        Returns:
+            Lines in the Prometheus text format
+        """
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                labels = list(zip(self.label_names, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels + [('le', _format_value(bound))])
+                    lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(self._sums[key])}')
+                lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The metrics of one process, in registration order
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def counter(self, name: str, description: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        """
+        Register a counter, or get the one already registered under the name
+        
+        Args:
+            name: Metric name
+            description: Help text
+            label_names: Names of the metric's labels
+            
+        Returns:
+            The Counter
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, description, label_names)
+            return self._metrics[name]
+    
+    def histogram(self, name: str, description: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Register a histogram, or get the one already registered under the name
+        
+        Args:
+            name: Metric name
+            description: Help text
+            label_names: Names of the metric's labels
+            buckets: Upper bounds of the buckets
+            
+        Returns:
+            The Histogram
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, description, label_names, buckets)
+            return self._metrics[name]
+    
+    def render(self) -> str:
+        """
+        Export every metric
+        
+        Returns:
+            The Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+_registry = MetricsRegistry()
+
+REQUESTS = _registry.counter('matchit_http_requests_total', 'HTTP requests handled',
+                             ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = _registry.histogram('matchit_http_request_duration_seconds', 'Time to handle HTTP requests',
+                                      ('endpoint',))
+TEMPLATE_SECONDS = _registry.histogram('matchit_template_render_duration_seconds', 'Time to render templates',
+                                       ('template',))
+DATA_READ_BYTES = _registry.counter('matchit_data_read_bytes_total', 'Bytes of data files read and parsed',
+                                    ('file',))
+DATA_PARSE_SECONDS = _registry.histogram('matchit_data_parse_duration_seconds', 'Time to read and parse data files',
+                                         ('file',))
+DATA_WRITTEN_BYTES = _registry.counter('matchit_data_written_bytes_total', 'Bytes of data files written',
+                                       ('file',))
+DATA_WRITE_SECONDS = _registry.histogram('matchit_data_write_duration_seconds',
+                                         'Time to serialize and write data files', ('file',))
+OPERATION_SECONDS = _registry.histogram('matchit_operation_duration_seconds', 'Time spent in analytics functions',
+                                        ('operation',))
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry
+    
+    Returns:
+        The shared MetricsRegistry
+    """
+    return _registry
+
+
+def begin_request():
+    """
+    Start collecting the time breakdown of the request handled by this thread
+    """
+    _request.breakdown = {}
+
+
+def end_request() -> Dict[str, float]:
+    """
+    Stop collecting the current request's time breakdown
+    
+    Returns:
+        Seconds spent per part (such as 'parse forms.json' or an analytics
+        function), empty if begin_request() was not called
+    """
+    breakdown = getattr(_request, 'breakdown', None)
+    _request.breakdown = None
+    return breakdown or {}
+
+
+def add_to_breakdown(part: str, seconds: float):
+    """
+    Add time to a part of the current request's breakdown
+    
+    Does nothing outside a request.
+    
+    Args:
+        part: Name of the part
+        seconds: Time spent
+    """
+    breakdown = getattr(_request, 'breakdown', None)
+    if breakdown is not None:
+        breakdown[part] = breakdown.get(part, 0.0) + seconds
+
+
+@contextmanager
+def timer(histogram: Histogram, part: str, **labels: str) -> Iterator[None]:
+    """
+    Time a block into a histogram and the current request's breakdown
+    
+    Args:
+        histogram: Histogram to record the duration in
+        part: Name of the part in the request breakdown
+        **labels: Label values for the histogram
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        add_to_breakdown(part, elapsed)
+
+
+def timed(operation: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording each call's duration in OPERATION_SECONDS
+    
+    Args:
+        operation: Label for the function (default: its name)
+        
+    Returns:
+        The decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        name = operation or func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(OPERATION_SECONDS, name, operation=name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
\ No newline at end of file
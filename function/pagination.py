@@ -0,0 +1,77 @@
+# pagination.py
+# Keyset pagination cursors and streamed JSON arrays for the API routes
+
+import base64
+from typing import Dict, Iterable, Iterator, Tuple
+
+from function import json_codec
+from function.data_store import order_key
+
+# Largest page a client may request with ?limit=
+MAX_PAGE_SIZE = 1000
+# Page size when a client sends a cursor without ?limit=
+DEFAULT_PAGE_SIZE = 100
+
+
+def encode_cursor(submission: Dict) -> str:
+    """
+    Build the opaque cursor that resumes after a submission
+    
+    Args:
+        submission: The last submission of the current page
+        
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json_codec.dumpb(list(order_key(submission)))
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by encode_cursor()
+    
+    Args:
+        cursor: The cursor string from the client
+        
+    Returns:
+        Tuple of (submitted_at, id) to resume after
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        submitted_at, submission_id = json_codec.loads(raw)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(submitted_at, str) or not isinstance(submission_id, str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return submitted_at, submission_id
+
+
+def stream_json_array(items: Iterable, chunk_size: int = 65536) -> Iterator[str]:
+    """
+    Serialize an iterable as a JSON array without building the whole document
+    
+    Args:
+        items: The objects to serialize
+        chunk_size: Approximate number of characters per yielded chunk
+        
+    Returns:
+        Iterator over chunks of JSON text
+    """
+    buffer = ['[']
+    size = 1
+    separator = ''
+    for item in items:
+        text = separator + json_codec.dumps(item)
+        separator = ','
+        buffer.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    buffer.append(']')
+    yield ''.join(buffer)
\ No newline at end of file
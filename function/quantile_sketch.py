@@ -0,0 +1,421 @@
+# quantile_sketch.py
+# Mergeable sketches (exact counts, then t-digest) for streaming quantiles, CDFs and histograms
+
+import bisect
+import math
+from typing import Dict, List, Optional, Tuple
+
+# Default compression; the digest keeps at most about compression * pi / 2 centroids
+DEFAULT_COMPRESSION = 100
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl) over a stream of numbers
+    
+    Values are buffered and periodically merged into a sorted list of weighted
+    centroids. The arcsine scale function keeps centroids small near the
+    extremes, so tail quantiles such as p99 stay accurate while memory stays
+    bounded by the compression regardless of how many values are added.
+    Digests built on different parts of a stream can be merged.
+    """
+    
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.count = 0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[Tuple[float, float]] = []
+        self._buffer_limit = int(5 * compression)
+    
+    def add(self, value: float, weight: float = 1):
+        """
+        Add a value
+        
+        Args:
+            value: The value
+            weight: How many times the value occurred
+        """
+        self._buffer.append((value, weight))
+        self.count += weight
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+    
+    def merge(self, other: 'TDigest'):
+        """
+        Fold another digest into this one
+        
+        Args:
+            other: Digest to merge (left unchanged)
+        """
+        other._compress()
+        for mean, weight in zip(other._means, other._weights):
+            self._buffer.append((mean, weight))
+        if other.count:
+            self.count += other.count
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self._compress()
+    
+    def _scale(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+    
+    def _inverse_scale(self, k: float) -> float:
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+    
+    def _compress(self):
+        if not self._buffer:
+            return
+        
+        points = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = self.count
+        
+        means = []
+        weights = []
+        mean, weight = points[0]
+        merged = 0.0
+        limit = self._inverse_scale(self._scale(0.0) + 1) * total
+        for next_mean, next_weight in points[1:]:
+            if merged + weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                merged += weight
+                limit = self._inverse_scale(self._scale(merged / total) + 1) * total
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        
+        self._means = means
+        self._weights = weights
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the value below which a fraction q of the values lie
+        
+        Args:
+            q: Fraction between 0 and 1 (0.5 is the median)
+            
+        Returns:
+            The estimated quantile, or None if the digest is empty
+        """
+        self._compress()
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.minimum
+        if q >= 1:
+            return self.maximum
+        
+        means = self._means
+        weights = self._weights
+        index = q * self.count
+        
+        # Each centroid's mean sits at the middle of its weight
+        center = weights[0] / 2
+        if index < center:
+            return self.minimum + (means[0] - self.minimum) * index / center
+        
+        for i in range(len(means) - 1):
+            next_center = center + (weights[i] + weights[i + 1]) / 2
+            if index <= next_center:
+                fraction = (index - center) / (next_center - center)
+                return means[i] + (means[i + 1] - means[i]) * fraction
+            center = next_center
+        
+        remaining = self.count - center
+        fraction = (index - center) / remaining if remaining > 0 else 1.0
+        return means[-1] + (self.maximum - means[-1]) * min(fraction, 1.0)
+    
+    def cdf(self, value: float) -> float:
+        """
+        Estimate the fraction of values less than or equal to a value
+        
+        Args:
+            value: The value
+            
+        Returns:
+            Fraction between 0 and 1 (0 if the digest is empty)
+        """
+        self._compress()
+        if not self.count or value < self.minimum:
+            return 0.0
+        if value >= self.maximum:
+            return 1.0
+        
+        means = self._means
+        weights = self._weights
+        
+        if value < means[0]:
+            span = means[0] - self.minimum
+            return (value - self.minimum) / span * weights[0] / 2 / self.count if span > 0 else 0.0
+        
+        center = weights[0] / 2
+        for i in range(len(means) - 1):
+            next_center = center + (weights[i] + weights[i + 1]) / 2
+            if value < means[i + 1]:
+                fraction = (value - means[i]) / (means[i + 1] - means[i])
+                return (center + (next_center - center) * fraction) / self.count
+            center = next_center
+        
+        span = self.maximum - means[-1]
+        fraction = (value - means[-1]) / span if span > 0 else 1.0
+        return (center + (self.count - center) * fraction) / self.count
+    
+    def histogram(self, bins: int) -> List[Dict[str, float]]:
+        """
+        Estimate counts in equal-width bins between the minimum and maximum
+        
+        Counts are rounded so that they add up to the number of values.
+        
+        Args:
+            bins: Number of bins
+            
+        Returns:
+            List of {'lower', 'upper', 'count'} dictionaries (empty if the
+            digest is empty); the last bin includes the maximum
+        """
+        if not self.count or bins <= 0:
+            return []
+        
+        width = (self.maximum - self.minimum) / bins
+        result = []
+        previous = 0
+        for i in range(bins):
+            lower = self.minimum + i * width
+            upper = self.maximum if i == bins - 1 else lower + width
+            cumulative = round(self.cdf(upper) * self.count) if i < bins - 1 else self.count
+            cumulative = max(cumulative, previous)
+            result.append({'lower': lower, 'upper': upper, 'count': cumulative - previous})
+            previous = cumulative
+        return result
+    
+    def to_state(self) -> Dict:
+        """
+        Export the digest for persistence
+        
+        Returns:
+            JSON-serializable dictionary accepted by from_state()
+        """
+        self._compress()
+        return {
+            'compression': self.compression,
+            'count': self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+            'means': self._means,
+            'weights': self._weights
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict) -> 'TDigest':
+        """
+        Rebuild a digest exported with to_state()
+        
+        Args:
+            state: The exported dictionary
+            
+        Returns:
+            The restored digest
+        """
+        digest = cls(state['compression'])
+        digest.count = state['count']
+        digest.minimum = state['min']
+        digest.maximum = state['max']
+        digest._means = list(state['means'])
+        digest._weights = list(state['weights'])
+        return digest
+
+
+class QuantileSketch:
+    """
+    Quantile sketch that is exact for fields with few distinct values
+    
+    Counts per distinct value are kept until there are more than exact_limit
+    of them (ratings, radio and select fields usually never get there); after
+    that the values are moved into a TDigest. Exact quantiles interpolate
+    linearly between neighbouring values, like numpy.percentile.
+    """
+    
+    def __init__(self, compression: float = DEFAULT_COMPRESSION, exact_limit: Optional[int] = None):
+        self.compression = compression
+        self.exact_limit = exact_limit if exact_limit is not None else int(2 * compression)
+        self._exact: Optional[Dict[float, float]] = {}
+        self._digest: Optional[TDigest] = None
+    
+    @property
+    def count(self) -> float:
+        if self._exact is not None:
+            return sum(self._exact.values())
+        return self._digest.count
+    
+    @property
+    def minimum(self) -> Optional[float]:
+        if self._exact is not None:
+            return min(self._exact) if self._exact else None
+        return self._digest.minimum
+    
+    @property
+    def maximum(self) -> Optional[float]:
+        if self._exact is not None:
+            return max(self._exact) if self._exact else None
+        return self._digest.maximum
+    
+    def _spill(self):
+        self._digest = TDigest(self.compression)
+        for value in sorted(self._exact):
+            self._digest.add(value, self._exact[value])
+        self._exact = None
+    
+    def add(self, value: float, weight: float = 1):
+        """
+        Add a value
+        
+        Args:
+            value: The value
+            weight: How many times the value occurred
+        """
+        if self._exact is None:
+            self._digest.add(value, weight)
+            return
+        self._exact[value] = self._exact.get(value, 0) + weight
+        if len(self._exact) > self.exact_limit:
+            self._spill()
+    
+    def merge(self, other: 'QuantileSketch'):
+        """
+        Fold another sketch into this one
+        
+        Args:
+            other: Sketch to merge (left unchanged)
+        """
+        if other._exact is not None:
+            for value, weight in other._exact.items():
+                self.add(value, weight)
+            return
+        if self._exact is not None:
+            self._spill()
+        self._digest.merge(other._digest)
+    
+    def _sorted_counts(self) -> Tuple[List[float], List[float]]:
+        values = sorted(self._exact)
+        cumulative = []
+        total = 0
+        for value in values:
+            total += self._exact[value]
+            cumulative.append(total)
+        return values, cumulative
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Get the value below which a fraction q of the values lie
+        
+        Args:
+            q: Fraction between 0 and 1 (0.5 is the median)
+            
+        Returns:
+            The quantile (exact or estimated), or None if the sketch is empty
+        """
+        if self._exact is None:
+            return self._digest.quantile(q)
+        if not self._exact:
+            return None
+        
+        values, cumulative = self._sorted_counts()
+        q = min(max(q, 0.0), 1.0)
+        position = (cumulative[-1] - 1) * q
+        lower = math.floor(position)
+        
+        # The value holding 0-based rank r is the first whose cumulative count exceeds r
+        below = bisect.bisect_right(cumulative, lower)
+        above = bisect.bisect_right(cumulative, lower + 1) if position > lower else below
+        above = min(above, len(values) - 1)
+        return values[below] + (values[above] - values[below]) * (position - lower)
+    
+    def cdf(self, value: float) -> float:
+        """
+        Get the fraction of values less than or equal to a value
+        
+        Args:
+            value: The value
+            
+        Returns:
+            Fraction between 0 and 1 (0 if the sketch is empty)
+        """
+        if self._exact is None:
+            return self._digest.cdf(value)
+        if not self._exact:
+            return 0.0
+        
+        values, cumulative = self._sorted_counts()
+        index = bisect.bisect_right(values, value)
+        return cumulative[index - 1] / cumulative[-1] if index else 0.0
+    
+    def histogram(self, bins: int) -> List[Dict[str, float]]:
+        """
+        Count values in equal-width bins between the minimum and maximum
+        
+        Args:
+            bins: Number of bins
+            
+        Returns:
+            List of {'lower', 'upper', 'count'} dictionaries (empty if the
+            sketch is empty); the last bin includes the maximum
+        """
+        if self._exact is None:
+            return self._digest.histogram(bins)
+        if not self._exact or bins <= 0:
+            return []
+        
+        minimum, maximum = self.minimum, self.maximum
+        width = (maximum - minimum) / bins
+        result = []
+        for i in range(bins):
+            upper = maximum if i == bins - 1 else minimum + (i + 1) * width
+            result.append({'lower': minimum + i * width, 'upper': upper, 'count': 0})
+        for value, weight in self._exact.items():
+            index = min(int((value - minimum) / width), bins - 1) if width > 0 else 0
+            result[index]['count'] += weight
+        return result
+    
+    def to_state(self) -> Dict:
+        """
+        Export the sketch for persistence
+        
+        Returns:
+            JSON-serializable dictionary accepted by from_state()
+        """
+        state = {'compression': self.compression, 'exact_limit': self.exact_limit}
+        if self._exact is not None:
+            state['exact'] = [[value, weight] for value, weight in self._exact.items()]
+        else:
+            state['digest'] = self._digest.to_state()
+        return state
+    
+    @classmethod
+    def from_state(cls, state: Dict) -> 'QuantileSketch':
+        """
+        Rebuild a sketch exported with to_state()
+        
+        Args:
+            state: The exported dictionary
+            
+        Returns:
+            The restored sketch
+        """
+        sketch = cls(state['compression'], state['exact_limit'])
+        if 'exact' in state:
+            sketch._exact = {value: weight for value, weight in state['exact']}
+        else:
+            sketch._exact = None
+            sketch._digest = TDigest.from_state(state['digest'])
+        return sketch
\ No newline at end of file
@@ -0,0 +1,199 @@
+# read_api.py
+# Framework-independent core of the read-only JSON APIs, shared by the Flask routes and the ASGI server
+
+import hashlib
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from function.form_schema import get_form_schemas
+from function.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor
+from function.repository import get_repository
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamp a requested page size to 1..MAX_PAGE_SIZE
+    
+    Args:
+        limit: The ?limit= value from the client, or None for DEFAULT_PAGE_SIZE
+        
+    Returns:
+        The page size used
+    """
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def viewer_key(role: Optional[str], username: str) -> str:
+    """
+    Identify whose view of the data a response holds
+    
+    Args:
+        role: The session's role
+        username: The session's username
+        
+    Returns:
+        'admin' for every admin (they all see the same data), else 'user:<name>'
+    """
+    return 'admin' if role == 'admin' else 'user:' + username
+
+
+def resource_validators(collections: Iterable[str], endpoint: str, view_args: Dict[str, Any],
+                        args: Iterable[Tuple[str, str]], viewer: str) -> Tuple[str, Optional[datetime]]:
+    """
+    Compute the ETag and Last-Modified of a read API response
+    
+    Only the storage data versions are consulted, so a client revalidating an
+    unchanged resource can be answered with 304 before anything is loaded.
+    
+    Args:
+        collections: Collections the response is built from ('forms', 'submissions')
+        endpoint: Name of the route
+        view_args: Arguments taken from the URL path
+        args: Query string parameters as (name, value) pairs
+        viewer: Result of viewer_key()
+        
+    Returns:
+        Tuple containing (opaque tag for a weak ETag,
+                         last modification time truncated to seconds, or None
+                         if the data was never written)
+    """
+    repository = get_repository()
+    versions = [repository.data_version(collection) for collection in collections]
+    
+    # Responses differ per endpoint, URL, query string and viewer
+    key = repr((endpoint, sorted(view_args.items()), sorted(args), viewer, [version for version, _ in versions]))
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    modified = max(modified for _, modified in versions)
+    last_modified = datetime.fromtimestamp(int(modified), timezone.utc) if modified else None
+    return etag, last_modified
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime], if_none_match, if_modified_since: Optional[datetime]) -> bool:
+    """
+    Evaluate the conditional request headers against a response's validators
+    
+    Args:
+        etag: Tag from resource_validators()
+        last_modified: Time from resource_validators()
+        if_none_match: Parsed If-None-Match (werkzeug ETags)
+        if_modified_since: Parsed If-Modified-Since, or None
+        
+    Returns:
+        True if the client's copy is current and 304 can be sent
+    """
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if last_modified is not None and if_modified_since is not None:
+        return last_modified <= if_modified_since
+    return False
+
+
+def visible_forms(role: Optional[str]) -> List[Dict]:
+    """
+    Get the forms a user may list
+    
+    Args:
+        role: The session's role
+        
+    Returns:
+        Every form for admins, the active ones for everybody else
+    """
+    forms = get_repository().list_forms()
+    if role != 'admin':
+        forms = [f for f in forms if f['active']]
+    return forms
+
+
+def visible_form(form_id: str, role: Optional[str]) -> Optional[Dict]:
+    """
+    Get a form if the user may see it
+    
+    Args:
+        form_id: ID of the form
+        role: The session's role
+        
+    Returns:
+        The form (shared, treat as read-only), or None if it does not exist or
+        is inactive and the user is not an admin
+    """
+    schema = get_form_schemas().get(form_id)
+    if not schema or (role != 'admin' and not schema.active):
+        return None
+    return schema.form
+
+
+def visible_submissions(form_id: str, role: Optional[str], username: str) -> List[Dict]:
+    """
+    Get a form's submissions that a user may see, in submission order
+    
+    Args:
+        form_id: ID of the form
+        role: The session's role
+        username: The session's username
+        
+    Returns:
+        Every submission for admins, the user's own ones for everybody else
+    """
+    repository = get_repository()
+    if role == 'admin':
+        return repository.submissions_for_form(form_id)
+    # A user's own submissions are usually far fewer than the form's
+    return [s for s in repository.submissions_for_user(username) if s['form_id'] == form_id]
+
+
+def submission_page(form_id: str, role: Optional[str], username: str, after: Optional[Tuple[str, str]],
+                    limit: Optional[int]) -> Tuple[Iterator[Dict], Optional[str]]:
+    """
+    Get a page of a form's visible submissions ordered by (submitted_at, id)
+    
+    Args:
+        form_id: ID of the form
+        role: The session's role
+        username: The session's username
+        after: Decoded cursor to resume after, or None to start at the beginning
+        limit: Page size (clamped with page_size()); None means
+            DEFAULT_PAGE_SIZE after a cursor, and everything without one
+            
+    Returns:
+        Tuple containing (iterator over the page's submissions,
+                         cursor of the next page, or None on the last page)
+    """
+    submitted_by = None if role == 'admin' else username
+    submissions = get_repository().iter_submissions_for_form(form_id, after=after, submitted_by=submitted_by)
+    if limit is None and after is None:
+        return submissions, None
+    
+    limit = page_size(limit)
+    page = list(islice(submissions, limit + 1))
+    if len(page) <= limit:
+        return iter(page), None
+    page = page[:limit]
+    return iter(page), encode_cursor(page[-1])
+
+
+def next_page_headers(path: str, limit: int, cursor: str, stream: Optional[str] = None) -> Dict[str, str]:
+    """
+    Build the headers that point a client at the next page
+    
+    Args:
+        path: URL path of the submissions endpoint
+        limit: The requested page size
+        cursor: Cursor of the next page
+        stream: The request's ?stream= value, kept in the link if given
+        
+    Returns:
+        Dictionary with the X-Next-Cursor and Link headers
+    """
+    params = {'limit': page_size(limit), 'cursor': cursor}
+    if stream is not None:
+        params['stream'] = stream
+    return {
+        'X-Next-Cursor': cursor,
+        'Link': f'<{path}?{urlencode(params)}>; rel="next"'
+    }
\ No newline at end of file
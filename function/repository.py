@@ -0,0 +1,133 @@
+# repository.py
+# Storage interface for users, forms and submissions
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from function.config import STORAGE_BACKEND
+
+_repository = None
+
+
+class Repository(ABC):
+    """
+    Interface implemented by every storage backend
+    
+    Lists returned by the list/lookup methods may be shared with other callers
+    and must be treated as read-only. get_form() returns a private copy. Writes
+    are safe across threads and worker processes; update_form() applies its
+    change to the latest stored version so concurrent edits are not lost.
+    """
+    
+    # Users
+    
+    @abstractmethod
+    def get_users(self) -> Dict[str, Dict]:
+        """Return all users keyed by username"""
+    
+    @abstractmethod
+    def get_user(self, username: str) -> Optional[Dict]:
+        """Return a single user record or None"""
+    
+    # Forms
+    
+    @abstractmethod
+    def list_forms(self) -> List[Dict]:
+        """Return all forms in creation order"""
+    
+    @abstractmethod
+    def get_form(self, form_id: str) -> Optional[Dict]:
+        """Return a modifiable copy of a form or None"""
+    
+    @abstractmethod
+    def add_form(self, form: Dict) -> bool:
+        """Store a new form"""
+    
+    @abstractmethod
+    def update_form(self, form_id: str, update: Callable[[Dict], None]) -> Optional[Dict]:
+        """Apply update to the stored form atomically and return the new form or None"""
+    
+    # Submissions
+    
+    @abstractmethod
+    def list_submissions(self) -> List[Dict]:
+        """Return all submissions in submission order"""
+    
+    @abstractmethod
+    def submissions_for_form(self, form_id: str) -> List[Dict]:
+        """Return the submissions for one form in submission order"""
+    
+    @abstractmethod
+    def submissions_for_user(self, username: str) -> List[Dict]:
+        """Return the submissions made by one user in submission order"""
+    
+    @abstractmethod
+    def iter_submissions_for_form(self, form_id: str, after: Optional[Tuple[str, str]] = None,
+                                  submitted_by: Optional[str] = None) -> Iterator[Dict]:
+        """Iterate over a form's submissions ordered by (submitted_at, id), starting after the given key"""
+    
+    @abstractmethod
+    def get_submission(self, submission_id: str) -> Optional[Dict]:
+        """Return a single submission or None"""
+    
+    @abstractmethod
+    def add_submission(self, submission: Dict) -> bool:
+        """Store a new submission"""
+    
+    @abstractmethod
+    def add_submissions(self, submissions: List[Dict]) -> bool:
+        """Store several new submissions in one write, either all of them or none"""
+    
+    @abstractmethod
+    def form_data_version(self, form_id: str) -> Any:
+        """Return a hashable value that changes whenever a submission is added to the form"""
+    
+    @abstractmethod
+    def submission_changes(self, token: Optional[Any]) -> Tuple[Any, List[Dict], bool]:
+        """
+        Return (next token, submissions added since token, reset flag)
+        
+        Pass None to get every submission. When the reset flag is set the list
+        holds every submission and anything derived from earlier calls must be
+        discarded. Submissions written by other worker processes are included.
+        """
+    
+    @abstractmethod
+    def submission_feed_token(self) -> Any:
+        """
+        Return the submission_changes() token for the current end of the feed
+        
+        Lets a reader that only needs submissions from now on start following
+        the feed without reading the existing ones.
+        """
+    
+    @abstractmethod
+    def data_version(self, collection: str) -> Tuple[Any, float]:
+        """
+        Return (version, last modified Unix time) of 'forms' or 'submissions'
+        
+        Cheap enough to call on every request: nothing is loaded. The version is
+        hashable and changes whenever the collection is written by any worker
+        process; the time is 0 if it was never written.
+        """
+
+
+def get_repository() -> Repository:
+    """
+    Get the process-wide repository for the configured storage backend
+    
+    Returns:
+        The Repository selected by MATCHIT_STORAGE
+    """
+    global _repository
+    
+    if _repository is None:
+        if STORAGE_BACKEND == 'sqlite':
+            from function.sqlite_repository import SqliteRepository
+            _repository = SqliteRepository()
+        elif STORAGE_BACKEND == 'json':
+            from function.json_repository import JsonRepository
+            _repository = JsonRepository()
+        else:
+            raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+    return _repository
\ No newline at end of file
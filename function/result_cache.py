@@ -0,0 +1,96 @@
+# result_cache.py
+# Bounded LRU cache for expensive results derived from a form's submissions
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Least-recently-used cache of computed results
+    
+    Entries are grouped by a namespace (such as a form id) and tagged with the
+    data version they were computed from. A lookup only matches the current
+    version, and storing a result for a new version drops the namespace's
+    entries for older versions, so results never outlive the data they were
+    computed from.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[Hashable, Hashable], Tuple[Hashable, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, namespace: Hashable, version: Hashable, key: Hashable) -> Optional[Any]:
+        """
+        Look up a result
+        
+        Args:
+            namespace: Group the entry belongs to
+            version: Current data version of the namespace
+            key: Parameters the result was computed with
+            
+        Returns:
+            The cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, namespace: Hashable, version: Hashable, key: Hashable, value: Any):
+        """
+        Store a result, evicting the least recently used entries if full
+        
+        Args:
+            namespace: Group the entry belongs to
+            version: Data version the result was computed from
+            key: Parameters the result was computed with
+            value: The result (treated as read-only once stored)
+        """
+        if self.max_entries <= 0:
+            return
+        
+        with self._lock:
+            stale = [k for k, (v, _) in self._entries.items() if k[0] == namespace and v != version]
+            for k in stale:
+                del self._entries[k]
+            
+            self._entries[(namespace, key)] = (version, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """
+        Drop every entry; the hit and miss counters are kept
+        """
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the cache's size and effectiveness
+        
+        Returns:
+            Dictionary with size, max_entries, hits, misses, evictions and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
\ No newline at end of file
@@ -0,0 +1,312 @@
+# sqlite_repository.py
+# Repository backed by a SQLite database in WAL mode, plus a migration from data/*.json
+
+import argparse
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from function import json_codec
+from function.config import FORMS_FILE, SQLITE_PATH, USERS_FILE
+from function.data_stamp import get_data_stamp
+from function.repository import Repository
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS forms (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    form_id TEXT NOT NULL,
+    submitted_by TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_form ON submissions (form_id, submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions (submitted_by, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at ON submissions (submitted_at);
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+-- Bumped by triggers, which must not insert: they inherit the conflict policy of
+-- the statement firing them (INSERT OR IGNORE would skip every bump but the first)
+INSERT OR IGNORE INTO versions (name, version, modified) VALUES ('forms', 0, 0), ('submissions', 0, 0);
+CREATE TRIGGER IF NOT EXISTS forms_inserted AFTER INSERT ON forms BEGIN
+    UPDATE versions SET version = version + 1, modified = (julianday('now') - 2440587.5) * 86400.0
+    WHERE name = 'forms';
+END;
+CREATE TRIGGER IF NOT EXISTS forms_updated AFTER UPDATE ON forms BEGIN
+    UPDATE versions SET version = version + 1, modified = (julianday('now') - 2440587.5) * 86400.0
+    WHERE name = 'forms';
+END;
+-- Submissions are bumped once per write by the repository instead: a row trigger
+-- costs more than the insert itself during bulk imports
+DROP TRIGGER IF EXISTS submissions_inserted;
+"""
+
+# Marks a collection as written, in the same transaction as the write
+BUMP_VERSION = "UPDATE versions SET version = version + 1, modified = (julianday('now') - 2440587.5) * 86400.0 WHERE name = ?"
+
+
+def _encode(record: Dict) -> str:
+    return json_codec.dumps(record)
+
+
+def _submission_row(submission: Dict) -> tuple:
+    return (
+        submission['id'],
+        submission['form_id'],
+        submission['submitted_by'],
+        submission['submitted_at'],
+        _encode(submission),
+    )
+
+
+class SqliteRepository(Repository):
+    """
+    Storage in a single SQLite database
+    
+    Each thread of each worker process keeps one open connection, so requests
+    reuse it instead of reconnecting. WAL mode lets readers run while another
+    worker is writing.
+    """
+    
+    def __init__(self, db_path: str = SQLITE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        # collection -> (data stamp token, data version) as last read from the database
+        self._versions: Dict[str, Tuple[Tuple[int, int], Tuple[Any, float]]] = {}
+    
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, opening it on first use or after a fork
+        
+        Returns:
+            An open sqlite3 connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+    
+    def _records(self, sql: str, params: Iterable = ()) -> List[Dict]:
+        return [json_codec.loads(row[0]) for row in self.connection().execute(sql, tuple(params))]
+    
+    def _record(self, sql: str, params: Iterable = ()) -> Optional[Dict]:
+        row = self.connection().execute(sql, tuple(params)).fetchone()
+        return json_codec.loads(row[0]) if row else None
+    
+    # Users
+    
+    def get_users(self) -> Dict[str, Dict]:
+        rows = self.connection().execute('SELECT username, record FROM users')
+        return {username: json_codec.loads(record) for username, record in rows}
+    
+    def get_user(self, username: str) -> Optional[Dict]:
+        return self._record('SELECT record FROM users WHERE username = ?', (username,))
+    
+    # Forms
+    
+    def list_forms(self) -> List[Dict]:
+        return self._records('SELECT record FROM forms ORDER BY seq')
+    
+    def get_form(self, form_id: str) -> Optional[Dict]:
+        return self._record('SELECT record FROM forms WHERE id = ?', (form_id,))
+    
+    def add_form(self, form: Dict) -> bool:
+        try:
+            self.connection().execute('INSERT INTO forms (id, record) VALUES (?, ?)', (form['id'], _encode(form)))
+            get_data_stamp().bump('forms')
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving form {form.get('id')}: {e}")
+            return False
+    
+    def update_form(self, form_id: str, update: Callable[[Dict], None]) -> Optional[Dict]:
+        conn = self.connection()
+        try:
+            with conn:
+                # Take the write lock before reading so concurrent updates serialize
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('SELECT record FROM forms WHERE id = ?', (form_id,)).fetchone()
+                if row is None:
+                    return None
+                form = json_codec.loads(row[0])
+                update(form)
+                conn.execute('UPDATE forms SET record = ? WHERE id = ?', (_encode(form), form_id))
+            get_data_stamp().bump('forms')
+            return form
+        except sqlite3.Error as e:
+            print(f"Error updating form {form_id}: {e}")
+            return None
+    
+    # Submissions
+    
+    def list_submissions(self) -> List[Dict]:
+        return self._records('SELECT record FROM submissions ORDER BY seq')
+    
+    def submissions_for_form(self, form_id: str) -> List[Dict]:
+        return self._records('SELECT record FROM submissions WHERE form_id = ? ORDER BY seq', (form_id,))
+    
+    def submissions_for_user(self, username: str) -> List[Dict]:
+        return self._records('SELECT record FROM submissions WHERE submitted_by = ? ORDER BY seq', (username,))
+    
+    def iter_submissions_for_form(self, form_id: str, after: Optional[Tuple[str, str]] = None,
+                                  submitted_by: Optional[str] = None) -> Iterator[Dict]:
+        sql = 'SELECT record FROM submissions WHERE form_id = ?'
+        params = [form_id]
+        if submitted_by is not None:
+            sql += ' AND submitted_by = ?'
+            params.append(submitted_by)
+        if after:
+            sql += ' AND (submitted_at, id) > (?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY submitted_at, id'
+        
+        # Rows are decoded one at a time as the caller consumes them
+        cursor = self.connection().execute(sql, params)
+        return (json_codec.loads(row[0]) for row in cursor)
+    
+    def get_submission(self, submission_id: str) -> Optional[Dict]:
+        return self._record('SELECT record FROM submissions WHERE id = ?', (submission_id,))
+    
+    def add_submission(self, submission: Dict) -> bool:
+        return self.add_submissions([submission])
+    
+    def add_submissions(self, submissions: List[Dict]) -> bool:
+        conn = self.connection()
+        try:
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany(
+                    'INSERT INTO submissions (id, form_id, submitted_by, submitted_at, record) VALUES (?, ?, ?, ?, ?)',
+                    (_submission_row(s) for s in submissions)
+                )
+                conn.execute(BUMP_VERSION, ('submissions',))
+            get_data_stamp().bump('submissions')
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving {len(submissions)} submission(s): {e}")
+            return False
+    
+    def form_data_version(self, form_id: str) -> Any:
+        row = self.connection().execute(
+            'SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM submissions WHERE form_id = ?', (form_id,)
+        ).fetchone()
+        return tuple(row)
+    
+    def submission_changes(self, token: Optional[Any]) -> Tuple[Any, List[Dict], bool]:
+        conn = self.connection()
+        reset = token is None
+        if not reset:
+            # A smaller maximum seq means the table was rebuilt or replaced
+            max_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM submissions').fetchone()[0]
+            reset = max_seq < token
+        start = 0 if reset else token
+        
+        rows = conn.execute('SELECT seq, record FROM submissions WHERE seq > ? ORDER BY seq', (start,)).fetchall()
+        new_token = rows[-1][0] if rows else start
+        return new_token, [json_codec.loads(record) for _, record in rows], reset
+    
+    def submission_feed_token(self) -> Any:
+        return self.connection().execute('SELECT COALESCE(MAX(seq), 0) FROM submissions').fetchone()[0]
+    
+    def data_version(self, collection: str) -> Tuple[Any, float]:
+        if collection not in ('forms', 'submissions'):
+            raise ValueError(f"Unknown collection: {collection}")
+        # No query while nothing was written (see data_stamp.py)
+        stamp = get_data_stamp().token(collection)
+        cached = self._versions.get(collection)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            return cached[1]
+        
+        # Maintained in the database (see SCHEMA and BUMP_VERSION), so writes from every process count
+        row = self.connection().execute(
+            'SELECT version, modified FROM versions WHERE name = ?', (collection,)
+        ).fetchone()
+        version = tuple(row)
+        self._versions[collection] = (stamp, version)
+        return version
+    
+    # Migration
+    
+    def import_data(self, users: Dict[str, Dict], forms: List[Dict], submissions: List[Dict]) -> Dict[str, int]:
+        """
+        Copy users, forms and submissions into the database in one transaction
+        
+        Rows that already exist (same username or id) are left untouched, so the
+        import can be re-run safely.
+        
+        Args:
+            users: Users keyed by username
+            forms: List of forms
+            submissions: List of submissions
+            
+        Returns:
+            Dictionary with the number of rows inserted per table
+        """
+        conn = self.connection()
+        counts = {}
+        with conn:
+            conn.execute('BEGIN')
+            # rowcount, unlike total_changes, leaves out the rows changed by triggers
+            counts['users'] = conn.executemany(
+                'INSERT OR IGNORE INTO users (username, record) VALUES (?, ?)',
+                ((username, _encode(user)) for username, user in users.items())
+            ).rowcount
+            counts['forms'] = conn.executemany(
+                'INSERT OR IGNORE INTO forms (id, record) VALUES (?, ?)',
+                ((form['id'], _encode(form)) for form in forms)
+            ).rowcount
+            counts['submissions'] = conn.executemany(
+                'INSERT OR IGNORE INTO submissions (id, form_id, submitted_by, submitted_at, record) VALUES (?, ?, ?, ?, ?)',
+                (_submission_row(s) for s in submissions)
+            ).rowcount
+            if counts['submissions']:
+                conn.execute(BUMP_VERSION, ('submissions',))
+        get_data_stamp().bump(*(collection for collection, count in counts.items() if count))
+        return counts
+
+
+def migrate_json_to_sqlite(db_path: str = SQLITE_PATH) -> Dict[str, int]:
+    """
+    Copy the JSON data files (including the submission log) into a SQLite database
+    
+    Args:
+        db_path: Path of the database to create or extend
+        
+    Returns:
+        Dictionary with the number of rows inserted per table
+    """
+    from function import data_store
+    
+    users = data_store.load_data(USERS_FILE, default={})
+    forms = data_store.load_data(FORMS_FILE, default=[])
+    submissions = data_store.load_submissions()
+    return SqliteRepository(db_path).import_data(users, forms, submissions)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate data/*.json into the SQLite storage backend')
+    parser.add_argument('--db', default=SQLITE_PATH, help='SQLite database to write')
+    args = parser.parse_args()
+    
+    counts = migrate_json_to_sqlite(args.db)
+    print(f"Migrated {counts['users']} users, {counts['forms']} forms and {counts['submissions']} submissions to {args.db}")
\ No newline at end of file
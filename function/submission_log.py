@@ -0,0 +1,275 @@
+# submission_log.py
+# Append-only JSON Lines log for form submissions
+
+import argparse
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from function import json_codec
+from function.config import (FSYNC_INTERVAL, FSYNC_POLICIES, FSYNC_POLICY, GROUP_COMMIT_WINDOW, SUBMISSIONS_FILE,
+                             SUBMISSIONS_LOG)
+from function.data_stamp import get_data_stamp
+from function.file_lock import atomic_write, file_lock
+from function.metrics import DATA_WRITE_SECONDS, DATA_WRITTEN_BYTES, timer
+
+_last_fsync = 0.0
+
+
+def encode_record(record: Dict) -> str:
+    """
+    Encode a submission as a single log line
+    
+    Args:
+        record: The submission to encode
+        
+    Returns:
+        Compact JSON text terminated by a newline
+    """
+    return json_codec.dumps(record) + '\n'
+
+
+def _should_fsync(policy: str) -> bool:
+    """
+    Decide whether the current append should be followed by an fsync
+    
+    Args:
+        policy: One of FSYNC_POLICIES
+        
+    Returns:
+        True if the file should be synced to disk now
+    """
+    global _last_fsync
+    
+    if policy == 'always':
+        return True
+    if policy == 'interval':
+        now = time.monotonic()
+        if now - _last_fsync >= FSYNC_INTERVAL:
+            _last_fsync = now
+            return True
+    return False
+
+
+class _PendingAppend:
+    def __init__(self, log_path: str, text: str, policy: str):
+        self.log_path = log_path
+        self.text = text
+        self.policy = policy
+        self.done = False
+        self.ok = False
+
+
+def _write_batch(batch: List[_PendingAppend]):
+    """
+    Write a batch of queued appends, one locked write per log file
+    
+    Args:
+        batch: Appends collected by the group commit leader
+    """
+    by_path: Dict[str, List[_PendingAppend]] = {}
+    for entry in batch:
+        by_path.setdefault(entry.log_path, []).append(entry)
+    
+    for log_path, entries in by_path.items():
+        sync = any(entry.policy == 'always' for entry in entries)
+        if not sync and any(entry.policy == 'interval' for entry in entries):
+            sync = _should_fsync('interval')
+        
+        name = os.path.basename(log_path)
+        data = ''.join(entry.text for entry in entries).encode('utf-8')
+        try:
+            with timer(DATA_WRITE_SECONDS, f'write {name}', file=name), file_lock(log_path):
+                with open(log_path, 'a+b') as f:
+                    # A crash can leave a partial final line; start on a fresh
+                    # line so the next record is not glued onto it
+                    prefix = b''
+                    end = f.seek(0, os.SEEK_END)
+                    if end > 0:
+                        f.seek(end - 1)
+                        if f.read(1) != b'\n':
+                            prefix = b'\n'
+                    f.write(prefix + data)
+                    f.flush()
+                    if sync:
+                        os.fsync(f.fileno())
+            DATA_WRITTEN_BYTES.inc(len(prefix) + len(data), file=name)
+            ok = True
+        except Exception as e:
+            print(f"Error appending submissions to {log_path}: {e}")
+            ok = False
+        
+        for entry in entries:
+            entry.ok = ok
+            entry.done = True
+
+
+class _GroupCommit:
+    """
+    Batches concurrent appends into one locked write and at most one fsync
+    
+    The first thread to arrive becomes the leader and writes everything queued so
+    far; records that arrive while it is writing are picked up by the next leader.
+    """
+    
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending: List[_PendingAppend] = []
+        self.writing = False
+    
+    def append(self, entry: _PendingAppend) -> bool:
+        with self.cond:
+            self.pending.append(entry)
+            while self.writing and not entry.done:
+                self.cond.wait()
+            if entry.done:
+                return entry.ok
+            self.writing = True
+        
+        try:
+            if GROUP_COMMIT_WINDOW > 0:
+                time.sleep(GROUP_COMMIT_WINDOW)
+            with self.cond:
+                batch, self.pending = self.pending, []
+            _write_batch(batch)
+        finally:
+            with self.cond:
+                self.writing = False
+                self.cond.notify_all()
+        return entry.ok
+
+
+_group_commit = _GroupCommit()
+
+
+def append_submissions(submissions: List[Dict], log_path: str = SUBMISSIONS_LOG, fsync_policy: Optional[str] = None) -> bool:
+    """
+    Append submissions to the log as part of the next group commit
+    
+    Appends from concurrent threads are written together under the inter-process
+    log lock, so several workers can write to the same log safely.
+    
+    Args:
+        submissions: The submission records to append
+        log_path: Path to the JSON Lines log
+        fsync_policy: Override for FSYNC_POLICY
+        
+    Returns:
+        True if the records were written, False otherwise
+    """
+    policy = fsync_policy or FSYNC_POLICY
+    if policy not in FSYNC_POLICIES:
+        print(f"Unknown fsync policy {policy!r}, falling back to 'always'")
+        policy = 'always'
+    
+    text = ''.join(encode_record(submission) for submission in submissions)
+    return _group_commit.append(_PendingAppend(log_path, text, policy))
+
+
+def append_submission(submission: Dict, log_path: str = SUBMISSIONS_LOG, fsync_policy: Optional[str] = None) -> bool:
+    """
+    Append a single submission to the log
+    
+    Args:
+        submission: The submission record to append
+        log_path: Path to the JSON Lines log
+        fsync_policy: Override for FSYNC_POLICY
+        
+    Returns:
+        True if the record was written, False otherwise
+    """
+    return append_submissions([submission], log_path, fsync_policy)
+
+
+def read_log(log_path: str = SUBMISSIONS_LOG) -> List[Dict]:
+    """
+    Read every record from the log
+    
+    Blank lines are ignored and malformed lines (for example a torn final line
+    left behind by a crash) are skipped with a warning.
+    
+    Args:
+        log_path: Path to the JSON Lines log
+        
+    Returns:
+        List of submission records in append order
+    """
+    records = []
+    try:
+        with open(log_path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json_codec.loads(line))
+                except ValueError as e:
+                    print(f"Skipping malformed line {line_number} in {log_path}: {e}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error reading submission log {log_path}: {e}")
+    return records
+
+
+def load_submissions(json_path: str = SUBMISSIONS_FILE, log_path: str = SUBMISSIONS_LOG) -> List[Dict]:
+    """
+    Load all submissions
+    
+    Records still held in the legacy submissions.json come first, followed by
+    everything appended to the log, so readers see the same list whether or not
+    the data has been converted.
+    
+    Args:
+        json_path: Path to the legacy JSON array file
+        log_path: Path to the JSON Lines log
+        
+    Returns:
+        List of submission records
+    """
+    submissions = []
+    
+    if os.path.exists(json_path):
+        try:
+            submissions.extend(json_codec.load_file(json_path) or [])
+        except Exception as e:
+            print(f"Error loading data from {json_path}: {e}")
+    
+    submissions.extend(read_log(log_path))
+    return submissions
+
+
+def convert_submissions(json_path: str = SUBMISSIONS_FILE, log_path: str = SUBMISSIONS_LOG) -> int:
+    """
+    Move all records from the legacy submissions.json into the log
+    
+    The combined log is written to a temporary file and renamed into place while
+    holding the log lock, then the legacy file is renamed to <json_path>.bak so it is not read twice.
+    
+    Args:
+        json_path: Path to the legacy JSON array file
+        log_path: Path to the JSON Lines log
+        
+    Returns:
+        Number of records in the resulting log
+    """
+    with file_lock(log_path):
+        submissions = load_submissions(json_path, log_path)
+        atomic_write(log_path, ''.join(encode_record(submission) for submission in submissions))
+        
+        if os.path.exists(json_path):
+            os.replace(json_path, json_path + '.bak')
+    get_data_stamp().bump('submissions')
+    
+    return len(submissions)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert submissions.json into the append-only submission log')
+    parser.add_argument('--json', default=SUBMISSIONS_FILE, help='legacy submissions.json to convert')
+    parser.add_argument('--log', default=SUBMISSIONS_LOG, help='JSON Lines log to write')
+    args = parser.parse_args()
+    
+    count = convert_submissions(args.json, args.log)
+    print(f"Wrote {count} submissions to {args.log}")
\ No newline at end of file
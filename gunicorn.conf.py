@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+# Production server settings: gunicorn -c gunicorn.conf.py (read automatically from this directory)
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from function.config import SERVER_BIND, SERVER_THREADS, SERVER_WORKERS
+
+wsgi_app = 'app:create_app()'
+bind = SERVER_BIND
+workers = max(SERVER_WORKERS, 1)
+threads = max(SERVER_THREADS, 1)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Create the data files and load the saved aggregates once in the master; the
+# workers are forked from it and start with warm caches. Each worker then keeps
+# its caches in step with the others through the shared data stamp
+# (function/data_stamp.py) and opens its own SQLite connections.
+preload_app = True
+
+accesslog = '-'
\ No newline at end of file
@@ -13,6 +13,16 @@ document.addEventListener('DOMContentLoaded', function() {
     // If elements don't exist, we're not on the form submissions page
     if (!fieldSelect || !clusteringBtn) return;
     
+    // Milliseconds between job status checks
+    const JOB_POLL_INTERVAL = 500;
+    
+    // Display names of the clustering methods
+    const METHOD_LABELS = {
+        kmeans: 'K-means',
+        optimal: 'optimal',
+        balanced: 'balanced groups'
+    };
+    
     // Enable/disable clustering button based on field selection
     fieldSelect.addEventListener('change', function() {
         clusteringBtn.disabled = !this.value;
@@ -50,6 +60,8 @@ document.addEventListener('DOMContentLoaded', function() {
         } else {
             membersPerCluster = parseInt(document.getElementById('members-per-cluster').value);
         }
+        const algorithmSelect = document.getElementById('clustering-algorithm');
+        const method = algorithmSelect ? algorithmSelect.value : 'kmeans';
         
         // Get form ID from the URL
         const urlParts = window.location.pathname.split('/');
@@ -59,15 +71,21 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('clustering-submit-btn').disabled = true;
         document.getElementById('clustering-submit-btn').innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Clustering...';
         
-        // Make AJAX request to perform clustering
-        fetch(`/api/calculate_clustering/${formId}/${fieldName}`, {
+        // Queue a clustering job, then poll it until the result is ready
+        fetch('/api/jobs', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                num_clusters: numClusters,
-                members_per_cluster: membersPerCluster
+                type: 'clustering',
+                params: {
+                    form_id: formId,
+                    field_name: fieldName,
+                    num_clusters: numClusters,
+                    members_per_cluster: membersPerCluster,
+                    method: method
+                }
             })
         })
         .then(response => {
@@ -76,7 +94,13 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             return response.json();
         })
-        .then(data => {
+        .then(job => pollJob(job.status_url))
+        .then(job => {
+            if (job.status !== 'done') {
+                throw new Error(job.error || `Clustering job ${job.status}`);
+            }
+            const data = job.result;
+            
             // Hide the modal
             bootstrap.Modal.getInstance(clusteringModal).hide();
             
@@ -91,7 +115,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 header.innerHTML = `
                     <h6 class="alert-heading">Clustering Results for ${data.field_name}:</h6>
                     <p>Total submissions: ${data.total_submissions} (${data.non_numeric_count} non-numeric values were skipped)</p>
-                    <p>Number of clusters: ${data.num_clusters}</p>
+                    <p>Number of clusters: ${data.num_clusters} (${METHOD_LABELS[data.method] || data.method})</p>
                 `;
                 clusteringResults.appendChild(header);
                 
@@ -189,18 +213,53 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Poll a background job until it finishes, showing its progress on the submit button
+    function pollJob(statusUrl) {
+        return new Promise((resolve, reject) => {
+            const check = () => {
+                fetch(statusUrl)
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error('Network response was not ok');
+                        }
+                        return response.json();
+                    })
+                    .then(job => {
+                        if (job.status === 'queued' || job.status === 'running') {
+                            const percent = Math.round(job.progress * 100);
+                            document.getElementById('clustering-submit-btn').innerHTML = `<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Clustering... ${percent}%`;
+                            setTimeout(check, JOB_POLL_INTERVAL);
+                        } else {
+                            resolve(job);
+                        }
+                    })
+                    .catch(reject);
+            };
+            check();
+        });
+    }
+    
     // Handle clustering type change
     document.querySelectorAll('input[name="clustering-type"]').forEach(radio => {
         radio.addEventListener('change', function() {
             const numClustersGroup = document.getElementById('num-clusters-group');
             const membersPerClusterGroup = document.getElementById('members-per-cluster-group');
             
+            const algorithmSelect = document.getElementById('clustering-algorithm');
+            
             if (this.value === 'num-clusters') {
                 numClustersGroup.classList.remove('d-none');
                 membersPerClusterGroup.classList.add('d-none');
+                if (algorithmSelect && algorithmSelect.value === 'balanced') {
+                    algorithmSelect.value = 'kmeans';
+                }
             } else {
                 numClustersGroup.classList.add('d-none');
                 membersPerClusterGroup.classList.remove('d-none');
+                // Fixed group sizes are what "members per cluster" usually asks for
+                if (algorithmSelect) {
+                    algorithmSelect.value = 'balanced';
+                }
             }
         });
     });
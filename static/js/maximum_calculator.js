@@ -30,15 +30,15 @@ document.addEventListener('DOMContentLoaded', function() {
         calculateBtn.disabled = true;
         calculateBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Calculating...';
         
-        // Make AJAX request to calculate maximum
-        fetch(`/api/calculate_maximum/${formId}/${fieldName}`)
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
+        // Fetch the field statistics (shared with the other calculators)
+        MatchItStats.get(formId, fieldName)
+            .then(stats => {
+                const data = {
+                    maximum: stats.max,
+                    numeric_count: stats.count,
+                    non_numeric_count: stats.non_numeric_count
+                };
+                
                 // Display results
                 if (data.maximum !== null) {
                     // Format the maximum to 2 decimal places
@@ -30,15 +30,15 @@ document.addEventListener('DOMContentLoaded', function() {
         calculateBtn.disabled = true;
         calculateBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Calculating...';
         
-        // Make AJAX request to calculate minimum
-        fetch(`/api/calculate_minimum/${formId}/${fieldName}`)
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
+        // Fetch the field statistics (shared with the other calculators)
+        MatchItStats.get(formId, fieldName)
+            .then(stats => {
+                const data = {
+                    minimum: stats.min,
+                    numeric_count: stats.count,
+                    non_numeric_count: stats.non_numeric_count
+                };
+                
                 // Display results
                 if (data.minimum !== null) {
                     // Format the minimum to 2 decimal places
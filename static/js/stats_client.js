@@ -0,0 +1,56 @@
+// stats_client.js
+// Shared client for /api/stats so the field calculators need a single round trip
+
+const MatchItStats = (function() {
+    // Pending or completed requests keyed by form ID and field name
+    const cache = {};
+    
+    // Statistics reported for a field without numeric values
+    const emptyStats = {
+        count: 0,
+        sum: null,
+        mean: null,
+        min: null,
+        max: null,
+        variance: null,
+        stddev: null,
+        non_numeric_count: 0
+    };
+    
+    function get(formId, fieldName) {
+        const key = `${formId}/${fieldName}`;
+        if (!cache[key]) {
+            cache[key] = fetch(`/api/stats/${formId}?fields=${encodeURIComponent(fieldName)}`)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('Network response was not ok');
+                    }
+                    return response.json();
+                })
+                .then(data => data.fields[fieldName] || emptyStats)
+                .catch(error => {
+                    // Do not keep failed requests around
+                    delete cache[key];
+                    throw error;
+                });
+        }
+        return cache[key];
+    }
+    
+    function clear() {
+        Object.keys(cache).forEach(key => delete cache[key]);
+    }
+    
+    document.addEventListener('DOMContentLoaded', function() {
+        // Fetch fresh statistics whenever a different field is selected
+        const fieldSelect = document.getElementById('field-select');
+        if (fieldSelect) {
+            fieldSelect.addEventListener('change', clear);
+        }
+    });
+    
+    return {
+        get: get,
+        clear: clear
+    };
+})();
\ No newline at end of file
@@ -0,0 +1,41 @@
+# test_calculate_clustering.py
+# Regression tests for the one-dimensional clustering algorithms
+
+import pytest
+
+from function import calculate_clustering
+from function.calculate_clustering import balanced_grouping, optimal_clustering
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    # Run each test on the vectorized and the pure-Python dynamic program
+    if request.param == 'python':
+        monkeypatch.setattr(calculate_clustering, 'np', None)
+    elif calculate_clustering.np is None:
+        pytest.skip('numpy is not installed')
+    return request.param
+
+
+@pytest.mark.parametrize('points, outlier', [
+    ([1.0, 2.0, 3.0, 1e200, 5.0], 3),
+    ([1, 2, 3e160, 4], 2),
+    ([1e160, 2e160, 3e300], 2),
+])
+def test_optimal_clustering_huge_values(backend, points, outlier):
+    # The sums of squares of these values overflow unless they are rescaled
+    assignments, centroids = optimal_clustering(points, 2)
+    assert assignments == [1 if i == outlier else 0 for i in range(len(points))]
+    assert centroids[1] == points[outlier]
+
+
+def test_optimal_clustering_full_float_range(backend):
+    assignments, centroids = optimal_clustering([-1.7e308, 0.0, 1.7e308], 2)
+    assert assignments == [0, 1, 1]
+    assert centroids == [-1.7e308, 8.5e307]
+
+
+def test_balanced_grouping_huge_values():
+    assignments, centroids = balanced_grouping([1, 2, 3e160, 4], 2)
+    assert assignments == [0, 0, 1, 1]
+    assert centroids == [1.5, 1.5e160]
\ No newline at end of file